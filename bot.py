@@ -1,3 +1,5 @@
+import asyncio
+import datetime
 import logging
 import os
 import sys
@@ -9,22 +11,42 @@ from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
     CallbackQueryHandler,
+    InlineQueryHandler,
+    ChatMemberHandler,
     MessageHandler,
     filters,
     ConversationHandler,
     ContextTypes
 )
 from config import config
-from models.database import init_db
+from models.database import init_db, dispose_engines, database_path
+from utils.outbox import drain_outbox, prune_outbox, OUTBOX_POLL_INTERVAL
+from utils.rate_limiter import PriorityRateLimiter, log_rate_limiter_stats
+from utils.update_processor import KeyedUpdateProcessor, log_update_processor_stats, UPDATE_STATS_INTERVAL
+from utils.expiry import sweep_expired_listings, EXPIRY_SWEEP_INTERVAL
+from utils.timers import load_timers, process_due_timers, TIMER_TICK_SECONDS
+from utils.backup import backup_job, BACKUP_INTERVAL
+from utils.backup_files import files_backup_job
+from utils.db_maintenance import optimize_database, incremental_vacuum, OPTIMIZE_INTERVAL
+from utils.archive import archive_listings
+from utils.search_index import load_search_index
+from utils.recommender import load_recommender
+from utils.saved_searches import load_saved_searches
+from utils.inline_search import load_inline_articles
+from utils.webhook import run_webhook
+from utils.admin_roster import load_admin_roster, refresh_admin_roster, ADMIN_ROSTER_REFRESH_INTERVAL
+from utils.matchmaking import expire_matchmaking, MATCHMAKING_TICK_SECONDS
+from utils.wal_shipping import get_shipper, ship_wal, prune_wal_backups, stop_wal_shipping, WAL_SHIP_INTERVAL
 from handlers import (
-    start_command, create_command, manage_command,
+    start_command, create_command, manage_command, history_command, search_command,
+    recommend_command, subscribe_command, unsubscribe_command, party_command, inline_query,
     handle_moderation_action, handle_listing_action,
     handle_search_type, handle_search_goal, handle_nickname,
     handle_gender, handle_age, handle_experience, handle_role,
     handle_faction, handle_server, handle_ship_type,
     handle_platform, handle_additional_info, handle_contacts,
     handle_contact_type, admin_command, handle_moderation_settings,
-    handle_clear_all_listings, handle_admin_back,
+    handle_clear_all_listings, handle_admin_stats, handle_admin_back, handle_chat_member, reindex_command,
     SEARCH_TYPE, SEARCH_GOAL, NICKNAME, GENDER, AGE,
     EXPERIENCE, ROLE, FACTION, SERVER, SHIP_TYPE,
     PLATFORM, ADDITIONAL_INFO, CONTACTS, MODERATION_SETTINGS
@@ -41,6 +63,7 @@ logging.getLogger('httpcore.http11').setLevel(logging.WARNING)
 logging.getLogger('httpcore.connection').setLevel(logging.WARNING)
 logging.getLogger('apscheduler').setLevel(logging.WARNING)
 logging.getLogger('asyncio').setLevel(logging.WARNING)
+logging.getLogger('aiosqlite').setLevel(logging.WARNING)
 logger = logging.getLogger(__name__)
 
 # Global variables
@@ -186,6 +209,22 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     except Exception as e:
         logger.error(f"Error in error handler: {e}")
 
+async def post_init(application) -> None:
+    """Load persistent listing timers, in-memory listing indexes and the admin roster before polling starts."""
+    await load_admin_roster(application)
+    await load_timers(application)
+    await load_search_index(application)
+    await load_recommender(application)
+    await load_inline_articles(application)
+    # Bucket choice uses value frequencies from the search index
+    await load_saved_searches(application)
+
+async def post_shutdown(application) -> None:
+    """Release database connections on shutdown."""
+    await dispose_engines()
+    if config.WAL_SHIPPING and database_path:
+        await stop_wal_shipping()
+
 def main():
     """Start the bot."""
     global lock_fd, application
@@ -210,7 +249,23 @@ def main():
             cleanup_and_exit()
 
         # Create application
-        application = ApplicationBuilder().token(config.BOT_TOKEN).build()
+        application = (
+            ApplicationBuilder()
+            .token(config.BOT_TOKEN)
+            .rate_limiter(PriorityRateLimiter(
+                overall_max_rate=config.RATE_LIMIT_OVERALL,
+                group_max_rate=config.RATE_LIMIT_GROUP_PER_MINUTE
+            ))
+            # Users are served in parallel, each user's updates strictly in order
+            .concurrent_updates(KeyedUpdateProcessor(
+                max_workers=config.UPDATE_WORKERS,
+                max_pending=config.UPDATE_MAX_PENDING,
+                max_pending_per_key=config.UPDATE_MAX_PENDING_PER_USER
+            ))
+            .post_init(post_init)
+            .post_shutdown(post_shutdown)
+            .build()
+        )
 
         # Create conversation handlers first
         create_conv_handler = ConversationHandler(
@@ -249,6 +304,7 @@ def main():
                 MODERATION_SETTINGS: [
                     CallbackQueryHandler(handle_moderation_settings, pattern='^admin_mod_'),
                     CallbackQueryHandler(handle_clear_all_listings, pattern='^admin_clear_all$'),
+                    CallbackQueryHandler(handle_admin_stats, pattern='^admin_stats$'),
                     CallbackQueryHandler(handle_admin_back, pattern='^admin_back$')
                 ]
             },
@@ -267,7 +323,14 @@ def main():
         command_handlers = [
             CommandHandler('start', start_command),
             CommandHandler('admin', admin_command),
+            CommandHandler('reindex', reindex_command),
             CommandHandler('manage', manage_command),
+            CommandHandler('history', history_command),
+            CommandHandler('search', search_command),
+            CommandHandler('recommend', recommend_command),
+            CommandHandler('subscribe', subscribe_command),
+            CommandHandler('unsubscribe', unsubscribe_command),
+            CommandHandler('party', party_command),
             MessageHandler(filters.TEXT & filters.Regex('^Создать анкету$'), create_command),
             MessageHandler(filters.TEXT & filters.Regex('^Мои анкеты$'), manage_command),
             MessageHandler(filters.TEXT & filters.Regex('^Отмена$'), cancel_command)
@@ -281,24 +344,100 @@ def main():
         callback_handlers = [
             CallbackQueryHandler(handle_moderation_action, pattern='^mod_(approve|decline)_'),
             CallbackQueryHandler(handle_listing_action, pattern='^(delete|refresh)_'),
+            # /admin is a plain command, so its panel buttons are handled here too
+            CallbackQueryHandler(handle_moderation_settings, pattern='^admin_mod_'),
+            CallbackQueryHandler(handle_clear_all_listings, pattern='^admin_clear_all$'),
+            CallbackQueryHandler(handle_admin_stats, pattern='^admin_stats$'),
+            CallbackQueryHandler(handle_admin_back, pattern='^admin_back$'),
         ]
 
         for handler in callback_handlers:
             application.add_handler(handler)
             logger.debug(f"Added callback handler: {handler.__class__.__name__}")
 
+        # Inline mode: @bot <filters> from any chat
+        application.add_handler(InlineQueryHandler(inline_query))
+
+        # Admin promotions and demotions in the bot's channels
+        application.add_handler(ChatMemberHandler(handle_chat_member, ChatMemberHandler.CHAT_MEMBER))
+
         # Add error handler
         application.add_error_handler(error_handler)
         logger.debug("Added error handler")
 
-        # Start bot
-        logger.info("Starting bot")
-        application.run_polling(
-            drop_pending_updates=True,
-            allowed_updates=["message", "callback_query"],
-            close_loop=False
+        # Background delivery of outbox messages
+        application.job_queue.run_repeating(drain_outbox, interval=OUTBOX_POLL_INTERVAL, first=1)
+        application.job_queue.run_daily(prune_outbox, time=datetime.time(hour=4))
+        logger.debug("Scheduled outbox jobs")
+
+        # Per-listing timers: expiry, reminders, refresh cooldowns
+        application.job_queue.run_repeating(process_due_timers, interval=TIMER_TICK_SECONDS, first=5)
+
+        # Matchmaking queue timeouts
+        application.job_queue.run_repeating(
+            expire_matchmaking, interval=MATCHMAKING_TICK_SECONDS, first=MATCHMAKING_TICK_SECONDS
         )
 
+        # Safety net for listings past their expiry date without a timer
+        application.job_queue.run_repeating(sweep_expired_listings, interval=EXPIRY_SWEEP_INTERVAL, first=30)
+
+        # Online database backups with rotation (run in a worker thread);
+        # server databases are backed up by their own tooling
+        if database_path:
+            application.job_queue.run_repeating(
+                backup_job, interval=BACKUP_INTERVAL, first=120, data=database_path
+            )
+        application.job_queue.run_daily(files_backup_job, time=datetime.time(hour=5))
+
+        # Move finished listings to the archive table before the nightly vacuum
+        application.job_queue.run_daily(archive_listings, time=datetime.time(hour=3))
+
+        # SQLite maintenance: planner statistics and free page release
+        if database_path:
+            application.job_queue.run_repeating(optimize_database, interval=OPTIMIZE_INTERVAL, first=600)
+            application.job_queue.run_daily(incremental_vacuum, time=datetime.time(hour=3, minute=30))
+
+        # Continuous WAL shipping for point-in-time restore
+        if config.WAL_SHIPPING and database_path:
+            get_shipper(database_path)
+            application.job_queue.run_repeating(ship_wal, interval=WAL_SHIP_INTERVAL, first=5)
+            application.job_queue.run_daily(prune_wal_backups, time=datetime.time(hour=4, minute=30))
+
+        # Channel administrators for permission checks
+        application.job_queue.run_repeating(
+            refresh_admin_roster, interval=ADMIN_ROSTER_REFRESH_INTERVAL, first=ADMIN_ROSTER_REFRESH_INTERVAL
+        )
+
+        # Periodic rate limiter metrics
+        application.job_queue.run_repeating(log_rate_limiter_stats, interval=300, first=300)
+        application.job_queue.run_repeating(
+            log_update_processor_stats, interval=UPDATE_STATS_INTERVAL, first=UPDATE_STATS_INTERVAL
+        )
+
+        # Start bot
+        allowed_updates = ["message", "callback_query", "inline_query", "chat_member"]
+        if config.WEBHOOK_URL:
+            logger.info("Starting bot in webhook mode")
+            asyncio.run(run_webhook(
+                application,
+                url=config.WEBHOOK_URL,
+                listen=config.WEBHOOK_LISTEN,
+                port=config.WEBHOOK_PORT,
+                secret_token=config.WEBHOOK_SECRET or None,
+                max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+                allowed_updates=allowed_updates,
+                health_port=config.WEBHOOK_HEALTH_PORT,
+                ssl_certfile=config.WEBHOOK_SSL_CERT or None,
+                ssl_keyfile=config.WEBHOOK_SSL_KEY or None,
+            ))
+        else:
+            logger.info("Starting bot")
+            application.run_polling(
+                drop_pending_updates=True,
+                allowed_updates=allowed_updates,
+                close_loop=False
+            )
+
     except Exception as e:
         logger.error(f"Failed to start bot: {e}", exc_info=True)
         cleanup_and_exit()
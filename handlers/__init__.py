@@ -20,9 +20,17 @@ from .create import (
     EXPERIENCE, ROLE, FACTION, SERVER, SHIP_TYPE,
     PLATFORM, ADDITIONAL_INFO, CONTACTS
 )
-from .manage import manage_command, handle_listing_action
+from .manage import manage_command, handle_listing_action, history_command
 from .moderation import handle_moderation_action
-from .admin import admin_command, handle_moderation_settings, handle_clear_all_listings, handle_admin_back, MODERATION_SETTINGS
+from .search import search_command, recommend_command
+from .subscriptions import subscribe_command, unsubscribe_command
+from .party import party_command
+from .inline import inline_query
+from .admin import (
+    admin_command, handle_moderation_settings, handle_clear_all_listings,
+    handle_admin_stats, handle_admin_back, handle_chat_member, reindex_command,
+    MODERATION_SETTINGS
+)
 
 __all__ = [
     'start_command',
@@ -43,10 +51,21 @@ __all__ = [
     'handle_contact_type',
     'manage_command',
     'handle_listing_action',
+    'history_command',
     'handle_moderation_action',
+    'search_command',
+    'recommend_command',
+    'subscribe_command',
+    'unsubscribe_command',
+    'party_command',
+    'inline_query',
     'admin_command',
     'handle_moderation_settings',
     'handle_clear_all_listings',
+    'handle_admin_stats',
+    'handle_admin_back',
+    'handle_chat_member',
+    'reindex_command',
     # States
     'SEARCH_TYPE', 'SEARCH_GOAL', 'NICKNAME', 'GENDER', 'AGE',
     'EXPERIENCE', 'ROLE', 'FACTION', 'SERVER', 'SHIP_TYPE',
@@ -1,15 +1,27 @@
 """Обработчики админских команд."""
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 import logging
+import time
 from config import config
 from utils.helpers import is_admin
+from utils.admin_roster import get_admin_roster
+from utils.constants import SEARCH_TYPES
+from utils.keyboards import get_keyboard
 
 logger = logging.getLogger(__name__)
 
 # Admin command states
 MODERATION_SETTINGS = 1
 
+def admin_panel_text(context) -> str:
+    current_type = context.bot_data.get('moderation_type', 'manual')
+    return (
+        f"🛠 Панель администратора\n\n"
+        f"Текущий режим модерации: {'Автоматический' if current_type == 'auto' else 'Ручной'}\n\n"
+        f"Выберите режим модерации объявлений:"
+    )
+
 async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка команды /admin."""
     # End current conversation if any
@@ -26,26 +38,7 @@ async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("У вас нет прав для использования этой команды.")
         return ConversationHandler.END
 
-    # Create keyboard for moderation settings
-    keyboard = [
-        [
-            InlineKeyboardButton("Автомодерация", callback_data="admin_mod_auto"),
-            InlineKeyboardButton("Ручная модерация", callback_data="admin_mod_manual")
-        ],
-        [
-            InlineKeyboardButton("🗑 Очистить все объявления", callback_data="admin_clear_all")
-        ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-
-    # Get current moderation type
-    current_type = context.bot_data.get('moderation_type', 'manual')
-    await update.message.reply_text(
-        f"🛠 Панель администратора\n\n"
-        f"Текущий режим модерации: {'Автоматический' if current_type == 'auto' else 'Ручной'}\n\n"
-        f"Выберите режим модерации объявлений:",
-        reply_markup=reply_markup
-    )
+    await update.message.reply_text(admin_panel_text(context), reply_markup=get_keyboard('admin_panel'))
     return MODERATION_SETTINGS
 
 async def handle_moderation_settings(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -92,15 +85,20 @@ async def handle_clear_all_listings(update: Update, context: ContextTypes.DEFAUL
         return
 
     try:
-        from models.database import session_scope
+        from models.database import async_session_scope, reset_id_sequence
         from models.listing import Listing
-        from sqlalchemy import text
-
-        with session_scope() as session:
-            # Удаляем все записи из таблицы
-            session.query(Listing).delete()
+        from models.timer import ListingTimer
+        from utils.listing_events import listings_removed
+        from sqlalchemy import delete
+
+        async with async_session_scope() as session:
+            # Удаляем все записи из таблицы вместе с таймерами объявлений
+            await session.execute(delete(ListingTimer))
+            await session.execute(delete(Listing))
             # Сбрасываем автоинкремент
-            session.execute(text("ALTER SEQUENCE listings_id_seq RESTART WITH 1"))
+            await reset_id_sequence(session, Listing.__tablename__)
+
+        listings_removed(None)
 
         await query.message.edit_text(
             "✅ Все объявления успешно удалены.\n"
@@ -114,9 +112,16 @@ async def handle_clear_all_listings(update: Update, context: ContextTypes.DEFAUL
             "Произошла ошибка при очистке объявлений. Попробуйте позже."
         )
 
+OUTCOME_NAMES = {
+    'active': 'Опубликованы',
+    'pending': 'На модерации',
+    'expired': 'Истек срок',
+    'deleted': 'Удалены',
+    'rejected': 'Отклонены',
+}
 
-async def handle_admin_back(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle back button press in admin panel."""
+async def handle_admin_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Статистика объявлений, включая перенесенные в архив."""
     query = update.callback_query
     await query.answer()
 
@@ -124,24 +129,87 @@ async def handle_admin_back(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.message.reply_text("У вас нет прав для использования этой команды.")
         return ConversationHandler.END
 
-    keyboard = [
-        [
-            InlineKeyboardButton("Автомодерация", callback_data="admin_mod_auto"),
-            InlineKeyboardButton("Ручная модерация", callback_data="admin_mod_manual")
-        ],
-        [
-            InlineKeyboardButton("🗑 Очистить все объявления", callback_data="admin_clear_all")
+    try:
+        from utils.archive import listing_stats
+        stats = await listing_stats()
+
+        lines = [
+            "📊 Статистика объявлений\n",
+            f"Всего: {stats['total']} (в архиве: {stats['archived']})",
+            f"За последние 7 дней: {stats['last_week']}\n",
         ]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
+        for outcome, name in OUTCOME_NAMES.items():
+            lines.append(f"{name}: {stats['by_outcome'].get(outcome, 0)}")
+        lines.append("")
+        for search_type, count in sorted(stats['by_type'].items(), key=lambda item: -item[1]):
+            name = SEARCH_TYPES.get(search_type, {}).get('name', search_type)
+            lines.append(f"{name}: {count}")
+
+        last_archive = context.bot_data.get('last_archive')
+        if last_archive:
+            lines.append(
+                f"\nПоследняя архивация: {last_archive['finished_at']:%d.%m %H:%M} UTC, "
+                f"перенесено {last_archive['archived']}"
+            )
 
-    current_type = context.bot_data.get('moderation_type', 'manual')
-    await query.message.edit_text(
-        f"🛠 Панель администратора\n\n"
-        f"Текущий режим модерации: {'Автоматический' if current_type == 'auto' else 'Ручной'}\n\n"
-        f"Выберите режим модерации объявлений:",
-        reply_markup=reply_markup
-    )
+        await query.message.edit_text(
+            "\n".join(lines),
+            reply_markup=get_keyboard('admin_back')
+        )
+
+    except Exception as e:
+        logger.error(f"Error in handle_admin_stats: {e}")
+        await query.message.reply_text(
+            "Произошла ошибка при получении статистики. Попробуйте позже."
+        )
+    return MODERATION_SETTINGS
+
+async def reindex_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработка команды /reindex: перестраивает поисковые индексы."""
+    if not await is_admin(update, context):
+        await update.message.reply_text("У вас нет прав для использования этой команды.")
+        return
+
+    try:
+        from utils.fulltext import rebuild_fulltext_index
+        from utils.search_index import load_search_index, get_search_index
+        from utils.recommender import load_recommender
+        from utils.inline_search import load_inline_articles
+
+        started = time.monotonic()
+        fulltext_rows = await rebuild_fulltext_index()
+        await load_search_index()
+        await load_recommender()
+        await load_inline_articles()
+
+        await update.message.reply_text(
+            f"✅ Индексы перестроены за {time.monotonic() - started:.1f} с\n\n"
+            f"Полнотекстовый индекс: {fulltext_rows} объявлений\n"
+            f"Индекс поиска и рекомендаций: {len(get_search_index())} опубликованных объявлений"
+        )
+
+    except Exception as e:
+        logger.error(f"Error in reindex_command: {e}", exc_info=True)
+        await update.message.reply_text(
+            "Произошла ошибка при перестроении индексов. Попробуйте позже."
+        )
+
+async def handle_chat_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Назначение и снятие администраторов каналов сразу обновляют кэш прав."""
+    if get_admin_roster().apply_member_update(update.chat_member):
+        member = update.chat_member.new_chat_member
+        logger.info(f"Chat {update.chat_member.chat.id}: user {member.user.id} is now {member.status}")
+
+async def handle_admin_back(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle back button press in admin panel."""
+    query = update.callback_query
+    await query.answer()
+
+    if not await is_admin(update, context):
+        await query.message.reply_text("У вас нет прав для использования этой команды.")
+        return ConversationHandler.END
+
+    await query.message.edit_text(admin_panel_text(context), reply_markup=get_keyboard('admin_panel'))
     return MODERATION_SETTINGS
 
 from utils.helpers import is_admin
\ No newline at end of file
@@ -1,20 +1,23 @@
 """Обработка создания объявления."""
-from telegram import Update, ReplyKeyboardMarkup, error as telegram
+from telegram import Update, error as telegram
 from telegram.ext import ContextTypes, ConversationHandler
 from datetime import datetime, timedelta
+from sqlalchemy import select
 import logging
 
-from models.listing import Listing
-from models.database import session_scope
+from models.listing import Listing, ActiveListingExistsError, add_listing
+from models.database import async_session_scope
 from utils.keyboards import (
     create_gender_keyboard, create_role_keyboard,
     create_faction_keyboard, create_server_keyboard,
     create_ship_keyboard, create_platform_keyboard,
     create_search_type_keyboard, create_search_goal_keyboard,
-    create_moderation_keyboard, create_listing_management_keyboard,
-    create_contact_type_keyboard
+    create_contact_type_keyboard, get_keyboard
 )
-from utils.formatters import format_moderation_message, format_listing_message
+from utils.outbox import enqueue_listing_publication, enqueue_moderation_post, kick_outbox
+from utils.timers import schedule_listing_timers, register_timers
+from utils.listing_events import listings_published
+from utils.saved_searches import enqueue_saved_search_matches
 from utils.constants import (
     SEARCH_TYPES, SEARCH_GOALS, GENDERS, ROLES, FACTIONS,
     SERVERS, SHIP_TYPES, PLATFORMS
@@ -44,21 +47,24 @@ async def create_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             del context.user_data['conversation_started']
         context.chat_data.clear()
 
-        # Quick check for active listings
-        with session_scope() as session:
-            active_listing = session.query(Listing).filter(
-                Listing.user_id == user_id,
-                Listing.is_active == True,
-                Listing.status == 'approved',
-                Listing.message_id.isnot(None)
-            ).first()
-
-            if active_listing:
-                logger.info(f"User {user_id} already has active listing")
-                await update.message.reply_text(
-                    "У вас уже есть активное объявление. Используйте /manage для управления существующими объявлениями."
-                )
-                return ConversationHandler.END
+        # Quick check for active listings; the reply is sent after the session is closed
+        async with async_session_scope() as session:
+            result = await session.execute(
+                select(Listing.id).where(
+                    Listing.user_id == user_id,
+                    Listing.is_active == True,
+                    Listing.status == 'approved',
+                    Listing.message_id.isnot(None)
+                ).limit(1)
+            )
+            active_listing_id = result.scalar()
+
+        if active_listing_id is not None:
+            logger.info(f"User {user_id} already has active listing")
+            await update.message.reply_text(
+                "У вас уже есть активное объявление. Используйте /manage для управления существующими объявлениями."
+            )
+            return ConversationHandler.END
 
         # Start with search type selection
         keyboard = create_search_type_keyboard()
@@ -302,13 +308,9 @@ async def handle_platform(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return PLATFORM
 
         context.user_data['platform'] = platform
-        keyboard = ReplyKeyboardMarkup([
-            ["Telegram"],
-            ["Discord"]
-        ], resize_keyboard=True, one_time_keyboard=True)
         await update.message.reply_text(
             "Выберите способ связи:",
-            reply_markup=keyboard
+            reply_markup=get_keyboard('contact_method')
         )
         return CONTACTS
 
@@ -410,79 +412,52 @@ async def handle_additional_info(update: Update, context: ContextTypes.DEFAULT_T
             **user_data
         }
 
-        with session_scope() as session:
-            listing = Listing(**listing_data)
-
-            if listing.moderation_type == 'auto':
-                listing.status = 'approved'
-                session.add(listing)
-                session.commit()
-
-                try:
-                    message = await context.bot.send_message(
-                        chat_id=config.LISTINGS_CHANNEL_ID,
-                        text=format_listing_message(listing),
-                        parse_mode='MarkdownV2',
-                        reply_markup=create_listing_management_keyboard(listing.id)
-                    )
-                    listing.message_id = message.message_id
-                    session.commit()
-
-                    await context.bot.send_message(
-                        chat_id=user_id,
-                        text="✅ Ваше объявление было автоматически одобрено и опубликовано!"
-                    )
-                    return ConversationHandler.END
-
-                except telegram.error.BadRequest as e:
-                    logger.error(f"Telegram API error for user {user_id}: {e}")
-                    session.rollback()
-                    await update.message.reply_text(
-                        "❌ Ошибка при отправке объявления. Пожалуйста, попробуйте позже с /create"
-                    )
-                    return ConversationHandler.END
+        listing = Listing(**listing_data)
+        if listing.moderation_type == 'auto':
+            listing.status = 'approved'
 
+        # Объявление и исходящие сообщения фиксируются одной транзакцией,
+        # доставку выполняет обработчик outbox
+        async with async_session_scope() as session:
+            await add_listing(session, listing)
+
+            if listing.status == 'approved':
+                await enqueue_listing_publication(session, listing)
+                await enqueue_saved_search_matches(session, listing)
             else:
-                session.add(listing)
-                session.flush()
-
-                try:
-                    moderation_text = format_moderation_message(listing)
-                    await context.bot.send_message(
-                        chat_id=config.MODERATION_CHANNEL_ID,
-                        text=moderation_text,
-                        parse_mode='MarkdownV2',
-                        reply_markup=create_moderation_keyboard(listing.id)
-                    )
-                    await update.message.reply_text(
-                        "✅ Объявление создано и отправлено на модерацию!\n"
-                        "Вы получите уведомление после проверки."
-                    )
-
-                    context.user_data.clear()
-                    return ConversationHandler.END
-
-                except telegram.error.BadRequest as e:
-                    logger.error(f"Telegram API error for user {user_id}: {e}")
-                    session.rollback()
-                    await update.message.reply_text(
-                        "❌ Ошибка при отправке объявления. Пожалуйста, попробуйте позже с /create"
-                    )
-                    return ConversationHandler.END
+                await enqueue_moderation_post(session, listing)
 
-    except Exception as e:
-        logger.error(f"Error in handle_additional_info: {e}", exc_info=True)
-        error_message = str(e)
-        if "У вас уже есть активное объявление" in error_message:
+            timers = await schedule_listing_timers(session, listing)
+
+        register_timers(timers)
+        listings_published([listing])
+        kick_outbox(context)
+        context.user_data.clear()
+
+        if listing.status == 'approved':
             await update.message.reply_text(
-                "❌ У вас уже есть активное объявление. Используйте /manage для управления существующими объявлениями."
+                "✅ Ваше объявление было автоматически одобрено и будет опубликовано в ближайшее время!"
             )
-            return ConversationHandler.END
         else:
             await update.message.reply_text(
-                "❌ Произошла ошибка. Пожалуйста, попробуйте ввести информацию еще раз:"
+                "✅ Объявление создано и отправлено на модерацию!\n"
+                "Вы получите уведомление после проверки."
             )
-            return ADDITIONAL_INFO
+        return ConversationHandler.END
+
+    except ActiveListingExistsError:
+        context.user_data.clear()
+        await update.message.reply_text(
+            "❌ У вас уже есть активное объявление. Используйте /manage для управления существующими объявлениями."
+        )
+        return ConversationHandler.END
+
+    except Exception as e:
+        logger.error(f"Error in handle_additional_info: {e}", exc_info=True)
+        await update.message.reply_text(
+            "❌ Произошла ошибка. Пожалуйста, попробуйте ввести информацию еще раз:"
+        )
+        return ADDITIONAL_INFO
 
 async def handle_contacts(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработка контактных данных."""
@@ -544,13 +519,3 @@ async def handle_contacts(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "❌ Произошла ошибка при сохранении контактов. Пожалуйста, попробуйте еще раз:"
         )
         return CONTACTS
-
-from telegram import InlineKeyboardMarkup, InlineKeyboardButton
-
-def create_contact_type_keyboard():
-    """Create contact type selection keyboard."""
-    keyboard = InlineKeyboardMarkup([
-        [InlineKeyboardButton("Telegram", callback_data="contact_telegram")],
-        [InlineKeyboardButton("Discord", callback_data="contact_discord")]
-    ])
-    return keyboard
\ No newline at end of file
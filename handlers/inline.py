@@ -0,0 +1,64 @@
+"""Inline-режим: поиск объявлений из любого чата через @бот <фильтры>."""
+import logging
+from telegram import Update, InlineQueryResultsButton
+from telegram.ext import ContextTypes
+from utils.inline_search import (
+    INLINE_PAGE_SIZE, INLINE_CACHE_TIME, cached_search, get_articles
+)
+from handlers.search import FIELD_CHOICES, parse_search_query
+
+logger = logging.getLogger(__name__)
+
+# Слова без имени фильтра: «европа pc pvp» — только однозначные значения из одного слова
+_owners = {}
+for _field, _choices in FIELD_CHOICES.items():
+    for _word, _value in _choices.items():
+        if ' ' not in _word:
+            _owners.setdefault(_word, []).append((_field, _value))
+INLINE_WORDS = {word: owners[0] for word, owners in _owners.items() if len(owners) == 1}
+del _owners
+
+def parse_inline_query(query):
+    """Разбирает inline-запрос в (filters, ranges).
+
+    Поддерживаются фильтры /search вида имя=значение и отдельные слова,
+    совпадающие со значением фильтра. Незнакомые слова (в том числе
+    недописанные) пропускаются: текстовый поиск требует запроса к базе.
+    """
+    text, filters, ranges = parse_search_query(query)
+    for word in text.split():
+        match = INLINE_WORDS.get(word)
+        if match:
+            field, value = match
+            filters.setdefault(field, set()).add(value)
+    return filters, ranges
+
+async def inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle inline queries with listings from the in-memory index."""
+    query = update.inline_query
+    try:
+        offset = int(query.offset or 0)
+    except ValueError:
+        offset = 0
+
+    try:
+        count, listing_ids = cached_search(query.query, parse_inline_query)
+    except ValueError as e:
+        await query.answer(
+            [], cache_time=INLINE_CACHE_TIME,
+            button=InlineQueryResultsButton(text=f"❌ {e}", start_parameter='search')
+        )
+        return
+
+    page = listing_ids[offset:offset + INLINE_PAGE_SIZE]
+    results = get_articles(page)
+    next_offset = offset + INLINE_PAGE_SIZE
+    await query.answer(
+        results,
+        cache_time=INLINE_CACHE_TIME,
+        next_offset=str(next_offset) if next_offset < len(listing_ids) else '',
+        button=InlineQueryResultsButton(
+            text=f"Найдено объявлений: {count}" if count else "Ничего не найдено — создать анкету",
+            start_parameter='inline'
+        ) if not offset else None
+    )
@@ -2,11 +2,21 @@
 from telegram import Update, error as telegram_error
 from telegram.ext import ContextTypes
 from models.listing import Listing
-from models.database import session_scope
+from models.timer import ListingTimer
+from models.outbox import listing_key
+from models.database import async_session_scope
 from utils.formatters import format_listing_message
 from utils.keyboards import create_listing_management_keyboard
-from config import config
+from utils.outbox import (
+    enqueue_listing_publication, enqueue_channel_deletion,
+    enqueue_notification, kick_outbox
+)
+from utils.timers import start_refresh_cooldown, register_timers
+from utils.listing_events import listings_removed
+from utils.archive import user_listing_history
+from utils.constants import SEARCH_TYPES
 import logging
+from sqlalchemy import select, delete
 from sqlalchemy.exc import SQLAlchemyError
 
 logger = logging.getLogger(__name__)
@@ -20,50 +30,55 @@ async def manage_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     context.user_data.clear()
 
     try:
-        with session_scope() as session:
+        # Messages are rendered inside the session and sent after it is closed,
+        # so the connection is not held while waiting for Telegram
+        async with async_session_scope() as session:
             # Add debug logging
             logger.debug(f"Querying active listings for user {user_id}")
 
-            # SQLite stores booleans as 0/1, so we need to be explicit in our comparison
-            user_listings = session.query(Listing).filter(
-                Listing.user_id == user_id,
-                Listing.is_active == 1,  # SQLite boolean true is 1
-                Listing.status == 'approved'
-            ).all()
+            result = await session.execute(
+                select(Listing).where(
+                    Listing.user_id == user_id,
+                    Listing.is_active == True,  # noqa: E712
+                    Listing.status == 'approved'
+                )
+            )
+            user_listings = result.scalars().all()
 
             # Log the results
             logger.debug(f"Found {len(user_listings)} active listings for user {user_id}")
+            messages = []
             for listing in user_listings:
                 logger.debug(f"Listing ID: {listing.id}, Status: {listing.status}, Active: {listing.is_active}")
+                messages.append((listing.id, format_listing_message(listing)))
 
-            if not user_listings:
-                await update.message.reply_text(
-                    "У вас пока нет активных объявлений. Используйте команду /create чтобы создать новое!"
-                )
-                return
+        if not messages:
+            await update.message.reply_text(
+                "У вас пока нет активных объявлений. Используйте команду /create чтобы создать новое!"
+            )
+            return
 
-            for listing in user_listings:
-                message_text = format_listing_message(listing)
-                logger.debug(f"Formatted message for listing {listing.id}: {message_text[:100]}...")
+        for listing_id, message_text in messages:
+            logger.debug(f"Formatted message for listing {listing_id}: {message_text[:100]}...")
 
+            try:
+                await update.message.reply_text(
+                    message_text,
+                    parse_mode='MarkdownV2',  # Changed to MarkdownV2 for better compatibility
+                    reply_markup=create_listing_management_keyboard(listing_id)
+                )
+                logger.debug(f"Successfully sent message for listing {listing_id}")
+            except telegram_error.BadRequest as e:
+                logger.error(f"Failed to send listing {listing_id} to user {user_id}: {e}")
+                # Try sending without Markdown formatting if it fails
                 try:
                     await update.message.reply_text(
                         message_text,
-                        parse_mode='MarkdownV2',  # Changed to MarkdownV2 for better compatibility
-                        reply_markup=create_listing_management_keyboard(listing.id)
+                        reply_markup=create_listing_management_keyboard(listing_id)
                     )
-                    logger.debug(f"Successfully sent message for listing {listing.id}")
                 except telegram_error.BadRequest as e:
-                    logger.error(f"Failed to send listing {listing.id} to user {user_id}: {e}")
-                    # Try sending without Markdown formatting if it fails
-                    try:
-                        await update.message.reply_text(
-                            message_text,
-                            reply_markup=create_listing_management_keyboard(listing.id)
-                        )
-                    except telegram_error.BadRequest as e:
-                        logger.error(f"Failed to send listing without markdown: {e}")
-                    continue
+                    logger.error(f"Failed to send listing without markdown: {e}")
+                continue
 
     except SQLAlchemyError as e:
         logger.error(f"Database error in manage command for user {user_id}: {e}", exc_info=True)
@@ -86,93 +101,78 @@ async def handle_listing_action(update: Update, context: ContextTypes.DEFAULT_TY
         action, listing_id = query.data.split('_')
         listing_id = int(listing_id)
 
+        # Ответы отправляются после закрытия сессии, чтобы не держать
+        # соединение (и блокировку записи SQLite) во время запроса к Telegram
         if action == "refresh":
-            with session_scope() as session:
-                listing = session.query(Listing).filter_by(id=listing_id).first()
-                if listing:
-                    try:
-                        # Проверяем существование сообщения в канале
-                        try:
-                            await context.bot.get_chat_message(
-                                chat_id=config.LISTINGS_CHANNEL_ID,
-                                message_id=listing.message_id
-                            )
-                        except telegram_error.BadRequest:
-                            await query.message.reply_text("❌ Сообщение не найдено в канале")
-                            # Сбрасываем message_id так как сообщение не существует
-                            listing.message_id = None
-                            session.commit()
-                            return
-
-                        # Сначала отправляем новое сообщение
-                        new_message = await context.bot.send_message(
-                            chat_id=config.LISTINGS_CHANNEL_ID,
-                            text=format_listing_message(listing),
-                            parse_mode='MarkdownV2' #Changed to MarkdownV2 for better compatibility
-                        )
+            error = None
+            async with async_session_scope() as session:
+                listing = await session.get(Listing, listing_id)
 
-                        # После успешной отправки нового сообщения удаляем старое
-                        if listing.message_id:
-                            try:
-                                await context.bot.delete_message(
-                                    chat_id=config.LISTINGS_CHANNEL_ID,
-                                    message_id=listing.message_id
-                                )
-                            except telegram_error.BadRequest:
-                                logger.warning(f"Could not delete old message {listing.message_id}")
-
-                        # Обновляем ID сообщения в базе данных
-                        listing.message_id = new_message.message_id
-                        session.commit()
-                        await query.message.reply_text("✅ Объявление обновлено!")
-                    except Exception as e:
-                        logger.error(f"Error refreshing message: {e}")
-                        await query.message.reply_text("❌ Не удалось обновить объявление")
+                if not listing:
+                    error = "❌ Объявление не найдено"
+                # Проверяем, что объявление опубликовано в канале
+                elif not listing.message_id:
+                    error = "❌ Сообщение не найдено в канале"
                 else:
-                    await query.message.reply_text("❌ Объявление не найдено")
+                    cooldown = await start_refresh_cooldown(session, listing.id)
+                    if cooldown is None:
+                        error = "⏳ Объявление можно обновлять не чаще одного раза в час. Попробуйте позже."
+                    else:
+                        # Новое сообщение публикуется через outbox, старое удаляется после доставки
+                        await enqueue_listing_publication(
+                            session, listing,
+                            idempotency_key=listing_key('refresh', listing, listing.message_id)
+                        )
 
-        elif action == "delete":
-            with session_scope() as session:
-                listing = session.query(Listing).filter_by(
-                    id=listing_id,
-                    user_id=user_id,
-                    is_active=1  # SQLite boolean true is 1
-                ).first()
+            if error:
+                await query.message.reply_text(error)
+                return
 
-                if not listing:
-                    await query.message.reply_text(
-                        "Объявление не найдено или уже было удалено."
+            register_timers([cooldown])
+            kick_outbox(context)
+            await query.message.reply_text("✅ Объявление обновлено!")
+
+        elif action == "delete":
+            # Деактивация и удаление из канала фиксируются одной транзакцией
+            async with async_session_scope() as session:
+                result = await session.execute(
+                    select(Listing).filter_by(
+                        id=listing_id,
+                        user_id=user_id,
+                        is_active=True
                     )
-                    return
+                )
+                listing = result.scalars().first()
 
-                # Деактивируем объявление
-                listing.is_active = 0  # SQLite boolean false is 0
+                if listing:
+                    listing.is_active = False
 
-                # Пытаемся удалить сообщение из канала объявлений
-                if listing.message_id:
-                    try:
-                        await context.bot.delete_message(
-                            chat_id=config.LISTINGS_CHANNEL_ID,
-                            message_id=listing.message_id
-                        )
-                    except telegram_error.BadRequest as e:
-                        logger.warning(f"Could not delete message from channel: {e}")
+                    if listing.message_id:
+                        await enqueue_channel_deletion(session, listing.message_id, listing.id)
 
-                # Пытаемся удалить сообщение с кнопками управления
-                try:
-                    await query.message.delete()
-                except telegram_error.BadRequest as e:
-                    logger.warning(f"Could not delete message with buttons: {e}")
-
-                try:
-                    await context.bot.send_message(
-                        chat_id=user_id,
-                        text="✅ Ваше объявление было успешно удалено!"
+                    await enqueue_notification(
+                        session, listing_key('deleted', listing), user_id,
+                        "✅ Ваше объявление было успешно удалено!",
+                        listing_id=listing.id
                     )
-                except telegram_error.BadRequest as e:
-                    logger.warning(f"Could not send confirmation message: {e}")
 
-                session.commit()
+                    # Сработавшие в колесе таймеры без строки в базе пропускаются
+                    await session.execute(delete(ListingTimer).where(ListingTimer.listing_id == listing.id))
+
+            if not listing:
+                await query.message.reply_text(
+                    "Объявление не найдено или уже было удалено."
+                )
+                return
+
+            listings_removed([listing.id])
+            kick_outbox(context)
+
+            # Пытаемся удалить сообщение с кнопками управления
+            try:
+                await query.message.delete()
+            except telegram_error.BadRequest as e:
+                logger.warning(f"Could not delete message with buttons: {e}")
 
     except SQLAlchemyError as e:
         logger.error(f"Database error in handle_listing_action for user {user_id}: {e}", exc_info=True)
@@ -183,4 +183,37 @@ async def handle_listing_action(update: Update, context: ContextTypes.DEFAULT_TY
         logger.error(f"Unexpected error in handle_listing_action for user {user_id}: {e}", exc_info=True)
         await query.message.reply_text(
             "Произошла ошибка при выполнении действия. Пожалуйста, попробуйте позже."
-        )
\ No newline at end of file
+        )
+
+HISTORY_OUTCOMES = {
+    'active': '✅ опубликовано',
+    'pending': '⏳ на модерации',
+    'expired': '⌛️ истек срок',
+    'deleted': '🗑 удалено',
+    'rejected': '❌ отклонено',
+}
+
+async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the /history command to show user's recent listings, including archived ones."""
+    user_id = update.effective_user.id
+    try:
+        history = await user_listing_history(user_id)
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in history command for user {user_id}: {e}", exc_info=True)
+        await update.message.reply_text(
+            "Произошла ошибка при получении истории объявлений. Пожалуйста, попробуйте через несколько минут."
+        )
+        return
+
+    if not history:
+        await update.message.reply_text(
+            "У вас пока нет объявлений. Используйте команду /create чтобы создать новое!"
+        )
+        return
+
+    lines = ["🗂 Ваши последние объявления:\n"]
+    for row in history:
+        name = SEARCH_TYPES.get(row['search_type'], {}).get('name', row['search_type'])
+        created = f"{row['created_at']:%d.%m.%Y}" if row['created_at'] else '—'
+        lines.append(f"{created} · {name} · {HISTORY_OUTCOMES.get(row['outcome'], row['outcome'])}")
+    await update.message.reply_text("\n".join(lines))
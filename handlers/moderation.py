@@ -1,10 +1,12 @@
 from telegram import Update, error as telegram
 from telegram.ext import ContextTypes
+from sqlalchemy import update as sql_update
 from models.listing import Listing
-from models.database import session_scope
-from utils.formatters import format_listing_message
-from utils.keyboards import create_listing_management_keyboard
-from config import config
+from models.database import async_session_scope
+from models.outbox import listing_key
+from utils.outbox import enqueue_listing_publication, enqueue_notification, kick_outbox
+from utils.listing_events import listings_published, listings_removed
+from utils.saved_searches import enqueue_saved_search_matches
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,92 +14,123 @@ logger = logging.getLogger(__name__)
 from utils.helpers import is_admin
 
 
-async def handle_moderation_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle moderation actions (approve/decline) for listings."""
-    query = update.callback_query
+DECLINE_REASONS = [
+    "Некорректно заполнены контактные данные",
+    "Неподходящая дополнительная информация",
+    "Нарушение правил сообщества",
+    "Недостоверная информация"
+]
+LISTING_INACTIVE = "Объявление больше не активно"
+
+async def answer_callback(query, text=None, show_alert=False) -> bool:
+    """Отвечает на callback query; False, если запрос устарел."""
     try:
-        await query.answer()
-    except telegram.error.BadRequest:
+        await query.answer(text, show_alert=show_alert)
+    except telegram.BadRequest:
         logger.error("Failed to answer callback query - may be too old")
-        return
+        return False
+    return True
+
+async def moderate_listing(listing_id, action, admin_id):
+    """Переводит объявление из 'pending' в итоговый статус.
+
+    Возвращает (listing, None) при успехе или (None, текст ответа
+    модератору), если объявление нельзя обработать. Статус меняется
+    условным UPDATE ... WHERE status = 'pending', поэтому из двух
+    модераторов, нажавших кнопки одновременно, объявление получает один.
+    """
+    new_status = "approved" if action == "approve" else "rejected"
+    # Изменение статуса и исходящие сообщения фиксируются одной транзакцией
+    async with async_session_scope() as session:
+        listing = await session.get(Listing, listing_id)
+        if not listing:
+            return None, "Объявление не найдено!"
+
+        # Объявление истекло или удалено, пока ждало модерации
+        if not listing.is_active:
+            return None, LISTING_INACTIVE
+
+        # Skip moderation if listing was auto-approved
+        if listing.moderation_type == 'auto' and listing.status == 'approved':
+            return None, "Это объявление было автоматически одобрено"
+
+        claimed = await session.execute(
+            sql_update(Listing)
+            .where(Listing.id == listing_id, Listing.status == 'pending')
+            .values(status=new_status)
+        )
+        if not claimed.rowcount:
+            # Другой модератор уже обработал это объявление
+            return None, "Объявление уже обработано"
+        listing.status = new_status
+
+        if action == "approve":
+            # Post to listings channel
+            await enqueue_listing_publication(session, listing)
+
+            # Notify user about approval
+            await enqueue_notification(
+                session, listing_key('approved', listing), listing.user_id,
+                "✅ Ваше объявление было одобрено и опубликовано!",
+                listing_id=listing.id
+            )
+
+            # Subscribers are notified in the same transaction as the approval
+            await enqueue_saved_search_matches(session, listing)
+            logger.info(f"Listing {listing_id} approved by admin {admin_id}")
+
+        else:
+            reason = DECLINE_REASONS[0]  # Default reason
+            listing.rejection_reason = reason
+
+            # Notify user with reason
+            await enqueue_notification(
+                session, listing_key('declined', listing), listing.user_id,
+                f"❌ Ваше объявление было отклонено.\n\nПричина: {reason}\n\nВы можете создать новое объявление с помощью команды /create",
+                listing_id=listing.id
+            )
+            logger.info(f"Listing {listing_id} declined by admin {admin_id}")
+    return listing, None
+
+async def handle_moderation_action(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle moderation actions (approve/decline) for listings.
+
+    На callback query отвечаем один раз — после попытки занять объявление,
+    чтобы модератор увидел результат именно своего нажатия.
+    """
+    query = update.callback_query
 
     # Check if user is admin
     if not await is_admin(update, context):
-        await query.answer("У вас нет прав для этого действия!", show_alert=True)
+        await answer_callback(query, "У вас нет прав для этого действия!", show_alert=True)
         return
 
+    answered = False
     try:
         action, listing_id = query.data.split('_')[1:]
         listing_id = int(listing_id)
 
-        with session_scope() as session:
-            # Get listing from database
-            listing = session.query(Listing).filter_by(id=listing_id).first()
-            if not listing:
-                await query.answer("Объявление не найдено!", show_alert=True)
-                return
-
-            # Skip moderation if listing was auto-approved
-            if listing.moderation_type == 'auto' and listing.status == 'approved':
-                await query.answer("Это объявление было автоматически одобрено", show_alert=True)
-                return
-
-            try:
-                if action == "approve":
-                    listing.status = "approved"
-                    # Post to listings channel
-                    message = await context.bot.send_message(
-                        chat_id=config.LISTINGS_CHANNEL_ID,
-                        text=format_listing_message(listing),
-                        parse_mode='Markdown',
-                        reply_markup=create_listing_management_keyboard(listing.id)
-                    )
-                    # Обновляем существующие сообщения
-                    if listing.message_id:
-                        try:
-                            await context.bot.edit_message_text(
-                                chat_id=config.LISTINGS_CHANNEL_ID,
-                                message_id=listing.message_id,
-                                text=format_listing_message(listing),
-                                parse_mode='Markdown',
-                                reply_markup=create_listing_management_keyboard(listing.id)
-                            )
-                        except telegram.error.BadRequest:
-                            pass  # Игнорируем ошибки при обновлении старых сообщений
-                    listing.message_id = message.message_id
-
-                    # Notify user about approval
-                    await context.bot.send_message(
-                        chat_id=listing.user_id,
-                        text="✅ Ваше объявление было одобрено и опубликовано!"
-                    )
-                    logger.info(f"Listing {listing_id} approved by admin {update.effective_user.id}")
-
-                elif action == "decline":
-                    listing.status = "rejected"
-                    # Prompt admin for decline reason
-                    decline_reasons = [
-                        "Некорректно заполнены контактные данные",
-                        "Неподходящая дополнительная информация",
-                        "Нарушение правил сообщества",
-                        "Недостоверная информация"
-                    ]
-                    reason = decline_reasons[0]  # Default reason
-
-                    # Notify user with reason
-                    await context.bot.send_message(
-                        chat_id=listing.user_id,
-                        text=f"❌ Ваше объявление было отклонено.\n\nПричина: {reason}\n\nВы можете создать новое объявление с помощью команды /create"
-                    )
-                    logger.info(f"Listing {listing_id} declined by admin {update.effective_user.id}")
-
-                # Remove moderation buttons
+        listing, error = await moderate_listing(listing_id, action, update.effective_user.id)
+        answered = True
+        if error:
+            await answer_callback(query, error, show_alert=True)
+            if error == LISTING_INACTIVE:
                 await query.edit_message_reply_markup(reply_markup=None)
+            return
+        await answer_callback(query)
+
+        if listing.status == 'approved':
+            listings_published([listing])
+        else:
+            listings_removed([listing.id])
+        kick_outbox(context)
 
-            except telegram.error.BadRequest as e:
-                logger.error(f"Telegram API error while processing moderation action: {e}")
-                await query.answer("Ошибка при обработке действия. Попробуйте позже.", show_alert=True)
+        # Remove moderation buttons
+        await query.edit_message_reply_markup(reply_markup=None)
 
+    except telegram.TelegramError as e:
+        logger.error(f"Telegram API error while processing moderation action: {e}")
     except Exception as e:
         logger.error(f"Error in handle_moderation_action: {e}")
-        await query.answer("Произошла ошибка при обработке действия.", show_alert=True)
\ No newline at end of file
+        if not answered:
+            await answer_callback(query, "Произошла ошибка при обработке действия.", show_alert=True)
@@ -0,0 +1,94 @@
+"""Обработчики очереди подбора команды."""
+import logging
+from telegram import Update
+from telegram.ext import ContextTypes
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from models.listing import Listing
+from models.database import async_session_scope
+from utils.matchmaking import (
+    CREW_SIZES, QueueTicket, get_matchmaking_queue, notify_crew
+)
+from handlers.search import parse_search_query
+
+logger = logging.getLogger(__name__)
+
+QUEUE_FIELDS = ('server', 'platform', 'search_goal', 'ship_type')
+LEAVE_WORDS = ('leave', 'выйти', 'стоп')
+
+PARTY_HELP = (
+    "⚓️ Быстрый подбор команды\n\n"
+    "Встаньте в очередь, и бот соберет экипаж, как только наберется нужное число игроков "
+    "(шлюп — 2, бригантина — 3, галеон — 4):\n"
+    "/party сервер=Европа платформа=PC цель=PvE корабль=Шлюп\n\n"
+    "Если у вас есть объявление «Поиск пати», недостающие параметры берутся из него.\n"
+    "Выйти из очереди: /party выйти"
+)
+
+async def party_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the /party command: join or leave the matchmaking queue."""
+    user = update.effective_user
+    queue = get_matchmaking_queue()
+    args = context.args or []
+
+    if args and args[0].lower() in LEAVE_WORDS:
+        if queue.leave(user.id):
+            await update.message.reply_text("Вы вышли из очереди подбора команды.")
+        else:
+            await update.message.reply_text("Вы не стоите в очереди. Встать в очередь: /party")
+        return
+
+    try:
+        text, filters, ranges = parse_search_query(' '.join(args))
+        if text or ranges or set(filters) - set(QUEUE_FIELDS):
+            raise ValueError("Для очереди доступны только сервер, платформа, цель и корабль")
+        if any(len(values) > 1 for values in filters.values()):
+            raise ValueError("Укажите по одному значению каждого параметра")
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}\n\n{PARTY_HELP}")
+        return
+    values = {field: next(iter(selected)) for field, selected in filters.items()}
+
+    contacts = None
+    try:
+        async with async_session_scope() as session:
+            result = await session.execute(
+                select(Listing).where(
+                    Listing.user_id == user.id,
+                    Listing.is_active == True,  # noqa: E712
+                    Listing.status == 'approved',
+                    Listing.search_type == 'party'
+                ).order_by(Listing.id.desc())
+            )
+            listing = result.scalars().first()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in party command for user {user.id}: {e}", exc_info=True)
+        listing = None
+
+    if listing:
+        for field in QUEUE_FIELDS:
+            values.setdefault(field, getattr(listing, field))
+        contacts = listing.contacts
+
+    missing = [field for field in QUEUE_FIELDS if field not in values]
+    if missing or values['ship_type'] not in CREW_SIZES:
+        await update.message.reply_text(PARTY_HELP)
+        return
+
+    bucket = tuple(values[field] for field in QUEUE_FIELDS)
+    display_name = f"@{user.username}" if user.username else user.full_name
+    crew = queue.join(QueueTicket(user.id, bucket, display_name, contacts))
+
+    if crew:
+        logger.info(f"Matched crew of {len(crew)} in {bucket}")
+        await notify_crew(context.bot, crew)
+        return
+
+    waiting = queue.waiting(bucket)
+    await update.message.reply_text(
+        f"🔎 Вы в очереди: {values['server']}, {values['platform']}, {values['search_goal']}, "
+        f"{values['ship_type'].lower()}.\n"
+        f"Ждут команду: {waiting} из {CREW_SIZES[values['ship_type']]}. "
+        f"Мы напишем, как только экипаж соберется.\n\n"
+        "Выйти из очереди: /party выйти"
+    )
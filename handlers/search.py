@@ -0,0 +1,211 @@
+"""Обработчики поиска объявлений."""
+import re
+import logging
+from telegram import Update, error as telegram_error
+from telegram.ext import ContextTypes
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from models.listing import Listing
+from models.database import async_session_scope
+from utils.constants import (
+    GENDERS, ROLES, FACTIONS, SERVERS, SHIP_TYPES, PLATFORMS,
+    SEARCH_TYPES, SEARCH_GOALS
+)
+from utils.formatters import format_listing_message
+from utils.search_index import get_search_index
+from utils.fulltext import search_fulltext, query_terms, FULLTEXT_CANDIDATES
+from utils.recommender import get_recommender, RECOMMEND_LIMIT
+
+logger = logging.getLogger(__name__)
+
+SEARCH_RESULTS_LIMIT = 5
+
+# Имена фильтров: английские совпадают с полями объявления
+FILTER_ALIASES = {
+    'type': 'search_type', 'тип': 'search_type',
+    'goal': 'search_goal', 'цель': 'search_goal',
+    'gender': 'gender', 'пол': 'gender',
+    'role': 'role', 'роль': 'role',
+    'faction': 'faction', 'фракция': 'faction',
+    'server': 'server', 'region': 'server', 'сервер': 'server', 'регион': 'server',
+    'ship': 'ship_type', 'корабль': 'ship_type',
+    'platform': 'platform', 'платформа': 'platform',
+    'age': 'age', 'возраст': 'age',
+    'exp': 'experience', 'experience': 'experience', 'опыт': 'experience',
+    'text': 'text', 'текст': 'text',
+}
+
+FIELD_CHOICES = {
+    'search_type': {**{key: key for key in SEARCH_TYPES},
+                    **{data['name'].lower(): key for key, data in SEARCH_TYPES.items()}},
+    'search_goal': {value.lower(): value for value in SEARCH_GOALS},
+    'gender': {value.lower(): value for value in GENDERS},
+    'role': {value.lower(): value for value in ROLES},
+    'faction': {value.lower(): value for value in FACTIONS},
+    'server': {value.lower(): value for value in SERVERS},
+    'ship_type': {value.lower(): value for value in SHIP_TYPES},
+    'platform': {value.lower(): value for value in PLATFORMS},
+}
+
+SEARCH_HELP = (
+    "🔎 Поиск объявлений\n\n"
+    "Укажите фильтры в виде имя=значение, например:\n"
+    "/search тип=player сервер=Европа роль=Рулевой возраст=18-30\n\n"
+    "Фильтры: тип, цель, пол, роль, фракция, сервер, корабль, платформа, "
+    "возраст и опыт (диапазоны вида 18-30, 100- или -50).\n"
+    "Несколько значений перечисляются через запятую: роль=Мейн,Саппорт\n\n"
+    "Слова перед фильтрами ищутся в описании объявления:\n"
+    "/search tall tales арена сервер=Европа"
+)
+
+_FILTER_RE = re.compile(r'(?:^|\s)(\w+)=')
+
+def parse_search_query(text):
+    """Разбирает '[слова] имя=значение ...' в (text, filters, ranges).
+
+    Слова до первого фильтра (или значение фильтра 'текст') ищутся в
+    описании объявления. Значения могут содержать пробелы: значение
+    длится до следующего 'имя='.
+    """
+    parts = _FILTER_RE.split(text)
+    words = [parts[0].strip()]
+
+    filters, ranges = {}, {}
+    for name, raw_value in zip(parts[1::2], parts[2::2]):
+        field = FILTER_ALIASES.get(name.lower())
+        value = raw_value.strip()
+        if not field:
+            raise ValueError(f"Неизвестный фильтр: {name}")
+        if not value:
+            raise ValueError(f"Не указано значение фильтра {name}")
+
+        if field == 'text':
+            words.append(value)
+        elif field in FIELD_CHOICES:
+            choices = FIELD_CHOICES[field]
+            selected = set()
+            for option in value.split(','):
+                option = option.strip().lower()
+                if option not in choices:
+                    raise ValueError(f"Недопустимое значение {name}: {option}")
+                selected.add(choices[option])
+            filters[field] = selected
+        else:
+            match = re.fullmatch(r'(\d*)\s*-\s*(\d*)|(\d+)', value)
+            if not match or value.strip() == '-':
+                raise ValueError(f"{name}: укажите число или диапазон, например 18-30")
+            if match.group(3):
+                ranges[field] = (int(match.group(3)), int(match.group(3)))
+            else:
+                low, high = match.group(1), match.group(2)
+                ranges[field] = (int(low) if low else None, int(high) if high else None)
+
+    return ' '.join(word for word in words if word), filters, ranges
+
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the /search command: filter published listings through the in-memory index."""
+    query_text = ' '.join(context.args or [])
+    if not query_text:
+        await update.message.reply_text(SEARCH_HELP)
+        return
+
+    try:
+        text, filters, ranges = parse_search_query(query_text)
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}\n\n{SEARCH_HELP}")
+        return
+
+    if text and not query_terms(text):
+        await update.message.reply_text(f"❌ В запросе нет слов для поиска\n\n{SEARCH_HELP}")
+        return
+
+    if text:
+        # Ранжированные совпадения FTS, отфильтрованные битовым индексом
+        try:
+            matches = await search_fulltext(text)
+        except SQLAlchemyError as e:
+            logger.error(f"Full-text search failed for {text!r}: {e}", exc_info=True)
+            await update.message.reply_text(
+                "Произошла ошибка при поиске объявлений. Пожалуйста, попробуйте через несколько минут."
+            )
+            return
+        # FTS отдает не больше FULLTEXT_CANDIDATES лучших: тогда точное число неизвестно
+        truncated = len(matches) >= FULLTEXT_CANDIDATES
+        matches = get_search_index().filter_ids(matches, filters, ranges)
+        count, listing_ids = len(matches), matches[:SEARCH_RESULTS_LIMIT]
+        shown = "самых подходящих"
+    else:
+        count, listing_ids = get_search_index().search(filters, ranges, limit=SEARCH_RESULTS_LIMIT)
+        truncated = False
+        shown = "самых новых"
+
+    if not count:
+        await update.message.reply_text("По вашему запросу ничего не найдено.")
+        return
+
+    await update.message.reply_text(
+        f"🔎 Найдено объявлений: {count}{'+' if truncated else ''}" +
+        (f"\nПоказаны {len(listing_ids)} {shown}" if truncated or count > len(listing_ids) else "")
+    )
+    await send_listings(update, listing_ids)
+
+async def send_listings(update: Update, listing_ids):
+    """Send listings in the given order, one message each."""
+    try:
+        async with async_session_scope() as session:
+            result = await session.execute(select(Listing).where(Listing.id.in_(listing_ids)))
+            listings = {listing.id: listing for listing in result.scalars().all()}
+    except SQLAlchemyError as e:
+        logger.error(f"Database error while loading listings {listing_ids}: {e}", exc_info=True)
+        await update.message.reply_text(
+            "Произошла ошибка при получении объявлений. Пожалуйста, попробуйте через несколько минут."
+        )
+        return
+
+    for listing_id in listing_ids:
+        listing = listings.get(listing_id)
+        if not listing:
+            continue
+        message_text = format_listing_message(listing)
+        try:
+            await update.message.reply_text(message_text, parse_mode='MarkdownV2')
+        except telegram_error.BadRequest as e:
+            logger.error(f"Failed to send listing {listing_id}: {e}")
+            await update.message.reply_text(message_text)
+
+async def recommend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the /recommend command: suggest listings similar to the user's own."""
+    user_id = update.effective_user.id
+    try:
+        async with async_session_scope() as session:
+            result = await session.execute(
+                select(Listing).where(
+                    Listing.user_id == user_id,
+                    Listing.is_active == True,  # noqa: E712
+                    Listing.status != 'rejected'
+                ).order_by(Listing.id.desc())
+            )
+            listing = result.scalars().first()
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in recommend command for user {user_id}: {e}", exc_info=True)
+        await update.message.reply_text(
+            "Произошла ошибка при подборе напарников. Пожалуйста, попробуйте через несколько минут."
+        )
+        return
+
+    if not listing:
+        await update.message.reply_text(
+            "Рекомендации подбираются по вашему объявлению. "
+            "Создайте его командой /create, и мы найдем похожих игроков!"
+        )
+        return
+
+    listing_ids = get_recommender().recommend(listing, limit=RECOMMEND_LIMIT)
+    if not listing_ids:
+        await update.message.reply_text(
+            "Пока нет подходящих объявлений на вашем сервере и платформе. Попробуйте позже!"
+        )
+        return
+
+    await update.message.reply_text("🤝 Игроки с похожими параметрами:")
+    await send_listings(update, listing_ids)
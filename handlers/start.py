@@ -1,7 +1,8 @@
 """Обработчики команды /start."""
-from telegram import Update, ReplyKeyboardMarkup
+from telegram import Update
 from telegram.ext import ContextTypes
 from utils.helpers import is_admin
+from utils.keyboards import get_keyboard
 import logging
 
 logger = logging.getLogger(__name__)
@@ -25,21 +26,7 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if await is_admin(update, context):
             base_message += "\n/admin - Панель администратора"
 
-        # Create keyboard with one row of three buttons
-        keyboard = [
-            [
-                "Создать анкету",
-                "Мои анкеты",
-                "Отмена"
-            ]
-        ]
-        reply_markup = ReplyKeyboardMarkup(
-            keyboard,
-            resize_keyboard=True,
-            one_time_keyboard=False  # Keep keyboard visible
-        )
-
-        await update.message.reply_text(base_message, reply_markup=reply_markup)
+        await update.message.reply_text(base_message, reply_markup=get_keyboard('start_menu'))
         logger.info(f"Start command processed successfully for user {user_id}")
 
     except Exception as e:
@@ -0,0 +1,150 @@
+"""Обработчики подписок на новые объявления."""
+import logging
+from telegram import Update
+from telegram.ext import ContextTypes
+from sqlalchemy import select, delete, func
+from sqlalchemy.exc import SQLAlchemyError
+from models.database import async_session_scope
+from models.saved_search import SavedSearch
+from utils.constants import SEARCH_TYPES
+from utils.saved_searches import (
+    SUBSCRIPTION_FIELDS, MAX_SAVED_SEARCHES,
+    register_saved_search, unregister_saved_searches
+)
+from handlers.search import parse_search_query
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBE_HELP = (
+    "🔔 Подписка на новые объявления\n\n"
+    "Сохраните фильтр, и бот пришлет сообщение, когда появится подходящее объявление:\n"
+    "/subscribe тип=team сервер=Европа платформа=PC роль=Рулевой цель=PvP опыт=100-500\n\n"
+    "Фильтры: тип, сервер, платформа, роль, цель (по одному значению) и опыт.\n"
+    f"Можно сохранить до {MAX_SAVED_SEARCHES} подписок. Отключить: /unsubscribe <номер> или /unsubscribe all"
+)
+
+FIELD_LABELS = {
+    'search_type': 'тип',
+    'server': 'сервер',
+    'platform': 'платформа',
+    'role': 'роль',
+    'search_goal': 'цель',
+}
+
+def describe_saved_search(saved_search) -> str:
+    parts = []
+    for field, label in FIELD_LABELS.items():
+        value = getattr(saved_search, field)
+        if value:
+            if field == 'search_type':
+                value = SEARCH_TYPES.get(value, {}).get('name', value)
+            parts.append(f"{label}: {value}")
+    low, high = saved_search.experience_min, saved_search.experience_max
+    if low is not None or high is not None:
+        parts.append(f"опыт: {low if low is not None else 0}–{high if high is not None else '∞'}")
+    return ', '.join(parts) or 'все объявления'
+
+def parse_subscription(query_text):
+    """Разбирает фильтр подписки в значения полей SavedSearch."""
+    text, filters, ranges = parse_search_query(query_text)
+    if text:
+        raise ValueError("Подписка не поддерживает поиск по тексту")
+
+    values = {}
+    for field, selected in filters.items():
+        if field not in SUBSCRIPTION_FIELDS:
+            raise ValueError("Фильтр недоступен для подписки")
+        if len(selected) > 1:
+            raise ValueError("Для подписки укажите одно значение каждого фильтра")
+        values[field] = next(iter(selected))
+    for field, (low, high) in ranges.items():
+        if field != 'experience':
+            raise ValueError("Для подписки доступен только диапазон опыта")
+        values['experience_min'], values['experience_max'] = low, high
+    if not values:
+        raise ValueError("Укажите хотя бы один фильтр")
+    return values
+
+async def subscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the /subscribe command: list or save a saved search."""
+    user_id = update.effective_user.id
+    query_text = ' '.join(context.args or [])
+
+    try:
+        if not query_text:
+            async with async_session_scope() as session:
+                result = await session.execute(
+                    select(SavedSearch).where(SavedSearch.user_id == user_id).order_by(SavedSearch.id)
+                )
+                saved_searches = result.scalars().all()
+
+            lines = [SUBSCRIBE_HELP]
+            if saved_searches:
+                lines.append("\nВаши подписки:")
+                lines += [f"#{s.id} — {describe_saved_search(s)}" for s in saved_searches]
+            await update.message.reply_text("\n".join(lines))
+            return
+
+        try:
+            values = parse_subscription(query_text)
+        except ValueError as e:
+            await update.message.reply_text(f"❌ {e}\n\n{SUBSCRIBE_HELP}")
+            return
+
+        saved_search = None
+        async with async_session_scope() as session:
+            count = (await session.execute(
+                select(func.count()).select_from(SavedSearch).where(SavedSearch.user_id == user_id)
+            )).scalar()
+            if count < MAX_SAVED_SEARCHES:
+                saved_search = SavedSearch(user_id=user_id, **values)
+                session.add(saved_search)
+                await session.flush()
+
+        # Ответ отправляется после закрытия сессии
+        if saved_search is None:
+            await update.message.reply_text(
+                f"❌ Можно сохранить не больше {MAX_SAVED_SEARCHES} подписок. "
+                "Удалите ненужную командой /unsubscribe <номер>"
+            )
+            return
+
+        register_saved_search(saved_search)
+        await update.message.reply_text(
+            f"✅ Подписка #{saved_search.id} сохранена: {describe_saved_search(saved_search)}\n"
+            "Мы напишем, когда появится подходящее объявление."
+        )
+
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in subscribe command for user {user_id}: {e}", exc_info=True)
+        await update.message.reply_text(
+            "Произошла ошибка при сохранении подписки. Пожалуйста, попробуйте через несколько минут."
+        )
+
+async def unsubscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the /unsubscribe command: delete one or all saved searches."""
+    user_id = update.effective_user.id
+    arg = (context.args or [''])[0].lstrip('#').lower()
+    if arg != 'all' and not arg.isdigit():
+        await update.message.reply_text("Укажите номер подписки или all: /unsubscribe 12")
+        return
+
+    try:
+        async with async_session_scope() as session:
+            condition = SavedSearch.user_id == user_id
+            if arg != 'all':
+                condition &= SavedSearch.id == int(arg)
+            result = await session.execute(delete(SavedSearch).where(condition).returning(SavedSearch.id))
+            removed = list(result.scalars())
+    except SQLAlchemyError as e:
+        logger.error(f"Database error in unsubscribe command for user {user_id}: {e}", exc_info=True)
+        await update.message.reply_text(
+            "Произошла ошибка при удалении подписки. Пожалуйста, попробуйте через несколько минут."
+        )
+        return
+
+    unregister_saved_searches(removed)
+    if removed:
+        await update.message.reply_text(f"✅ Удалено подписок: {len(removed)}")
+    else:
+        await update.message.reply_text("Подписка не найдена. Список подписок: /subscribe")
@@ -1,4 +1,8 @@
-from .database import Base, engine, session_scope, init_db
-from .listing import Listing
+from .database import Base, engine, async_engine, session_scope, async_session_scope, init_db
+from .listing import Listing, ActiveListingExistsError
+from .outbox import OutboxMessage
+from .timer import ListingTimer
+from .archive import ListingArchive
+from .saved_search import SavedSearch
 
-__all__ = ['Listing', 'Base', 'engine', 'session_scope', 'init_db']
\ No newline at end of file
+__all__ = ['Listing', 'ActiveListingExistsError', 'OutboxMessage', 'ListingTimer', 'ListingArchive', 'SavedSearch', 'Base', 'engine', 'async_engine', 'session_scope', 'async_session_scope', 'init_db']
\ No newline at end of file
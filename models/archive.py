@@ -0,0 +1,97 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Index, select, union_all, literal, case
+from models.database import Base
+from models.listing import Listing
+
+class ListingArchive(Base):
+    """Завершенное объявление, перенесенное из listings.
+
+    Хранит только поля, нужные для статистики и истории пользователя:
+    контакты и текст объявления не архивируются.
+    """
+    __tablename__ = 'listings_archive'
+
+    id = Column(Integer, primary_key=True)
+    # Идентификаторы объявлений могут повторяться после очистки таблицы
+    listing_id = Column(Integer, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    nickname = Column(String(100), nullable=False)
+    gender = Column(String(20))
+    age = Column(Integer)
+    experience = Column(Integer)
+    role = Column(String(50))
+    faction = Column(String(50))
+    server = Column(String(20))
+    ship_type = Column(String(20))
+    platform = Column(String(20))
+    search_type = Column(String(20), nullable=False)
+    search_goal = Column(String(20))
+    moderation_type = Column(String(20))
+    status = Column(String(20))
+    outcome = Column(String(20), nullable=False)  # 'rejected', 'deleted' или 'expired'
+    rejection_reason = Column(String(200))
+    created_at = Column(DateTime)
+    expires_at = Column(DateTime)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_listings_archive_user_created', 'user_id', 'created_at'),
+        Index('ix_listings_archive_created', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f"<ListingArchive(id={self.id}, listing_id={self.listing_id}, outcome='{self.outcome}')>"
+
+# Поля, общие для listings и listings_archive
+ARCHIVED_FIELDS = (
+    'user_id', 'nickname', 'gender', 'age', 'experience', 'role', 'faction',
+    'server', 'ship_type', 'platform', 'search_type', 'search_goal',
+    'moderation_type', 'status', 'rejection_reason', 'created_at', 'expires_at',
+)
+
+def listing_outcome(listing, now=None) -> str:
+    """Итог завершенного объявления для архива."""
+    now = now or datetime.utcnow()
+    if listing.status == 'rejected':
+        return 'rejected'
+    if listing.expires_at and listing.expires_at <= now:
+        return 'expired'
+    return 'deleted'
+
+def to_archive(listing, now=None) -> ListingArchive:
+    return ListingArchive(
+        listing_id=listing.id,
+        outcome=listing_outcome(listing, now),
+        **{field: getattr(listing, field) for field in ARCHIVED_FIELDS}
+    )
+
+def all_listings_query(*columns):
+    """UNION ALL текущих и архивных объявлений.
+
+    Возвращает подзапрос со столбцами listing_id, outcome и перечисленными
+    в columns полями (по умолчанию всеми из ARCHIVED_FIELDS). Для текущих
+    объявлений outcome — 'active', 'pending', либо итог, если объявление
+    уже завершено, но еще не перенесено в архив.
+    """
+    columns = columns or ARCHIVED_FIELDS
+    now = datetime.utcnow()
+    live_outcome = case(
+        (Listing.status == 'rejected', 'rejected'),
+        (Listing.is_active == False, case(  # noqa: E712
+            (Listing.expires_at <= now, 'expired'), else_='deleted')),
+        (Listing.status == 'pending', 'pending'),
+        else_='active'
+    )
+    live = select(
+        Listing.id.label('listing_id'),
+        live_outcome.label('outcome'),
+        literal(False).label('archived'),
+        *(getattr(Listing, column) for column in columns)
+    )
+    archived = select(
+        ListingArchive.listing_id,
+        ListingArchive.outcome,
+        literal(True).label('archived'),
+        *(getattr(ListingArchive, column) for column in columns)
+    )
+    return union_all(live, archived).subquery('all_listings')
@@ -1,23 +1,155 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 from config import config
 import logging
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
 import os
 
 logger = logging.getLogger(__name__)
 
 Base = declarative_base()
 
-# Configure SQLite engine
-database_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'bot.db'))
-engine = create_engine(
-    f'sqlite:///{database_path}',
-    connect_args={'check_same_thread': False},  # Allow multi-threading for SQLite
-)
+# Async drivers used for each sync dialect
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+}
+
+# Sync drivers pinned for URLs without an explicit driver
+SYNC_DRIVERS = {
+    'postgresql': 'postgresql+psycopg2',
+}
+
+def normalize_url(url: str) -> str:
+    """Accept Heroku-style postgres:// URLs and pin the sync driver."""
+    scheme, sep, rest = url.partition('://')
+    if scheme == 'postgres':
+        scheme = 'postgresql'
+    return f"{SYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+def to_async_url(url: str) -> str:
+    """Convert a sync SQLAlchemy URL into its async driver counterpart."""
+    scheme, sep, rest = normalize_url(url).partition('://')
+    dialect = scheme.split('+', 1)[0]
+    if dialect not in ASYNC_DRIVERS:
+        raise ValueError(f"Unsupported database dialect for async engine: {dialect}")
+    return f"{ASYNC_DRIVERS[dialect]}{sep}{rest}"
+
+def engine_options(url, is_async: bool) -> dict:
+    """Dialect-specific engine arguments: pooling and session settings."""
+    if url.get_backend_name() == 'sqlite':
+        # A single file: the default pools fit, threads may share connections
+        return {'connect_args': {'check_same_thread': False}} if not is_async else {}
+
+    options = {
+        'pool_pre_ping': True,  # drop connections closed by the server or a proxy
+        'pool_recycle': config.DB_POOL_RECYCLE,
+        'pool_timeout': config.DB_POOL_TIMEOUT,
+    }
+    if is_async:
+        options.update(
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+        )
+    else:
+        # The sync engine only runs migrations and scripts
+        options.update(pool_size=1, max_overflow=2)
+
+    if url.get_backend_name() == 'postgresql':
+        settings = {
+            'application_name': 'sot_tmbot',
+            'statement_timeout': str(config.DB_STATEMENT_TIMEOUT_MS),
+            'timezone': 'UTC',
+        }
+        if is_async:
+            options['connect_args'] = {'server_settings': settings}
+        else:
+            options['connect_args'] = {
+                'options': ' '.join(f'-c {key}={value}' for key, value in settings.items())
+            }
+    return options
+
+database_url = normalize_url(config.DATABASE_URL)
+_url = make_url(database_url)
+dialect_name = _url.get_backend_name()
+# Path of the SQLite file, None for server databases
+database_path = os.path.abspath(_url.database) if dialect_name == 'sqlite' and _url.database else None
+
+engine = create_engine(database_url, **engine_options(_url, is_async=False))
 
 Session = sessionmaker(bind=engine)
 
+# Async engine for handlers, so DB I/O never blocks the event loop
+async_engine = create_async_engine(to_async_url(database_url), **engine_options(_url, is_async=True))
+
+# With WAL shipping the shipper checkpoints every ~1000 frames. Application
+# connections checkpoint only as a fallback, when the WAL is ten times larger
+# (the shipper is failing or the bot is not running): the WAL stays bounded,
+# and the shipper sees the reset and starts a new generation
+WAL_SHIPPING_AUTOCHECKPOINT = 10000  # pages
+
+# SQLite pragma profiles applied on every connect, in this order
+SQLITE_PROFILES = {
+    # WAL lets readers run alongside the writer; NORMAL sync is durable
+    # against process crashes and loses at most the last commits on power loss
+    'performance': {
+        'auto_vacuum': 'INCREMENTAL',  # must precede journal_mode; new databases only
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # KiB
+        'temp_store': 'MEMORY',
+    },
+    'durable': {
+        'auto_vacuum': 'INCREMENTAL',
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'busy_timeout': 5000,
+        'cache_size': -16 * 1024,
+    },
+}
+
+def sqlite_pragmas() -> dict:
+    """Pragmas of the configured profile with SQLITE_PRAGMAS overrides."""
+    if config.SQLITE_PROFILE not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLITE_PROFILE: {config.SQLITE_PROFILE}")
+    pragmas = dict(SQLITE_PROFILES[config.SQLITE_PROFILE])
+    for item in filter(None, (part.strip() for part in config.SQLITE_PRAGMAS.split(','))):
+        name, _, value = item.partition('=')
+        pragmas[name.strip()] = value.strip()
+    if config.WAL_SHIPPING:
+        # The WAL shipper checkpoints; autocheckpoint is only a fallback
+        pragmas['wal_autocheckpoint'] = WAL_SHIPPING_AUTOCHECKPOINT
+    return pragmas
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in sqlite_pragmas().items():
+        cursor.execute(f'PRAGMA {name}={value}')
+    cursor.close()
+
+if dialect_name == 'sqlite':
+    for _engine in (engine, async_engine.sync_engine):
+        event.listen(_engine, 'connect', _set_sqlite_pragmas)
+
+def log_database_settings():
+    """Log the effective connection settings at startup."""
+    if dialect_name != 'sqlite':
+        logger.info(f"Database: {dialect_name}, pool size {config.DB_POOL_SIZE}, "
+                    f"max overflow {config.DB_MAX_OVERFLOW}")
+        return
+    with engine.connect() as connection:
+        effective = {
+            name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+            for name in list(sqlite_pragmas()) + ['page_size', 'freelist_count']
+        }
+    logger.info(f"SQLite profile '{config.SQLITE_PROFILE}' at {database_path}: {effective}")
+
+# expire_on_commit=False keeps loaded attributes usable after the transaction ends
+AsyncSession = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
 @contextmanager
 def session_scope():
     """Provide a transactional scope around a series of operations."""
@@ -32,12 +164,56 @@ def session_scope():
     finally:
         session.close()
 
+@asynccontextmanager
+async def async_session_scope():
+    """Provide an async transactional scope around a series of operations."""
+    session = AsyncSession()
+    try:
+        yield session
+        await session.commit()
+    except Exception as e:
+        logger.error(f"Database session error: {e}")
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
+
 def init_db():
     """Initialize database and create all tables."""
     try:
         from models.listing import Listing  # noqa: F401
+        from models.outbox import OutboxMessage  # noqa: F401
+        from models.timer import ListingTimer  # noqa: F401
+        from models.archive import ListingArchive  # noqa: F401
+        from models.saved_search import SavedSearch  # noqa: F401
+        from models.migrations import run_migrations
         Base.metadata.create_all(engine)
+        run_migrations(engine)
+        log_database_settings()
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Database initialization error: {e}")
-        raise
\ No newline at end of file
+        raise
+
+async def reset_id_sequence(session, table_name: str, column: str = 'id'):
+    """Restart id numbering of an emptied table on any supported dialect."""
+    if dialect_name == 'postgresql':
+        await session.execute(
+            text("SELECT setval(pg_get_serial_sequence(:table, :column), 1, false)"),
+            {'table': table_name, 'column': column}
+        )
+    elif dialect_name == 'sqlite':
+        # Without AUTOINCREMENT SQLite reuses max(rowid) + 1; the sequence table
+        # exists only for AUTOINCREMENT tables
+        exists = await session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_sequence'")
+        )
+        if exists.first():
+            await session.execute(text("DELETE FROM sqlite_sequence WHERE name = :table"), {'table': table_name})
+    else:
+        logger.warning(f"Id sequence reset is not supported for {dialect_name}")
+
+async def dispose_engines():
+    """Close pooled connections of both engines."""
+    await async_engine.dispose()
+    engine.dispose()
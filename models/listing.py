@@ -1,5 +1,6 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, event
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Index, event, inspect
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import validates
 from models.database import Base
 import logging
@@ -30,8 +31,17 @@ class Listing(Base):
     rejection_reason = Column(String(200))  # For storing rejection reasons
     created_at = Column(DateTime, default=datetime.utcnow)
     expires_at = Column(DateTime)
-    is_active = Column(Boolean, default=True)  # SQLite will store as 0/1
+    is_active = Column(Boolean, default=True)
     message_id = Column(Integer)
+    # Растет при изменении отображаемых полей; ключ кэша отрисовки
+    version = Column(Integer, nullable=False, default=1, server_default='1')
+
+    __table_args__ = (
+        # /create, /manage и проверка активных объявлений пользователя
+        Index('ix_listings_user_active_status', 'user_id', 'is_active', 'status'),
+        # Выборка объявлений с истекшим сроком
+        Index('ix_listings_status_expires', 'status', 'expires_at'),
+    )
 
     def __repr__(self):
         return f"<Listing(id={self.id}, user_id={self.user_id}, nickname='{self.nickname}')>"
@@ -133,26 +143,53 @@ class Listing(Base):
 
         return True, ""
 
-@event.listens_for(Listing, 'before_insert')
-def check_active_listings(mapper, connection, target):
-    """Проверяет наличие активных объявлений перед вставкой нового."""
-    try:
-        # Проверяем наличие активных объявлений для этого пользователя
-        from sqlalchemy import select, func
-        stmt = select(func.count()).select_from(Listing).where(
-            Listing.user_id == target.user_id,
-            Listing.is_active == 1,  # SQLite stores boolean as 0/1
-            Listing.status != 'rejected'
+# Поля, которые выводятся в тексте объявления
+RENDERED_FIELDS = (
+    'nickname', 'gender', 'age', 'experience', 'role', 'faction', 'server',
+    'ship_type', 'platform', 'additional_info', 'contacts', 'search_type', 'search_goal',
+)
+
+@event.listens_for(Listing, 'before_update')
+def bump_listing_version(mapper, connection, target):
+    """Увеличивает version, если изменилось отображаемое поле."""
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in RENDERED_FIELDS):
+        target.version = (target.version or 1) + 1
+
+# Не более одного активного (не отклоненного) объявления на пользователя.
+# Частичный уникальный индекс поддерживают и SQLite, и PostgreSQL.
+ACTIVE_LISTING_INDEX = 'uq_listings_one_active_per_user'
+_active_listing_predicate = (Listing.is_active == True) & (Listing.status != 'rejected')  # noqa: E712
+Index(
+    ACTIVE_LISTING_INDEX, Listing.user_id,
+    unique=True,
+    sqlite_where=_active_listing_predicate,
+    postgresql_where=_active_listing_predicate,
+)
+
+class ActiveListingExistsError(Exception):
+    """У пользователя уже есть активное объявление."""
+
+    def __init__(self, user_id=None):
+        self.user_id = user_id
+        super().__init__(
+            "У вас уже есть активное объявление. "
+            "Используйте /manage для управления существующими объявлениями."
         )
-        result = connection.execute(stmt).scalar()
-
-        if result > 0:
-            logger.error(f"User {target.user_id} already has active listings: {result}")
-            raise ValueError(
-                "У вас уже есть активное объявление. "
-                "Используйте /manage для управления существующими объявлениями."
-            )
-
-    except Exception as e:
-        logger.error(f"Error in check_active_listings: {e}", exc_info=True)
-        raise
\ No newline at end of file
+
+def is_active_listing_conflict(error: IntegrityError) -> bool:
+    """Проверяет, что IntegrityError вызван индексом активных объявлений."""
+    message = str(error.orig)
+    # PostgreSQL сообщает имя индекса, SQLite — затронутые столбцы
+    return ACTIVE_LISTING_INDEX in message or 'listings.user_id' in message
+
+async def add_listing(session, listing):
+    """Добавляет объявление, превращая нарушение индекса в ActiveListingExistsError."""
+    session.add(listing)
+    try:
+        await session.flush()
+    except IntegrityError as e:
+        if is_active_listing_conflict(e):
+            logger.info(f"User {listing.user_id} already has an active listing")
+            raise ActiveListingExistsError(listing.user_id) from e
+        raise
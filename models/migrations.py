@@ -0,0 +1,169 @@
+"""Версионированные миграции схемы базы данных.
+
+``Base.metadata.create_all`` создает только отсутствующие таблицы и не
+меняет существующие, поэтому изменения схемы для уже созданных баз
+описываются здесь. Каждая миграция выполняется в отдельной транзакции
+и должна быть идемпотентной: на новой базе create_all уже создал все
+объекты, и миграция лишь отмечается как примененная.
+"""
+from datetime import datetime, timedelta
+import logging
+
+from sqlalchemy import Table, Column, Integer, String, DateTime, inspect, select, insert, literal
+from models.database import Base
+
+logger = logging.getLogger(__name__)
+
+schema_migrations = Table(
+    'schema_migrations', Base.metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False, default=datetime.utcnow),
+)
+
+MIGRATIONS = []
+
+def migration(version: int, description: str):
+    """Регистрирует функцию миграции с номером версии."""
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+    return decorator
+
+def ensure_indexes(connection, table, exclude=()):
+    """Создает индексы модели, которых еще нет в базе (кроме перечисленных в exclude)."""
+    existing = {index['name'] for index in inspect(connection).get_indexes(table.name)}
+    for index in table.indexes:
+        if index.name not in existing and index.name not in exclude:
+            logger.info(f"Creating index {index.name} on {table.name}")
+            index.create(connection)
+
+def add_column_if_missing(connection, table, column):
+    """Добавляет столбец модели в существующую таблицу."""
+    existing = {col['name'] for col in inspect(connection).get_columns(table.name)}
+    if column.name in existing:
+        return
+    column_type = column.type.compile(dialect=connection.dialect)
+    ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    logger.info(f"Adding column {column.name} to {table.name}")
+    connection.exec_driver_sql(ddl)
+
+def run_migrations(engine):
+    """Применяет все еще не примененные миграции по порядку версий."""
+    schema_migrations.create(engine, checkfirst=True)
+    with engine.connect() as connection:
+        applied = set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+    for version, description, func in sorted(MIGRATIONS, key=lambda m: m[0]):
+        if version in applied:
+            continue
+        logger.info(f"Applying migration {version}: {description}")
+        with engine.begin() as connection:
+            func(connection)
+            connection.execute(insert(schema_migrations).values(
+                version=version,
+                description=description,
+                applied_at=datetime.utcnow()
+            ))
+
+@migration(1, "Composite indexes on listings")
+def add_listing_indexes(connection):
+    from models.listing import Listing, ACTIVE_LISTING_INDEX
+
+    # Уникальный индекс создается миграцией 2, после удаления дубликатов
+    ensure_indexes(connection, Listing.__table__, exclude=(ACTIVE_LISTING_INDEX,))
+
+@migration(2, "Partial unique index: one active listing per user")
+def add_active_listing_constraint(connection):
+    from sqlalchemy import update, func
+    from models.listing import Listing
+
+    # Старые базы могли накопить дубликаты — оставляем самое новое объявление
+    active = (Listing.is_active == True) & (Listing.status != 'rejected')  # noqa: E712
+    newest = select(func.max(Listing.id)).where(active).group_by(Listing.user_id)
+    result = connection.execute(
+        update(Listing.__table__)
+        .where(active, Listing.id.not_in(newest))
+        .values(is_active=False)
+    )
+    if result.rowcount:
+        logger.warning(f"Deactivated {result.rowcount} duplicate active listings")
+
+    remaining = connection.execute(
+        select(func.count()).select_from(
+            select(Listing.user_id).where(active).group_by(Listing.user_id)
+            .having(func.count() > 1).subquery()
+        )
+    ).scalar()
+    if remaining:
+        raise RuntimeError(f"{remaining} users still have several active listings, unique index not created")
+    ensure_indexes(connection, Listing.__table__)
+
+@migration(3, "Expiry timers for existing active listings")
+def backfill_listing_timers(connection):
+    from models.listing import Listing
+    from models.timer import ListingTimer
+
+    # Объявления, созданные до появления таймеров, получают таймер истечения срока
+    has_timer = select(ListingTimer.listing_id).where(ListingTimer.kind == 'expire')
+    result = connection.execute(
+        insert(ListingTimer.__table__).from_select(
+            ['listing_id', 'kind', 'due_at', 'created_at'],
+            select(Listing.id, literal('expire'), Listing.expires_at, literal(datetime.utcnow())).where(
+                Listing.is_active == True,  # noqa: E712
+                Listing.expires_at.is_not(None),
+                Listing.id.not_in(has_timer)
+            )
+        )
+    )
+    if result.rowcount:
+        logger.info(f"Created {result.rowcount} listing expiry timers")
+
+@migration(4, "FTS5 full-text index over listings.additional_info")
+def add_listings_fulltext_index(connection):
+    from utils.fulltext import create_fulltext_index
+
+    # Виртуальную таблицу и триггеры create_all не создает
+    create_fulltext_index(connection)
+
+@migration(5, "Render version column on listings")
+def add_listing_version(connection):
+    from models.listing import Listing
+
+    add_column_if_missing(connection, Listing.__table__, Listing.__table__.c.version)
+
+@migration(6, "Reminder timers for existing active listings")
+def backfill_reminder_timers(connection):
+    from models.listing import Listing
+    from models.timer import ListingTimer
+    from utils.constants import SEARCH_TYPES
+
+    # Миграция 3 создала только таймеры истечения срока; напоминание
+    # добавляется, если его время еще не наступило (как в schedule_listing_timers)
+    now = datetime.utcnow()
+    has_timer = select(ListingTimer.listing_id).where(ListingTimer.kind == 'remind')
+    timers = []
+    for search_type, params in SEARCH_TYPES.items():
+        remind_before = timedelta(hours=params.get('remind_before_hours') or 0)
+        if not remind_before:
+            continue
+        result = connection.execute(
+            select(Listing.id, Listing.expires_at, Listing.created_at).where(
+                Listing.is_active == True,  # noqa: E712
+                Listing.search_type == search_type,
+                Listing.expires_at > now + remind_before,
+                Listing.id.not_in(has_timer)
+            )
+        )
+        for listing_id, expires_at, created_at in result:
+            remind_at = expires_at - remind_before
+            if remind_at > (created_at or now):
+                timers.append({'listing_id': listing_id, 'kind': 'remind', 'due_at': remind_at, 'created_at': now})
+
+    if timers:
+        connection.execute(insert(ListingTimer.__table__), timers)
+        logger.info(f"Created {len(timers)} listing reminder timers")
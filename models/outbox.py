@@ -0,0 +1,103 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, Index, select
+from models.database import Base
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class OutboxMessage(Base):
+    """Исходящий вызов Bot API, записанный в одной транзакции с изменением данных."""
+    __tablename__ = 'outbox'
+
+    id = Column(Integer, primary_key=True)
+    idempotency_key = Column(String(100), nullable=False, unique=True)
+    method = Column(String(30), nullable=False)  # send_message, delete_message, ...
+    chat_id = Column(BigInteger, nullable=False)
+    payload = Column(Text, nullable=False, default='{}')  # JSON с аргументами метода
+    listing_id = Column(Integer)
+    on_delivered = Column(String(30))  # действие после успешной доставки
+    status = Column(String(20), nullable=False, default='pending')  # pending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(String(200))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+
+    __table_args__ = (
+        Index('ix_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f"<OutboxMessage(id={self.id}, key='{self.idempotency_key}', status='{self.status}')>"
+
+    @property
+    def kwargs(self) -> dict:
+        return json.loads(self.payload or '{}')
+
+def listing_key(kind: str, listing, *parts) -> str:
+    """Ключ идемпотентности для сообщения об объявлении.
+
+    id объявлений могут использоваться повторно (после очистки таблицы
+    счетчик сбрасывается), поэтому ключ включает и время создания
+    объявления: сообщения разных объявлений с одним id не совпадают.
+    """
+    created = f"{listing.created_at:%Y%m%d%H%M%S%f}" if listing.created_at else '0'
+    return ':'.join([kind, str(listing.id), created, *map(str, parts)])
+
+async def enqueue(session, idempotency_key: str, method: str, chat_id: int,
+                  listing_id=None, on_delivered=None, **kwargs):
+    """Добавляет вызов в outbox в рамках текущей транзакции.
+
+    Повторная постановка с тем же ключом игнорируется.
+    """
+    result = await session.execute(
+        select(OutboxMessage.id).where(OutboxMessage.idempotency_key == idempotency_key)
+    )
+    if result.first():
+        logger.debug(f"Outbox message {idempotency_key} already enqueued")
+        return None
+
+    message = OutboxMessage(
+        idempotency_key=idempotency_key,
+        method=method,
+        chat_id=chat_id,
+        payload=json.dumps(kwargs, ensure_ascii=False),
+        listing_id=listing_id,
+        on_delivered=on_delivered,
+    )
+    session.add(message)
+    return message
+
+# Ограничение числа параметров в одном запросе SQLite
+ENQUEUE_CHUNK_SIZE = 500
+
+async def enqueue_many(session, method: str, items, listing_id=None):
+    """Добавляет пачку вызовов одного метода; items — (ключ, chat_id, kwargs).
+
+    Уже поставленные ключи проверяются одним запросом на каждые
+    ENQUEUE_CHUNK_SIZE вызовов, а не запросом на каждый. Возвращает число
+    добавленных сообщений.
+    """
+    added = 0
+    for start in range(0, len(items), ENQUEUE_CHUNK_SIZE):
+        chunk = items[start:start + ENQUEUE_CHUNK_SIZE]
+        result = await session.execute(
+            select(OutboxMessage.idempotency_key).where(
+                OutboxMessage.idempotency_key.in_([key for key, _, _ in chunk])
+            )
+        )
+        existing = set(result.scalars())
+        messages = [
+            OutboxMessage(
+                idempotency_key=key,
+                method=method,
+                chat_id=chat_id,
+                payload=json.dumps(kwargs, ensure_ascii=False),
+                listing_id=listing_id,
+            )
+            for key, chat_id, kwargs in chunk if key not in existing
+        ]
+        session.add_all(messages)
+        added += len(messages)
+    return added
@@ -0,0 +1,28 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from models.database import Base
+
+class SavedSearch(Base):
+    """Сохраненный фильтр: пользователь получает сообщение о новых подходящих объявлениях.
+
+    Пустое поле означает «любое значение».
+    """
+    __tablename__ = 'saved_searches'
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    search_type = Column(String(20))
+    server = Column(String(20))
+    platform = Column(String(20))
+    role = Column(String(50))
+    search_goal = Column(String(20))
+    experience_min = Column(Integer)
+    experience_max = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_saved_searches_user_id', 'user_id'),
+    )
+
+    def __repr__(self):
+        return f"<SavedSearch(id={self.id}, user_id={self.user_id})>"
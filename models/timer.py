@@ -0,0 +1,20 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from models.database import Base
+
+class ListingTimer(Base):
+    """Отложенное действие над объявлением (истечение срока, напоминание)."""
+    __tablename__ = 'timers'
+
+    id = Column(Integer, primary_key=True)
+    listing_id = Column(Integer, nullable=False)
+    kind = Column(String(20), nullable=False)  # 'expire' или 'remind'
+    due_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('ix_timers_listing_id', 'listing_id'),
+    )
+
+    def __repr__(self):
+        return f"<ListingTimer(id={self.id}, listing_id={self.listing_id}, kind='{self.kind}', due_at={self.due_at})>"
@@ -3,17 +3,17 @@ from models.database import session_scope
 from models.listing import Listing
 
 def create_test_listing():
-    """Create a test listing in SQLite database."""
+    """Create a test listing in the configured database."""
     with session_scope() as session:
         # First, deactivate all existing listings for the test user
         test_user_id = 300240116
         existing_listings = session.query(Listing).filter(
             Listing.user_id == test_user_id,
-            Listing.is_active == 1
+            Listing.is_active == True  # noqa: E712
         ).all()
 
         for listing in existing_listings:
-            listing.is_active = 0
+            listing.is_active = False
         session.commit()
 
         # Create a new listing
@@ -35,7 +35,7 @@ def create_test_listing():
             status='approved',
             created_at=datetime.utcnow(),
             expires_at=datetime.utcnow() + timedelta(days=1),
-            is_active=1,  # SQLite boolean true is 1
+            is_active=True,
             moderation_type='manual'
         )
         session.add(listing)
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# config.py validates these on import; tests never talk to Telegram
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:test")
+os.environ.setdefault("MODERATION_CHANNEL_ID", "-1001")
+os.environ.setdefault("LISTINGS_CHANNEL_ID", "-1002")
+os.environ.setdefault("ADMIN_IDS", "1")
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
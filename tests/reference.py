@@ -0,0 +1,13 @@
+"""Reference implementations the optimized code must match byte for byte."""
+
+def escape_markdown_replace_chain(text):
+    """escape_markdown before the single-pass rewrite: one str.replace per character."""
+    if text is None:
+        return ""
+
+    special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
+
+    text = str(text).replace('\\', '\\\\')
+    for char in special_chars:
+        text = text.replace(char, f'\\{char}')
+    return text
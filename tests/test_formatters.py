@@ -0,0 +1,24 @@
+import random
+
+import pytest
+
+from tests.reference import escape_markdown_replace_chain
+from utils.formatters import MARKDOWN_SPECIAL_CHARS, escape_markdown
+
+ALPHABET = MARKDOWN_SPECIAL_CHARS + "\\ abcXYZ019абвЖЯё\n\t😀🏴‍☠️​"
+
+@pytest.mark.parametrize("value", [
+    None, "", "plain", "a_b*c", "\\", "\\_", "\\\\.", "1.5-2", "[link](x)", "ё!", 42, 3.5, True,
+])
+def test_escape_markdown_known_values(value):
+    assert escape_markdown(value) == escape_markdown_replace_chain(value)
+
+def test_escape_markdown_matches_replace_chain_fuzz():
+    rng = random.Random(20240522)
+    for _ in range(20000):
+        text = ''.join(rng.choice(ALPHABET) for _ in range(rng.randrange(0, 160)))
+        assert escape_markdown(text) == escape_markdown_replace_chain(text), repr(text)
+
+def test_escape_markdown_escapes_every_special_char_once():
+    escaped = escape_markdown(MARKDOWN_SPECIAL_CHARS)
+    assert escaped == ''.join(f'\\{char}' for char in MARKDOWN_SPECIAL_CHARS)
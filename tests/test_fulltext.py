@@ -0,0 +1,23 @@
+from sqlalchemy import create_engine, column, select, table
+
+from utils.fulltext import like_pattern, query_terms
+
+def test_like_pattern_escapes_wildcards():
+    assert like_pattern('sea_dog') == '%sea\\_dog%'
+    assert like_pattern('100%') == '%100\\%%'
+    assert like_pattern('a\\b') == '%a\\\\b%'
+
+def test_like_pattern_matches_literally():
+    texts = table('t', column('x'))
+    engine = create_engine('sqlite://')
+    with engine.connect() as connection:
+        connection.exec_driver_sql("CREATE TABLE t (x TEXT)")
+        connection.exec_driver_sql("INSERT INTO t VALUES ('TG: @Sea_Dog'), ('seaXdog'), ('100% win')")
+        def matching(term):
+            query = select(texts.c.x).where(texts.c.x.ilike(like_pattern(term), escape='\\'))
+            return sorted(connection.execute(query).scalars())
+        assert matching('sea_dog') == ['TG: @Sea_Dog']
+        assert matching('100%') == ['100% win']
+
+def test_query_terms_keep_underscores():
+    assert query_terms('Sea_Dog арена') == ['sea_dog', 'арен']
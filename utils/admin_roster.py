@@ -0,0 +1,104 @@
+"""Кэш администраторов каналов модерации и объявлений.
+
+Списки администраторов загружаются целиком через getChatAdministrators при
+запуске и обновляются по TTL фоновой задачей, поэтому проверка прав — это
+поиск в множестве, без запросов к Bot API на каждое нажатие кнопки.
+Обновления chat_member (назначение или снятие администратора) сразу
+применяются к кэшу.
+"""
+import asyncio
+import logging
+import time
+
+from telegram.constants import ChatMemberStatus
+from telegram.error import TelegramError
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+ADMIN_ROSTER_TTL = 10 * 60  # секунд
+# Фоновое обновление чаще TTL, чтобы проверки прав не ждали Bot API
+ADMIN_ROSTER_REFRESH_INTERVAL = ADMIN_ROSTER_TTL // 2
+ADMIN_ROSTER_RETRY = 60  # секунд до повторной загрузки после ошибки
+ADMIN_STATUSES = (ChatMemberStatus.OWNER, ChatMemberStatus.ADMINISTRATOR)
+
+class AdminRoster:
+    """Множества администраторов по каналам с временем загрузки."""
+
+    def __init__(self, channel_ids, ttl=ADMIN_ROSTER_TTL):
+        self.channel_ids = tuple(channel_ids)
+        self.ttl = ttl
+        self._admins = {}  # channel_id -> set(user_id)
+        self._loaded_at = {}  # channel_id -> time.monotonic()
+        self._lock = asyncio.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'errors': 0, 'member_updates': 0}
+
+    def _stale_channels(self, now):
+        return [
+            channel_id for channel_id in self.channel_ids
+            if now - self._loaded_at.get(channel_id, float('-inf')) >= self.ttl
+        ]
+
+    async def refresh(self, bot, only_stale=False):
+        """Перезагружает списки администраторов.
+
+        При ошибке остается прежний список, а повторная попытка откладывается
+        на ADMIN_ROSTER_RETRY, чтобы недоступный канал не превращал каждую
+        проверку прав в запрос к Bot API.
+        """
+        async with self._lock:
+            now = time.monotonic()
+            channel_ids = self._stale_channels(now) if only_stale else self.channel_ids
+            for channel_id in channel_ids:
+                try:
+                    administrators = await bot.get_chat_administrators(channel_id)
+                except TelegramError as e:
+                    self.stats['errors'] += 1
+                    self._loaded_at[channel_id] = now - self.ttl + ADMIN_ROSTER_RETRY
+                    logger.warning(f"Could not load administrators of chat {channel_id}: {e}")
+                    continue
+                self._admins[channel_id] = {member.user.id for member in administrators}
+                self._loaded_at[channel_id] = now
+                self.stats['refreshes'] += 1
+
+    async def is_admin(self, bot, user_id) -> bool:
+        if self._stale_channels(time.monotonic()):
+            # Фоновая задача не успела обновить список (или запуск без post_init)
+            self.stats['misses'] += 1
+            await self.refresh(bot, only_stale=True)
+        else:
+            self.stats['hits'] += 1
+        return any(user_id in self._admins.get(channel_id, ()) for channel_id in self.channel_ids)
+
+    def apply_member_update(self, chat_member_updated) -> bool:
+        """Применяет обновление chat_member; возвращает True, если канал отслеживается."""
+        channel_id = chat_member_updated.chat.id
+        if channel_id not in self.channel_ids:
+            return False
+        member = chat_member_updated.new_chat_member
+        admins = self._admins.setdefault(channel_id, set())
+        if member.status in ADMIN_STATUSES:
+            admins.add(member.user.id)
+        else:
+            admins.discard(member.user.id)
+        self.stats['member_updates'] += 1
+        return True
+
+    def snapshot(self) -> dict:
+        return {**self.stats, 'admins': {channel_id: len(ids) for channel_id, ids in self._admins.items()}}
+
+_roster = AdminRoster((config.MODERATION_CHANNEL_ID, config.LISTINGS_CHANNEL_ID))
+
+def get_admin_roster() -> AdminRoster:
+    return _roster
+
+async def load_admin_roster(application=None):
+    """post_init: загружает администраторов каналов."""
+    await _roster.refresh(application.bot)
+    logger.info(f"Admin roster loaded: {_roster.snapshot()['admins']}")
+
+async def refresh_admin_roster(context):
+    """JobQueue callback: обновляет списки администраторов по TTL."""
+    await _roster.refresh(context.bot)
+    logger.debug(f"Admin roster stats: {_roster.snapshot()}")
@@ -0,0 +1,105 @@
+"""Перенос завершенных объявлений в архив и запросы по обеим таблицам."""
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete, func, or_
+
+from models.database import async_session_scope
+from models.listing import Listing
+from models.timer import ListingTimer
+from models.archive import ListingArchive, to_archive, all_listings_query
+from utils.db_maintenance import release_free_pages
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = 500
+# Завершенные объявления остаются в listings еще столько, чтобы модераторы
+# и outbox успели с ними закончить
+ARCHIVE_AFTER = timedelta(days=3)
+HISTORY_LIMIT = 10
+
+async def archive_listings_batch(now: datetime, limit: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Переносит одну пачку завершенных объявлений в listings_archive.
+
+    Вставка в архив и удаление из listings выполняются одной транзакцией.
+    """
+    cutoff = now - ARCHIVE_AFTER
+    async with async_session_scope() as session:
+        # Самую новую строку не трогаем: без AUTOINCREMENT SQLite выдал бы ее id
+        # следующему объявлению, а ключи outbox вида publish:<id> уже заняты
+        newest_id = (await session.execute(select(func.max(Listing.id)))).scalar()
+        result = await session.execute(
+            select(Listing).where(
+                or_(Listing.is_active == False, Listing.status == 'rejected'),  # noqa: E712
+                Listing.created_at < cutoff,
+                Listing.id != newest_id
+            ).order_by(Listing.id).limit(limit)
+        )
+        batch = result.scalars().all()
+        if not batch:
+            return 0
+
+        ids = [listing.id for listing in batch]
+        session.add_all([to_archive(listing, now) for listing in batch])
+        await session.execute(delete(ListingTimer).where(ListingTimer.listing_id.in_(ids)))
+        await session.execute(delete(Listing).where(Listing.id.in_(ids)))
+
+    return len(batch)
+
+async def archive_listings(context):
+    """JobQueue callback: архивирует все завершенные объявления и сжимает базу."""
+    now = datetime.utcnow()
+    total = 0
+    while True:
+        archived = await archive_listings_batch(now)
+        total += archived
+        if archived < ARCHIVE_BATCH_SIZE:
+            break
+
+    released = 0
+    if total:
+        logger.info(f"Archived {total} finished listings")
+        released = await release_free_pages()
+
+    context.bot_data['last_archive'] = {
+        'finished_at': datetime.utcnow(),
+        'archived': total,
+        'pages_released': released,
+    }
+    return total
+
+async def listing_stats() -> dict:
+    """Статистика по текущим и архивным объявлениям."""
+    all_listings = all_listings_query('search_type', 'created_at')
+    week_ago = datetime.utcnow() - timedelta(days=7)
+    async with async_session_scope() as session:
+        by_outcome = dict((await session.execute(
+            select(all_listings.c.outcome, func.count()).group_by(all_listings.c.outcome)
+        )).all())
+        by_type = dict((await session.execute(
+            select(all_listings.c.search_type, func.count()).group_by(all_listings.c.search_type)
+        )).all())
+        last_week = (await session.execute(
+            select(func.count()).select_from(all_listings).where(all_listings.c.created_at >= week_ago)
+        )).scalar()
+        archived = (await session.execute(select(func.count()).select_from(ListingArchive))).scalar()
+
+    return {
+        'total': sum(by_outcome.values()),
+        'by_outcome': by_outcome,
+        'by_type': by_type,
+        'last_week': last_week,
+        'archived': archived,
+    }
+
+async def user_listing_history(user_id: int, limit: int = HISTORY_LIMIT):
+    """Последние объявления пользователя из обеих таблиц, новые первыми."""
+    all_listings = all_listings_query('user_id', 'search_type', 'search_goal', 'created_at')
+    async with async_session_scope() as session:
+        result = await session.execute(
+            select(all_listings)
+            .where(all_listings.c.user_id == user_id)
+            .order_by(all_listings.c.created_at.desc())
+            .limit(limit)
+        )
+        return result.mappings().all()
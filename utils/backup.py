@@ -1,44 +1,254 @@
 import os
+import gzip
+import hashlib
 import shutil
-from datetime import datetime
+import sqlite3
+import tempfile
+import time
+import asyncio
+from datetime import datetime, timedelta
 import sys
-import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import logging
 
+try:  # Python 3.14+
+    from compression import zstd
+except ImportError:
+    zstd = None
+
 logger = logging.getLogger(__name__)
 
-def create_backup():
-    """Create a backup of the SQLite database."""
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATABASE_PATH = os.path.join(PROJECT_ROOT, 'bot.db')
+BACKUP_DIR = os.path.join(PROJECT_ROOT, 'backups')
+BACKUP_PREFIX = 'bot_'
+TIMESTAMP_FORMAT = '%Y%m%d_%H%M%S'
+
+# Online backup copies this many pages per step and then yields to writers
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_PAUSE = 0.01  # seconds
+BACKUP_MAX_RESTARTS = 3
+CHUNK_SIZE = 1024 * 1024
+
+BACKUP_INTERVAL = 3600  # seconds between scheduled backups
+
+# Grandfather-father-son retention: newest backup of each of the last N periods
+RETENTION = {
+    'hourly': 24,
+    'daily': 7,
+    'weekly': 4,
+}
+
+# Streaming compressors by file extension; zstd is used when the stdlib has it
+COMPRESSORS = {'.gz': gzip.open}
+if zstd is not None:
+    COMPRESSORS['.zst'] = zstd.open
+BACKUP_EXTENSION = '.zst' if zstd is not None else '.gz'
+
+class _BackupRestarted(Exception):
+    pass
+
+def _snapshot(db_path, snapshot_path):
+    """Copy a live database with the SQLite online backup API.
+
+    Pages are copied in small steps; locks are released between steps,
+    so writers are never blocked for the whole copy. A write from another
+    connection restarts the copy, so under constant writes it falls back
+    to a single step, which holds the read lock only for one pass.
+    """
+    restarts = 0
+    last_remaining = None
+
+    def progress(status, remaining, total):
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > BACKUP_MAX_RESTARTS:
+                raise _BackupRestarted()
+        last_remaining = remaining
+        time.sleep(BACKUP_STEP_PAUSE)
+
+    source = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    target = sqlite3.connect(snapshot_path)
     try:
-        # Create backups directory if it doesn't exist
-        if not os.path.exists('backups'):
-            os.makedirs('backups')
+        try:
+            source.backup(target, pages=BACKUP_PAGES_PER_STEP, progress=progress)
+        except _BackupRestarted:
+            logger.warning(f"Backup restarted {restarts} times by concurrent writes, copying in one step")
+            source.backup(target)
+    finally:
+        target.close()
+        source.close()
 
-        # Generate backup filename with timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_file = f'backups/bot_{timestamp}.db'
-
-        # Get the path to the SQLite database file
-        db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'bot.db'))
-
-        if os.path.exists(db_path):
-            # Copy the database file
-            shutil.copy2(db_path, backup_file)
-            logger.info(f"Backup created successfully: {backup_file}")
-            return backup_file
-        else:
+def _integrity_check(db_path):
+    """Run PRAGMA integrity_check and raise if the database is damaged."""
+    connection = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        result = [row[0] for row in connection.execute('PRAGMA integrity_check')]
+    finally:
+        connection.close()
+    if result != ['ok']:
+        raise sqlite3.DatabaseError(f"Integrity check failed: {'; '.join(result[:5])}")
+
+def _compress(source_path, target_path):
+    """Stream-compress a file and return the SHA-256 of the compressed output."""
+    opener = COMPRESSORS[os.path.splitext(target_path)[1]]
+    with open(source_path, 'rb') as source, opener(target_path, 'wb') as target:
+        shutil.copyfileobj(source, target, CHUNK_SIZE)
+    return _sha256(target_path)
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _write_checksum(backup_file, checksum):
+    # sha256sum-compatible sidecar file
+    with open(f'{backup_file}.sha256', 'w') as f:
+        f.write(f'{checksum}  {os.path.basename(backup_file)}\n')
+
+def create_backup(db_path=DATABASE_PATH):
+    """Create a compressed, verified online backup of the SQLite database."""
+    try:
+        if not os.path.exists(db_path):
             logger.warning("Database file not found, no backup created")
             return None
 
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+
+        # Generate backup filename with timestamp
+        timestamp = datetime.now().strftime(TIMESTAMP_FORMAT)
+        backup_file = os.path.join(BACKUP_DIR, f'{BACKUP_PREFIX}{timestamp}.db{BACKUP_EXTENSION}')
+        started = time.monotonic()
+
+        with tempfile.TemporaryDirectory(dir=BACKUP_DIR) as tmp_dir:
+            snapshot = os.path.join(tmp_dir, 'snapshot.db')
+            _snapshot(db_path, snapshot)
+            _integrity_check(snapshot)
+
+            # Write under a temporary name so a crash never leaves a partial backup
+            partial = os.path.join(tmp_dir, os.path.basename(backup_file))
+            checksum = _compress(snapshot, partial)
+            snapshot_size = os.path.getsize(snapshot)
+            os.replace(partial, backup_file)
+
+        _write_checksum(backup_file, checksum)
+        logger.info(
+            f"Backup created successfully: {backup_file} "
+            f"({snapshot_size} -> {os.path.getsize(backup_file)} bytes, "
+            f"{time.monotonic() - started:.1f}s)"
+        )
+        return backup_file
+
     except Exception as e:
         logger.error(f"Error creating backup: {e}")
         return None
 
+def verify_backup(backup_file):
+    """Check the checksum of a backup and the integrity of its contents."""
+    checksum_file = f'{backup_file}.sha256'
+    if os.path.exists(checksum_file):
+        with open(checksum_file) as f:
+            expected = f.read().split()[0]
+        if _sha256(backup_file) != expected:
+            raise ValueError(f"Checksum mismatch for {backup_file}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        restored = restore_backup(backup_file, os.path.join(tmp_dir, 'verify.db'))
+        _integrity_check(restored)
+    return True
+
+def restore_backup(backup_file, target_path):
+    """Decompress a backup into target_path and return the path."""
+    opener = COMPRESSORS.get(os.path.splitext(backup_file)[1])
+    if opener is None:
+        raise ValueError(f"Unsupported backup format: {backup_file}")
+    with opener(backup_file, 'rb') as source, open(target_path, 'wb') as target:
+        shutil.copyfileobj(source, target, CHUNK_SIZE)
+    return target_path
+
+def _backup_time(filename):
+    name = filename[len(BACKUP_PREFIX):].split('.', 1)[0]
+    try:
+        return datetime.strptime(name, TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+def list_backups():
+    """Return (created_at, path) of existing backups, newest first."""
+    if not os.path.isdir(BACKUP_DIR):
+        return []
+    backups = []
+    for filename in os.listdir(BACKUP_DIR):
+        if not filename.startswith(BACKUP_PREFIX) or filename.endswith('.sha256'):
+            continue
+        if os.path.splitext(filename)[1] not in COMPRESSORS and not filename.endswith('.db'):
+            continue
+        created_at = _backup_time(filename)
+        if created_at:
+            backups.append((created_at, os.path.join(BACKUP_DIR, filename)))
+    return sorted(backups, reverse=True)
+
+def rotate_backups(now=None):
+    """Delete backups not covered by the hourly/daily/weekly retention policy."""
+    now = now or datetime.now()
+    periods = {
+        'hourly': (lambda t: t.strftime('%Y%m%d%H'), timedelta(hours=RETENTION['hourly'])),
+        'daily': (lambda t: t.strftime('%Y%m%d'), timedelta(days=RETENTION['daily'])),
+        'weekly': (lambda t: t.strftime('%G%V'), timedelta(weeks=RETENTION['weekly'])),
+    }
+
+    keep = set()
+    for key, window in periods.values():
+        seen = set()
+        for created_at, path in list_backups():
+            if now - created_at > window:
+                continue
+            period = key(created_at)
+            if period not in seen:
+                # Newest backup of the period
+                seen.add(period)
+                keep.add(path)
+
+    removed = 0
+    for _, path in list_backups():
+        if path in keep:
+            continue
+        for stale in (path, f'{path}.sha256'):
+            if os.path.exists(stale):
+                os.remove(stale)
+        removed += 1
+    if removed:
+        logger.info(f"Removed {removed} expired backups")
+    return removed
+
+def run_backup(db_path=DATABASE_PATH):
+    """Create a backup and apply the retention policy."""
+    backup_file = create_backup(db_path)
+    if backup_file:
+        rotate_backups()
+    return backup_file
+
+async def backup_job(context):
+    """JobQueue callback: runs the backup in a worker thread."""
+    backup_file = await asyncio.to_thread(run_backup, context.job.data or DATABASE_PATH)
+    context.bot_data['last_backup'] = {
+        'finished_at': datetime.utcnow(),
+        'file': backup_file,
+    }
+    if backup_file is None:
+        logger.error("Scheduled database backup failed")
+
 if __name__ == '__main__':
     # Configure logging
     logging.basicConfig(
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
         level=logging.INFO
     )
-    create_backup()
\ No newline at end of file
+    if len(sys.argv) == 3 and sys.argv[1] == '--verify':
+        verify_backup(sys.argv[2])
+        logger.info(f"Backup {sys.argv[2]} is valid")
+    else:
+        run_backup()
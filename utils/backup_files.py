@@ -1,67 +1,268 @@
 import os
-import shutil
+import io
+import json
+import time
+import asyncio
+import hashlib
+import tarfile
 from datetime import datetime
 import logging
 import sys
+from sqlalchemy import make_url
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import config
 
 logger = logging.getLogger(__name__)
 
-def create_files_backup():
-    """Create a backup of all project files."""
-    try:
-        # Create backups directory if it doesn't exist
-        if not os.path.exists('backups'):
-            os.makedirs('backups')
-
-        # Generate backup filename with timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_dir = f'backups/files_backup_{timestamp}'
-
-        # Files and directories to exclude
-        exclude = {
-            '__pycache__',
-            '.git',
-            '.upm',
-            '.config',
-            'venv',
-            'backups',
-            '.pytest_cache',
-            '.replit',
-            'poetry.lock',
-            'replit.nix'
-        }
-
-        # Create backup directory
-        os.makedirs(backup_dir)
-
-        # Copy files and directories
-        for item in os.listdir('.'):
-            if item in exclude or item.startswith('.'):
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BACKUP_DIR = os.path.join(PROJECT_ROOT, 'backups')
+MANIFEST_PATH = os.path.join(BACKUP_DIR, 'files_manifest.json')
+# Stored inside every archive: full file list with hashes and deletions
+ARCHIVE_MANIFEST_NAME = '.backup_manifest.json'
+
+# Files and directories to exclude
+EXCLUDE = {
+    '__pycache__',
+    '.git',
+    '.upm',
+    '.config',
+    'venv',
+    'backups',
+    '.pytest_cache',
+    '.replit',
+    'poetry.lock',
+    'replit.nix',
+}
+# Live SQLite side files; the database has its own backups
+EXCLUDE_SUFFIXES = ('-wal', '-shm', '-journal')
+
+def _database_name():
+    """File name of the live SQLite database, None for server databases."""
+    url = make_url(config.DATABASE_URL)
+    if url.get_backend_name() == 'sqlite' and url.database:
+        return os.path.basename(url.database)
+    return None
+
+# The live database has its own backups (utils/backup.py)
+DATABASE_NAME = _database_name()
+if DATABASE_NAME:
+    EXCLUDE.add(DATABASE_NAME)
+
+FULL_BACKUP_EVERY_DAYS = 7
+KEEP_FULL_BACKUPS = 4
+CHUNK_SIZE = 1024 * 1024
+
+class _HashingReader:
+    """File wrapper that hashes the bytes tarfile reads through it."""
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self.digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self._fileobj.read(size)
+        self.digest.update(data)
+        return data
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _iter_files(root):
+    """Yield (relative path, absolute path) of files to back up."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        top_level = dirpath == root
+        dirnames[:] = sorted(
+            d for d in dirnames
+            if d not in EXCLUDE and not (top_level and d.startswith('.'))
+        )
+        for filename in sorted(filenames):
+            if filename in EXCLUDE or filename.endswith(EXCLUDE_SUFFIXES):
+                continue
+            if top_level and filename.startswith('.'):
                 continue
+            path = os.path.join(dirpath, filename)
+            if os.path.isfile(path) and not os.path.islink(path):
+                yield os.path.relpath(path, root), path
+
+def _load_manifest():
+    try:
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _needs_full_backup(manifest, now):
+    if not manifest or not manifest.get('full_backup_at'):
+        return True
+    last_full = datetime.fromisoformat(manifest['full_backup_at'])
+    return (now - last_full).days >= FULL_BACKUP_EVERY_DAYS
+
+def _add_file(tar, arcname, f):
+    """Stream an open file into the archive and return its SHA-256.
+
+    A file that shrinks while being read leaves a broken member behind,
+    so errors here abort the whole archive.
+    """
+    tarinfo = tar.gettarinfo(arcname=arcname, fileobj=f)
+    reader = _HashingReader(f)
+    tar.addfile(tarinfo, reader)
+    return reader.digest.hexdigest()
 
-            source = os.path.join('.', item)
-            destination = os.path.join(backup_dir, item)
+def run_files_backup(full=None):
+    """Archive the project tree straight into a .tar.gz.
 
-            if os.path.isdir(source):
-                shutil.copytree(source, destination, ignore=shutil.ignore_patterns(*exclude))
-            else:
-                shutil.copy2(source, destination)
+    A full archive holds every file; an incremental one only files whose
+    content hash differs from the previous run. Every archive carries a
+    manifest of the whole tree, so a restore extracts the last full archive
+    and then the incremental ones in order, deleting files they list as
+    removed. Returns a report of the run.
+    """
+    started = time.monotonic()
+    now = datetime.now()
+    os.makedirs(BACKUP_DIR, exist_ok=True)
 
-        # Create archive
-        archive_name = f'{backup_dir}.tar.gz'
-        shutil.make_archive(backup_dir, 'gztar', backup_dir)
+    previous = _load_manifest()
+    if full is None:
+        full = _needs_full_backup(previous, now)
+    previous_files = {} if full or not previous else previous['files']
 
-        # Remove temporary directory
-        shutil.rmtree(backup_dir)
+    # Generate backup filename with timestamp
+    timestamp = now.strftime('%Y%m%d_%H%M%S_%f')
+    kind = 'full' if full else 'incr'
+    archive_name = os.path.join(BACKUP_DIR, f'files_{kind}_{timestamp}.tar.gz')
+    partial = f'{archive_name}.partial'
 
-        logger.info(f"Files backup created successfully: {archive_name}")
-        return archive_name
+    files = {}
+    report = {
+        'archive': archive_name,
+        'mode': kind,
+        'files_total': 0,
+        'files_added': 0,
+        'files_unchanged': 0,
+        'files_deleted': 0,
+        'bytes_read': 0,
+        'archive_bytes': 0,
+        'seconds': 0.0,
+    }
 
+    try:
+        with tarfile.open(partial, 'w:gz') as tar:
+            for arcname, path in _iter_files(PROJECT_ROOT):
+                old = previous_files.get(arcname)
+                try:
+                    stat = os.stat(path)
+                    if old and old['size'] == stat.st_size and old['mtime_ns'] == stat.st_mtime_ns:
+                        # Unchanged metadata: trust the previous hash without reading the file
+                        files[arcname] = old
+                        report['files_unchanged'] += 1
+                        continue
+                    if old:
+                        digest = _sha256(path)
+                        report['bytes_read'] += stat.st_size
+                        if digest == old['sha256']:
+                            files[arcname] = dict(old, mtime_ns=stat.st_mtime_ns)
+                            report['files_unchanged'] += 1
+                            continue
+                    f = open(path, 'rb')
+                except FileNotFoundError:
+                    # The file vanished after the walk: it is reported as deleted
+                    continue
+                except OSError as e:
+                    # Unreadable for now: restores keep the copy from an earlier archive
+                    logger.warning(f"Skipping {arcname} in files backup: {e}")
+                    if old:
+                        files[arcname] = old
+                    continue
+
+                with f:
+                    stat = os.fstat(f.fileno())
+                    digest = _add_file(tar, arcname, f)
+
+                files[arcname] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+                report['files_added'] += 1
+                report['bytes_read'] += stat.st_size
+
+            deleted = sorted(set(previous_files) - set(files))
+            report['files_total'] = len(files)
+            report['files_deleted'] = len(deleted)
+
+            manifest = {
+                'created_at': now.isoformat(),
+                'full_backup_at': now.isoformat() if full else previous['full_backup_at'],
+                'archive': os.path.basename(archive_name),
+                'files': files,
+                'deleted': deleted,
+            }
+            data = json.dumps(manifest, indent=1).encode()
+            tarinfo = tarfile.TarInfo(ARCHIVE_MANIFEST_NAME)
+            tarinfo.size = len(data)
+            tarinfo.mtime = int(time.time())
+            tar.addfile(tarinfo, io.BytesIO(data))
+
+        os.replace(partial, archive_name)
+    except Exception:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+    # The manifest moves forward only once the archive is complete
+    with open(f'{MANIFEST_PATH}.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(f'{MANIFEST_PATH}.tmp', MANIFEST_PATH)
+
+    report['archive_bytes'] = os.path.getsize(archive_name)
+    report['seconds'] = round(time.monotonic() - started, 2)
+    logger.info(
+        f"Files backup ({kind}) created: {archive_name}; "
+        f"{report['files_added']} added, {report['files_unchanged']} unchanged, "
+        f"{report['files_deleted']} deleted; read {report['bytes_read']} bytes, "
+        f"archive {report['archive_bytes']} bytes in {report['seconds']}s"
+    )
+    rotate_files_backups()
+    return report
+
+def rotate_files_backups():
+    """Keep the last KEEP_FULL_BACKUPS full archives and their incrementals."""
+    archives = sorted(
+        (name for name in os.listdir(BACKUP_DIR)
+         if name.startswith(('files_full_', 'files_incr_')) and name.endswith('.tar.gz')),
+        key=lambda name: name.split('_', 2)[2]
+    )
+    full = [name for name in archives if name.startswith('files_full_')]
+    if len(full) <= KEEP_FULL_BACKUPS:
+        return 0
+
+    oldest_kept = full[-KEEP_FULL_BACKUPS].split('_', 2)[2]
+    removed = 0
+    for name in archives:
+        if name.split('_', 2)[2] < oldest_kept:
+            os.remove(os.path.join(BACKUP_DIR, name))
+            removed += 1
+    if removed:
+        logger.info(f"Removed {removed} old files backups")
+    return removed
+
+def create_files_backup():
+    """Create a backup of all project files."""
+    try:
+        return run_files_backup()['archive']
     except Exception as e:
         logger.error(f"Error creating files backup: {e}")
         return None
 
+async def files_backup_job(context):
+    """JobQueue callback: runs the files backup in a worker thread."""
+    try:
+        report = await asyncio.to_thread(run_files_backup)
+    except Exception as e:
+        logger.error(f"Scheduled files backup failed: {e}")
+        return
+    context.bot_data['last_files_backup'] = report
+
 if __name__ == '__main__':
     # Configure logging
     logging.basicConfig(
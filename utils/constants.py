@@ -37,9 +37,9 @@ PLATFORMS = [
 ]
 
 SEARCH_TYPES = {
-    "party": {"name": "Поиск пати", "duration_days": 1},
-    "player": {"name": "Я игрок", "duration_days": 7},
-    "team": {"name": "Мы команда", "duration_days": 7}
+    "party": {"name": "Поиск пати", "duration_days": 1, "remind_before_hours": 1},
+    "player": {"name": "Я игрок", "duration_days": 7, "remind_before_hours": 24},
+    "team": {"name": "Мы команда", "duration_days": 7, "remind_before_hours": 24}
 }
 
 SEARCH_GOALS = [
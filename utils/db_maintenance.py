@@ -0,0 +1,62 @@
+"""Периодическое обслуживание SQLite: статистика планировщика и возврат места."""
+import logging
+
+from models.database import async_engine, dialect_name
+
+logger = logging.getLogger(__name__)
+
+OPTIMIZE_INTERVAL = 6 * 3600  # секунд
+# Страниц, освобождаемых за один проход incremental_vacuum
+INCREMENTAL_VACUUM_PAGES = 2000
+# Свободных страниц, после которых имеет смысл возвращать место
+VACUUM_FREELIST_THRESHOLD = 1000
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+async def optimize_database(context):
+    """JobQueue callback: PRAGMA optimize обновляет статистику для планировщика."""
+    if dialect_name != 'sqlite':
+        return
+    async with async_engine.connect() as connection:
+        await connection.exec_driver_sql('PRAGMA optimize')
+    logger.debug("SQLite PRAGMA optimize completed")
+
+async def release_free_pages() -> int:
+    """Возвращает системе свободные страницы; результат — число освобожденных."""
+    if dialect_name != 'sqlite':
+        return 0
+    async with async_engine.connect() as connection:
+        auto_vacuum = (await connection.exec_driver_sql('PRAGMA auto_vacuum')).scalar()
+        freelist = (await connection.exec_driver_sql('PRAGMA freelist_count')).scalar()
+        if auto_vacuum != AUTO_VACUUM_INCREMENTAL:
+            if freelist >= VACUUM_FREELIST_THRESHOLD:
+                # Режим меняется только полным VACUUM, который блокирует базу
+                logger.warning(
+                    f"SQLite has {freelist} free pages but auto_vacuum is not INCREMENTAL; "
+                    f"run 'PRAGMA auto_vacuum=INCREMENTAL; VACUUM;' during maintenance"
+                )
+            return 0
+        if freelist < VACUUM_FREELIST_THRESHOLD:
+            return 0
+        # Драйвер выполняет только первый шаг PRAGMA incremental_vacuum, а каждый
+        # шаг освобождает одну страницу, поэтому повторяем до исчерпания лимита
+        remaining = freelist
+        while remaining and freelist - remaining < INCREMENTAL_VACUUM_PAGES:
+            await connection.exec_driver_sql(
+                f'PRAGMA incremental_vacuum({INCREMENTAL_VACUUM_PAGES - (freelist - remaining)})'
+            )
+            current = (await connection.exec_driver_sql('PRAGMA freelist_count')).scalar()
+            if current >= remaining:
+                break
+            remaining = current
+        await connection.commit()
+        remaining = (await connection.exec_driver_sql('PRAGMA freelist_count')).scalar()
+    logger.info(
+        f"SQLite incremental vacuum released {freelist - remaining} pages: "
+        f"freelist {freelist} -> {remaining}"
+    )
+    return freelist - remaining
+
+async def incremental_vacuum(context):
+    """JobQueue callback: возвращает системе свободные страницы файла базы."""
+    await release_free_pages()
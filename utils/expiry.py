@@ -0,0 +1,95 @@
+"""Снятие с публикации объявлений с истекшим сроком."""
+import logging
+from datetime import datetime
+
+from sqlalchemy import select, delete
+
+from models.database import async_session_scope
+from models.listing import Listing
+from models.timer import ListingTimer
+from models.outbox import listing_key
+from utils.outbox import enqueue_channel_deletion, enqueue_notification, kick_outbox
+from utils.listing_events import listings_removed
+
+logger = logging.getLogger(__name__)
+
+# Основную работу выполняют таймеры (utils/timers.py), проход по таблице
+# подстраховывает объявления без таймеров
+EXPIRY_SWEEP_INTERVAL = 3600  # секунд между проходами
+EXPIRY_BATCH_SIZE = 200
+
+# Перечисление статусов позволяет использовать индекс (status, expires_at)
+LISTING_STATUSES = ('pending', 'approved', 'rejected')
+
+async def expire_listings_batch(now: datetime, limit: int = EXPIRY_BATCH_SIZE):
+    """Снимает с публикации одну пачку истекших объявлений.
+
+    Деактивация и постановка удалений/уведомлений в outbox выполняются
+    одной транзакцией, поэтому после сбоя следующий проход просто
+    продолжит с оставшихся объявлений.
+    Возвращает (деактивированные объявления, число сообщений в канале).
+    """
+    async with async_session_scope() as session:
+        result = await session.execute(
+            select(Listing).where(
+                Listing.status.in_(LISTING_STATUSES),
+                Listing.expires_at <= now,
+                Listing.is_active == True  # noqa: E712
+            ).order_by(Listing.expires_at).limit(limit)
+        )
+        batch = result.scalars().all()
+        messages = await retire_listings(session, batch)
+
+    listings_removed(listing.id for listing in batch)
+    return batch, messages
+
+async def retire_listings(session, listings) -> int:
+    """Деактивирует объявления в текущей транзакции.
+
+    Ставит в outbox удаление сообщений из канала и уведомления владельцам,
+    отменяет оставшиеся таймеры. Возвращает число удаляемых сообщений.
+    """
+    messages = 0
+    for listing in listings:
+        listing.is_active = False
+        if listing.message_id:
+            await enqueue_channel_deletion(session, listing.message_id, listing.id)
+            messages += 1
+        if listing.status == 'approved':
+            await enqueue_notification(
+                session, listing_key('expired', listing), listing.user_id,
+                "⌛ Срок вашего объявления истек, и оно снято с публикации.\n"
+                "Вы можете создать новое объявление с помощью команды /create",
+                listing_id=listing.id
+            )
+
+    if listings:
+        await session.execute(
+            delete(ListingTimer).where(ListingTimer.listing_id.in_([l.id for l in listings]))
+        )
+    return messages
+
+async def sweep_expired_listings(context):
+    """JobQueue callback: снимает с публикации все истекшие объявления."""
+    now = datetime.utcnow()
+    total_rows = total_messages = 0
+
+    while True:
+        batch, messages = await expire_listings_batch(now, EXPIRY_BATCH_SIZE)
+        total_rows += len(batch)
+        total_messages += messages
+        if len(batch) < EXPIRY_BATCH_SIZE:
+            break
+
+    if total_rows:
+        kick_outbox(context)
+        logger.info(
+            f"Expiry sweep: {total_rows} listings expired, "
+            f"{total_messages} channel messages queued for deletion"
+        )
+    context.bot_data['last_expiry_sweep'] = {
+        'finished_at': datetime.utcnow(),
+        'listings': total_rows,
+        'messages': total_messages,
+    }
+    return total_rows, total_messages
@@ -1,25 +1,63 @@
+from collections import OrderedDict
 from config import config
-import re
+from utils.listing_events import on_listings_removed
 
-def escape_markdown(text):
-    """Escape Markdown special characters for MarkdownV2."""
-    if text is None:
-        return ""
+# Characters that need escaping in MarkdownV2, backslash included
+MARKDOWN_SPECIAL_CHARS = '\\_*[]()~`>#+-=|{}.!'
+MARKDOWN_ESCAPE_TABLE = str.maketrans({char: f'\\{char}' for char in MARKDOWN_SPECIAL_CHARS})
+# translate with multi-character replacements goes through a slow per-character
+# path; past this length str.replace scans are faster (tests/bench_formatters.py)
+TRANSLATE_MAX_LENGTH = 24
 
-    # Characters that need escaping in MarkdownV2
-    special_chars = ['_', '*', '[', ']', '(', ')', '~', '`', '>', '#', '+', '-', '=', '|', '{', '}', '.', '!']
+RENDER_CACHE_SIZE = 4096
+_render_cache = OrderedDict()  # (listing.id, listing.created_at, listing.version) -> text
 
-    # First escape backslashes
-    text = str(text).replace('\\', '\\\\')
-
-    # Then escape other special characters
-    for char in special_chars:
-        text = text.replace(char, f'\\{char}')
+def escape_markdown(text):
+    """Escape Markdown special characters for MarkdownV2.
 
+    Short strings (nicknames, choices) are escaped in a single translate
+    pass; longer ones with one str.replace per special character present.
+    The backslash goes first so inserted escapes are not escaped again.
+    """
+    if text is None:
+        return ""
+    text = str(text)
+    if len(text) <= TRANSLATE_MAX_LENGTH:
+        return text.translate(MARKDOWN_ESCAPE_TABLE)
+    for char in MARKDOWN_SPECIAL_CHARS:
+        if char in text:
+            text = text.replace(char, f'\\{char}')
     return text
 
 def format_listing_message(listing):
-    """Format listing data into a readable message with proper MarkdownV2 escaping"""
+    """Format listing data into a readable message with proper MarkdownV2 escaping.
+
+    Rendered text is cached by (id, created_at, version): the version grows
+    whenever a displayed field changes, and created_at tells apart listings
+    that reuse an id after /admin clear-all, so stale entries are never served.
+    """
+    key = (listing.id, listing.created_at, listing.version)
+    if None in key:
+        return _render_listing(listing)
+    message = _render_cache.get(key)
+    if message is None:
+        message = _render_cache[key] = _render_listing(listing)
+        if len(_render_cache) > RENDER_CACHE_SIZE:
+            _render_cache.popitem(last=False)
+    else:
+        _render_cache.move_to_end(key)
+    return message
+
+@on_listings_removed
+def _evict_rendered(listing_ids):
+    if listing_ids is None:
+        _render_cache.clear()
+        return
+    removed = set(listing_ids)
+    for key in [key for key in _render_cache if key[0] in removed]:
+        del _render_cache[key]
+
+def _render_listing(listing):
     # Escape special characters in all text fields
     nickname = escape_markdown(listing.nickname)
     gender = escape_markdown(listing.gender)
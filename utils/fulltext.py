@@ -0,0 +1,115 @@
+"""Полнотекстовый поиск по дополнительной информации объявлений (SQLite FTS5).
+
+Таблица listings_fts хранит нормализованную копию additional_info с rowid,
+равным id объявления, и обновляется триггерами на listings. Токенизатор
+unicode61 приводит к нижнему регистру и кириллицу; «ё» заменяется на «е»
+при индексации и в запросе. Русские окончания грубо отрезаются, и слова
+ищутся по префиксу, так что «арена» находит «арену» и «арене».
+Результаты ранжируются по BM25.
+
+На PostgreSQL FTS5 нет: поиск выполняется через ILIKE по тем же словам.
+"""
+import logging
+import re
+
+from sqlalchemy import select, and_, text
+
+from models.database import async_session_scope, dialect_name
+from models.listing import Listing
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'listings_fts'
+FTS_TOKENIZER = 'unicode61 remove_diacritics 2'
+# Сколько лучших совпадений FTS пересекается с категориальными фильтрами
+FULLTEXT_CANDIDATES = 1000
+MAX_QUERY_TERMS = 8
+
+def _normalized(column):
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+FTS_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"additional_info, tokenize='{FTS_TOKENIZER}', prefix='2 3')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON listings BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, additional_info) "
+    f"VALUES (new.id, {_normalized('new.additional_info')}); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON listings BEGIN "
+    f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF additional_info ON listings BEGIN "
+    f"UPDATE {FTS_TABLE} SET additional_info = {_normalized('new.additional_info')} "
+    f"WHERE rowid = new.id; END",
+)
+FTS_REBUILD = (
+    f"DELETE FROM {FTS_TABLE}",
+    f"INSERT INTO {FTS_TABLE}(rowid, additional_info) "
+    f"SELECT id, {_normalized('additional_info')} FROM listings",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')",
+)
+
+_WORD_RE = re.compile(r'\w+')
+_CYRILLIC_ENDING_RE = re.compile(r'[аеиоуыэюяйь]+$')
+
+def create_fulltext_index(connection):
+    """Создает таблицу FTS и триггеры и заполняет ее (синхронное соединение)."""
+    if dialect_name != 'sqlite':
+        return
+    for statement in FTS_DDL:
+        connection.exec_driver_sql(statement)
+    for statement in FTS_REBUILD:
+        connection.exec_driver_sql(statement)
+
+async def rebuild_fulltext_index() -> int:
+    """Перестраивает таблицу FTS из listings; возвращает число строк."""
+    if dialect_name != 'sqlite':
+        return 0
+    async with async_session_scope() as session:
+        for statement in FTS_DDL + FTS_REBUILD:
+            await session.execute(text(statement))
+        count = (await session.execute(text(f"SELECT count(*) FROM {FTS_TABLE}"))).scalar()
+    logger.info(f"Full-text index rebuilt: {count} listings")
+    return count
+
+def query_terms(query: str):
+    """Слова запроса: нижний регистр, «ё» -> «е», без русских окончаний."""
+    terms = []
+    for word in _WORD_RE.findall(query.lower().replace('ё', 'е')):
+        stem = _CYRILLIC_ENDING_RE.sub('', word)
+        # Короткие слова («фп», «pvp») ищутся как есть
+        terms.append(stem if len(stem) >= 3 else word)
+    return terms[:MAX_QUERY_TERMS]
+
+def fts_match_expression(terms) -> str:
+    # Каждое слово — строка в кавычках с префиксным поиском, слова объединяются через AND
+    return ' '.join('"' + term.replace('"', '""') + '"*' for term in terms)
+
+def like_pattern(term: str) -> str:
+    """Шаблон ILIKE «содержит term»: % и _ в слове ищутся буквально (escape '\\')."""
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+async def search_fulltext(query: str, limit: int = FULLTEXT_CANDIDATES):
+    """Id активных одобренных объявлений, подходящих под запрос, лучшие первыми."""
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    async with async_session_scope() as session:
+        if dialect_name == 'sqlite':
+            result = await session.execute(
+                text(
+                    f"SELECT l.id FROM {FTS_TABLE} f JOIN listings l ON l.id = f.rowid "
+                    f"WHERE {FTS_TABLE} MATCH :match AND l.is_active = 1 AND l.status = 'approved' "
+                    f"ORDER BY f.rank LIMIT :limit"
+                ),
+                {'match': fts_match_expression(terms), 'limit': limit}
+            )
+        else:
+            result = await session.execute(
+                select(Listing.id).where(
+                    Listing.is_active == True,  # noqa: E712
+                    Listing.status == 'approved',
+                    and_(*(Listing.additional_info.ilike(like_pattern(term), escape='\\') for term in terms))
+                ).order_by(Listing.id.desc()).limit(limit)
+            )
+        return list(result.scalars())
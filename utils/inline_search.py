@@ -0,0 +1,112 @@
+"""Кэши inline-режима: готовые карточки объявлений и результаты запросов.
+
+Inline-запросы приходят на каждое нажатие клавиши, поэтому ответ
+собирается без обращения к базе: id подходящих объявлений дает битовый
+индекс /search, текст карточек хранится заранее отрисованным. Результаты
+кэшируются по нормализованной строке запроса (LRU); любая публикация или
+снятие объявления сбрасывает кэш результатов.
+"""
+import logging
+import time
+from collections import OrderedDict
+
+from sqlalchemy import select
+from telegram import InlineQueryResultArticle, InputTextMessageContent
+
+from models.database import async_session_scope
+from models.listing import Listing
+from utils.constants import SEARCH_TYPES
+from utils.formatters import format_listing_message
+from utils.listing_events import on_listings_published, on_listings_removed
+from utils.search_index import get_search_index
+
+logger = logging.getLogger(__name__)
+
+INLINE_PAGE_SIZE = 50  # максимум результатов в одном ответе Bot API
+INLINE_MAX_RESULTS = 200
+INLINE_CACHE_SIZE = 1024
+INLINE_CACHE_TIME = 30  # секунд кэширования ответа на стороне Telegram
+
+def render_article(listing) -> InlineQueryResultArticle:
+    """Готовый результат inline-запроса; объекты Bot API неизменяемы и переиспользуются."""
+    search_type = SEARCH_TYPES.get(listing.search_type, {}).get('name', listing.search_type)
+    return InlineQueryResultArticle(
+        id=str(listing.id),
+        title=f"{listing.nickname} — {search_type}, {listing.search_goal}",
+        description=(
+            f"{listing.server} · {listing.platform} · {listing.role} · {listing.ship_type} · "
+            f"{listing.age} лет · {listing.experience} ч"
+        ),
+        input_message_content=InputTextMessageContent(
+            format_listing_message(listing), parse_mode='MarkdownV2'
+        ),
+    )
+
+_articles = {}  # listing_id -> InlineQueryResultArticle
+_results = OrderedDict()  # нормализованный запрос -> (число совпадений, id)
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+def normalize_query(query: str) -> str:
+    return ' '.join(query.lower().split())
+
+def cached_search(query: str, parse):
+    """Возвращает (число совпадений, id объявлений) для строки запроса.
+
+    parse превращает строку в (filters, ranges) и может бросить ValueError.
+    """
+    key = normalize_query(query)
+    cached = _results.get(key)
+    if cached is not None:
+        _results.move_to_end(key)
+        _stats['hits'] += 1
+        return cached
+
+    _stats['misses'] += 1
+    filters, ranges = parse(key)
+    cached = get_search_index().search(filters, ranges, limit=INLINE_MAX_RESULTS)
+    _results[key] = cached
+    if len(_results) > INLINE_CACHE_SIZE:
+        _results.popitem(last=False)
+    return cached
+
+def get_articles(listing_ids):
+    return [_articles[listing_id] for listing_id in listing_ids if listing_id in _articles]
+
+def inline_cache_stats() -> dict:
+    return {**_stats, 'queries': len(_results), 'articles': len(_articles)}
+
+async def load_inline_articles(application=None):
+    """post_init: отрисовывает карточки опубликованных объявлений."""
+    started = time.monotonic()
+    async with async_session_scope() as session:
+        result = await session.execute(
+            select(Listing).where(
+                Listing.is_active == True,  # noqa: E712
+                Listing.status == 'approved'
+            )
+        )
+        _articles.clear()
+        for listing in result.scalars():
+            _articles[listing.id] = render_article(listing)
+    _results.clear()
+    logger.info(f"Rendered {len(_articles)} inline articles in {time.monotonic() - started:.2f}s")
+
+def _invalidate_results():
+    if _results:
+        _results.clear()
+        _stats['invalidations'] += 1
+
+@on_listings_published
+def _add_articles(listings):
+    for listing in listings:
+        _articles[listing.id] = render_article(listing)
+    _invalidate_results()
+
+@on_listings_removed
+def _remove_articles(listing_ids):
+    if listing_ids is None:
+        _articles.clear()
+    else:
+        for listing_id in listing_ids:
+            _articles.pop(listing_id, None)
+    _invalidate_results()
@@ -1,3 +1,11 @@
+"""Клавиатуры бота.
+
+Разметка Telegram неизменяема, поэтому постоянные клавиатуры собираются
+один раз при импорте и хранятся в реестре KEYBOARDS. Клавиатуры с id
+объявления (модерация, управление) строятся по шаблонам: готовая
+сериализованная форма для outbox и кэш объектов для последних объявлений.
+"""
+from functools import lru_cache
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
 from utils.constants import (
     GENDERS, ROLES, FACTIONS, SERVERS,
@@ -7,6 +15,8 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+KEYBOARD_CACHE_SIZE = 1024
+
 def create_grid_keyboard(items, prefix, row_width=3):
     """Создание клавиатуры с кнопками в сетке."""
     buttons = []
@@ -42,76 +52,121 @@ def create_keyboard_from_list(items, row_width=3):
         buttons.append(row)
     return ReplyKeyboardMarkup(buttons, resize_keyboard=True, one_time_keyboard=True)
 
+class InlineKeyboardTemplate:
+    """Inline-клавиатура с параметрами в callback_data, например 'mod_approve_{listing_id}'."""
+
+    def __init__(self, rows):
+        self._rows = tuple(tuple(row) for row in rows)  # ((текст, шаблон callback_data), ...)
+        self.markup = lru_cache(maxsize=KEYBOARD_CACHE_SIZE)(self._build)
+
+    def _build(self, **params):
+        return InlineKeyboardMarkup([
+            [InlineKeyboardButton(text, callback_data=data.format(**params)) for text, data in row]
+            for row in self._rows
+        ])
+
+    def to_dict(self, **params):
+        """Сериализованная форма, как InlineKeyboardMarkup.to_dict(), без сборки объектов."""
+        return {'inline_keyboard': [
+            [{'text': text, 'callback_data': data.format(**params)} for text, data in row]
+            for row in self._rows
+        ]}
+
+MODERATION_KEYBOARD = InlineKeyboardTemplate([[
+    ("✅ Принять", "mod_approve_{listing_id}"),
+    ("❌ Отклонить", "mod_decline_{listing_id}"),
+]])
+LISTING_MANAGEMENT_KEYBOARD = InlineKeyboardTemplate([[
+    ("🔄 Обновить", "refresh_{listing_id}"),
+    ("🗑 Удалить", "delete_{listing_id}"),
+]])
+
+# Постоянные клавиатуры: собираются один раз и переиспользуются
+KEYBOARDS = {
+    'search_type': create_keyboard_from_list([data['name'] for data in SEARCH_TYPES.values()]),
+    'search_goal': create_keyboard_from_list(SEARCH_GOALS),
+    'gender': create_keyboard_from_list(GENDERS),
+    'role': create_keyboard_from_list(ROLES),
+    'faction': create_keyboard_from_list(FACTIONS),
+    'server': create_keyboard_from_list(SERVERS),
+    'ship_type': create_keyboard_from_list(SHIP_TYPES),
+    'platform': create_keyboard_from_list(PLATFORMS),
+    'contact_method': ReplyKeyboardMarkup(
+        [["Telegram"], ["Discord"]], resize_keyboard=True, one_time_keyboard=True
+    ),
+    'contact_type': InlineKeyboardMarkup([[
+        InlineKeyboardButton("Telegram", callback_data="contact_telegram"),
+        InlineKeyboardButton("Discord", callback_data="contact_discord"),
+        InlineKeyboardButton("Голосовой чат", callback_data="contact_voice")
+    ]]),
+    'start_menu': ReplyKeyboardMarkup(
+        [["Создать анкету", "Мои анкеты", "Отмена"]],
+        resize_keyboard=True,
+        one_time_keyboard=False  # Keep keyboard visible
+    ),
+    'main_menu': ReplyKeyboardMarkup(
+        [["/create 📝 Создать объявление", "/manage 📋 Мои объявления", "/cancel ❌ Отмена"]],
+        resize_keyboard=True
+    ),
+    'admin_panel': InlineKeyboardMarkup([
+        [
+            InlineKeyboardButton("Автомодерация", callback_data="admin_mod_auto"),
+            InlineKeyboardButton("Ручная модерация", callback_data="admin_mod_manual")
+        ],
+        [InlineKeyboardButton("📊 Статистика", callback_data="admin_stats")],
+        [InlineKeyboardButton("🗑 Очистить все объявления", callback_data="admin_clear_all")]
+    ]),
+    'admin_back': InlineKeyboardMarkup([[InlineKeyboardButton("◀️ Назад", callback_data="admin_back")]]),
+}
+
+def get_keyboard(name):
+    """Готовая клавиатура из реестра."""
+    return KEYBOARDS[name]
+
 def create_search_type_keyboard():
-    """Создание клавиатуры для выбора типа поиска."""
-    buttons = []
-    for type_, data in SEARCH_TYPES.items():
-        button_text = str(data["name"]) if isinstance(data, dict) and "name" in data else str(type_)
-        buttons.append(button_text)
-    return create_keyboard_from_list(buttons)
+    """Клавиатура для выбора типа поиска."""
+    return KEYBOARDS['search_type']
 
 def create_search_goal_keyboard():
-    """Создание клавиатуры для выбора цели поиска."""
-    return create_keyboard_from_list(SEARCH_GOALS)
+    """Клавиатура для выбора цели поиска."""
+    return KEYBOARDS['search_goal']
 
 def create_gender_keyboard():
-    """Создание клавиатуры для выбора пола."""
-    return create_keyboard_from_list(GENDERS)
+    """Клавиатура для выбора пола."""
+    return KEYBOARDS['gender']
 
 def create_role_keyboard():
-    """Создание клавиатуры для выбора роли."""
-    return create_keyboard_from_list(ROLES)
+    """Клавиатура для выбора роли."""
+    return KEYBOARDS['role']
 
 def create_faction_keyboard():
-    """Создание клавиатуры для выбора фракции."""
-    return create_keyboard_from_list(FACTIONS)
+    """Клавиатура для выбора фракции."""
+    return KEYBOARDS['faction']
 
 def create_server_keyboard():
-    """Создание клавиатуры для выбора сервера."""
-    return create_keyboard_from_list(SERVERS)
+    """Клавиатура для выбора сервера."""
+    return KEYBOARDS['server']
 
 def create_ship_keyboard():
-    """Создание клавиатуры для выбора типа корабля."""
-    return create_keyboard_from_list(SHIP_TYPES)
+    """Клавиатура для выбора типа корабля."""
+    return KEYBOARDS['ship_type']
 
 def create_platform_keyboard():
-    """Создание клавиатуры для выбора платформы."""
-    return create_keyboard_from_list(PLATFORMS)
+    """Клавиатура для выбора платформы."""
+    return KEYBOARDS['platform']
 
 def create_moderation_keyboard(listing_id):
-    """Создание клавиатуры для модерации."""
-    buttons = [[
-        InlineKeyboardButton("✅ Принять", callback_data=f"mod_approve_{listing_id}"),
-        InlineKeyboardButton("❌ Отклонить", callback_data=f"mod_decline_{listing_id}")
-    ]]
-    return InlineKeyboardMarkup(buttons)
+    """Клавиатура для модерации."""
+    return MODERATION_KEYBOARD.markup(listing_id=listing_id)
 
 def create_listing_management_keyboard(listing_id):
-    """Создание клавиатуры для управления объявлением."""
-    buttons = [[
-        InlineKeyboardButton("🔄 Обновить", callback_data=f"refresh_{listing_id}"),
-        InlineKeyboardButton("🗑 Удалить", callback_data=f"delete_{listing_id}")
-    ]]
-    return InlineKeyboardMarkup(buttons)
+    """Клавиатура для управления объявлением."""
+    return LISTING_MANAGEMENT_KEYBOARD.markup(listing_id=listing_id)
 
 def create_contact_type_keyboard():
     """Create contact type selection keyboard."""
-    keyboard = [
-        [
-            InlineKeyboardButton("Telegram", callback_data="contact_telegram"),
-            InlineKeyboardButton("Discord", callback_data="contact_discord"),
-            InlineKeyboardButton("Голосовой чат", callback_data="contact_voice")
-        ]
-    ]
-    return InlineKeyboardMarkup(keyboard)
+    return KEYBOARDS['contact_type']
 
 def create_main_menu_keyboard():
     """Create main menu keyboard."""
-    keyboard = [
-        [
-            "/create 📝 Создать объявление",
-            "/manage 📋 Мои объявления",
-            "/cancel ❌ Отмена"
-        ]
-    ]
-    return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
\ No newline at end of file
+    return KEYBOARDS['main_menu']
@@ -0,0 +1,47 @@
+"""Уведомления о публикации и снятии объявлений.
+
+In-memory структуры (поисковый индекс и т.п.) подписываются на события и
+обновляются после коммита транзакции, изменившей объявления. Ошибка одного
+подписчика не мешает остальным и не откатывает уже зафиксированное действие.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+_published = []
+_removed = []
+
+def on_listings_published(callback):
+    """Подписывает callback(listings) на публикацию объявлений."""
+    _published.append(callback)
+    return callback
+
+def on_listings_removed(callback):
+    """Подписывает callback(listing_ids) на снятие объявлений.
+
+    listing_ids равен None, если удалены все объявления.
+    """
+    _removed.append(callback)
+    return callback
+
+def _notify(callbacks, payload):
+    for callback in callbacks:
+        try:
+            callback(payload)
+        except Exception as e:
+            logger.error(f"Listing event handler {callback.__qualname__} failed: {e}", exc_info=True)
+
+def listings_published(listings):
+    """Объявления одобрены и активны; вызывается после коммита."""
+    listings = [listing for listing in listings if listing.is_active and listing.status == 'approved']
+    if listings:
+        _notify(_published, listings)
+
+def listings_removed(listing_ids):
+    """Объявления удалены, истекли или отклонены; вызывается после коммита."""
+    if listing_ids is None:
+        _notify(_removed, None)
+        return
+    listing_ids = list(listing_ids)
+    if listing_ids:
+        _notify(_removed, listing_ids)
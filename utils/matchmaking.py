@@ -0,0 +1,156 @@
+"""Очередь подбора команды для быстрых поисков пати.
+
+Игроки ждут в корзинах по (сервер, платформа, цель, тип корабля). Как
+только в корзине набирается экипаж корабля (шлюп 2, бригантина 3,
+галеон 4), первые игроки очереди объединяются в команду и сразу получают
+сообщение. Корзина — OrderedDict, поэтому вход, выход и извлечение
+первых игроков выполняются за O(1); ожидание ограничено таймаутом на
+колесе таймеров. Очередь живет только в памяти: после перезапуска бота
+игроки встают в нее заново.
+"""
+import html
+import logging
+import time
+from collections import OrderedDict
+
+from telegram.error import TelegramError
+
+from utils.timing_wheel import HierarchicalTimingWheel
+
+logger = logging.getLogger(__name__)
+
+CREW_SIZES = {
+    'Шлюп': 2,
+    'Бригантина': 3,
+    'Галеон': 4,
+}
+MATCHMAKING_TIMEOUT = 15 * 60  # секунд ожидания в очереди
+MATCHMAKING_TICK_SECONDS = 5
+
+class QueueTicket:
+    """Игрок в очереди подбора."""
+    __slots__ = ('user_id', 'bucket', 'display_name', 'contacts', 'joined_at')
+
+    def __init__(self, user_id, bucket, display_name, contacts=None, joined_at=None):
+        self.user_id = user_id
+        self.bucket = bucket  # (server, platform, search_goal, ship_type)
+        self.display_name = display_name
+        self.contacts = contacts
+        self.joined_at = joined_at or time.time()
+
+    def __repr__(self):
+        return f"<QueueTicket(user_id={self.user_id}, bucket={self.bucket})>"
+
+class MatchmakingQueue:
+    """Корзины ожидающих игроков и таймауты ожидания."""
+
+    def __init__(self, now=None, timeout=MATCHMAKING_TIMEOUT):
+        self.timeout = timeout
+        self._buckets = {}  # ключ корзины -> OrderedDict(user_id -> QueueTicket)
+        self._tickets = {}  # user_id -> QueueTicket
+        self._wheel = HierarchicalTimingWheel(
+            time.time() if now is None else now, tick_seconds=MATCHMAKING_TICK_SECONDS
+        )
+        self.stats = {'joined': 0, 'matched': 0, 'crews': 0, 'left': 0, 'timed_out': 0}
+
+    def __len__(self):
+        return len(self._tickets)
+
+    def __contains__(self, user_id):
+        return user_id in self._tickets
+
+    def get(self, user_id):
+        return self._tickets.get(user_id)
+
+    def waiting(self, bucket) -> int:
+        return len(self._buckets.get(bucket, ()))
+
+    def join(self, ticket, now=None):
+        """Ставит игрока в очередь.
+
+        Возвращает список билетов собранного экипажа или None, если игрок
+        ждет. Повторный вход переносит игрока в новую корзину в конец очереди.
+        """
+        if ticket.user_id in self._tickets:
+            self.leave(ticket.user_id)
+
+        crew_size = CREW_SIZES[ticket.bucket[3]]
+        queue = self._buckets.setdefault(ticket.bucket, OrderedDict())
+        queue[ticket.user_id] = ticket
+        self._tickets[ticket.user_id] = ticket
+        self.stats['joined'] += 1
+
+        if len(queue) >= crew_size:
+            crew = [queue.popitem(last=False)[1] for _ in range(crew_size)]
+            if not queue:
+                del self._buckets[ticket.bucket]
+            for member in crew:
+                del self._tickets[member.user_id]
+                self._wheel.cancel(member.user_id)
+            self.stats['matched'] += crew_size
+            self.stats['crews'] += 1
+            return crew
+
+        self._wheel.add(ticket.user_id, (time.time() if now is None else now) + self.timeout)
+        return None
+
+    def leave(self, user_id):
+        """Убирает игрока из очереди; возвращает его билет или None."""
+        ticket = self._tickets.pop(user_id, None)
+        if ticket is None:
+            return None
+        queue = self._buckets[ticket.bucket]
+        del queue[user_id]
+        if not queue:
+            del self._buckets[ticket.bucket]
+        self._wheel.cancel(user_id)
+        self.stats['left'] += 1
+        return ticket
+
+    def expire(self, now=None):
+        """Убирает игроков, чье ожидание истекло; возвращает их билеты."""
+        expired = []
+        for user_id in self._wheel.advance(time.time() if now is None else now):
+            ticket = self.leave(user_id)
+            if ticket:
+                expired.append(ticket)
+        self.stats['left'] -= len(expired)
+        self.stats['timed_out'] += len(expired)
+        return expired
+
+_queue = MatchmakingQueue()
+
+def get_matchmaking_queue() -> MatchmakingQueue:
+    return _queue
+
+def format_crew_message(crew, ship_type) -> str:
+    """HTML-сообщение участнику собранной команды."""
+    lines = [f"⚓️ Команда на {html.escape(ship_type.lower())} собрана!\n"]
+    for member in crew:
+        name = f'<a href="tg://user?id={member.user_id}">{html.escape(member.display_name)}</a>'
+        if member.contacts:
+            name += f" — {html.escape(member.contacts)}"
+        lines.append(f"• {name}")
+    lines.append("\nСвяжитесь друг с другом и удачного плавания!")
+    return "\n".join(lines)
+
+async def notify_crew(bot, crew):
+    """Сразу сообщает всем участникам экипажа о собранной команде."""
+    text = format_crew_message(crew, crew[0].bucket[3])
+    for member in crew:
+        try:
+            await bot.send_message(member.user_id, text, parse_mode='HTML')
+        except TelegramError as e:
+            logger.warning(f"Could not notify user {member.user_id} about their crew: {e}")
+
+async def expire_matchmaking(context):
+    """JobQueue callback: снимает с очереди игроков, не дождавшихся команды."""
+    for ticket in _queue.expire():
+        try:
+            await context.bot.send_message(
+                ticket.user_id,
+                f"⌛ Команда не собралась за {_queue.timeout // 60} минут, вы удалены из очереди.\n"
+                "Попробуйте снова командой /party"
+            )
+        except TelegramError as e:
+            logger.warning(f"Could not notify user {ticket.user_id} about queue timeout: {e}")
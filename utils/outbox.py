@@ -0,0 +1,268 @@
+"""Доставка сообщений из outbox фоновым обработчиком JobQueue."""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, delete
+from telegram import InlineKeyboardMarkup
+from telegram.error import RetryAfter, BadRequest, Forbidden, TelegramError
+
+from config import config
+from models.database import async_session_scope
+from models.listing import Listing
+from models.outbox import OutboxMessage, enqueue, listing_key
+from models.timer import ListingTimer
+from utils.formatters import format_listing_message, format_moderation_message
+from utils.keyboards import LISTING_MANAGEMENT_KEYBOARD, MODERATION_KEYBOARD
+from utils.listing_events import listings_removed
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_POLL_INTERVAL = 5  # секунд между плановыми проходами
+OUTBOX_BATCH_SIZE = 20
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_RETENTION_DAYS = 7
+BACKOFF_BASE_SECONDS = 2
+BACKOFF_MAX_SECONDS = 600
+
+# Ошибки BadRequest, которые означают, что действие уже выполнено
+ALREADY_DONE_ERRORS = (
+    'message to delete not found',
+    'message is not modified',
+)
+
+_drain_lock = asyncio.Lock()
+_rerun_requested = False
+
+async def enqueue_listing_publication(session, listing, idempotency_key=None):
+    """Ставит в очередь публикацию объявления в канале объявлений.
+
+    После доставки message_id объявления обновляется, а предыдущее
+    сообщение (если было) удаляется.
+    """
+    return await enqueue(
+        session,
+        idempotency_key or listing_key('publish', listing),
+        'send_message',
+        config.LISTINGS_CHANNEL_ID,
+        listing_id=listing.id,
+        on_delivered='listing_published',
+        text=format_listing_message(listing),
+        parse_mode='MarkdownV2',
+        reply_markup=LISTING_MANAGEMENT_KEYBOARD.to_dict(listing_id=listing.id),
+    )
+
+async def enqueue_moderation_post(session, listing):
+    """Ставит в очередь отправку объявления в канал модерации."""
+    return await enqueue(
+        session,
+        listing_key('moderation', listing),
+        'send_message',
+        config.MODERATION_CHANNEL_ID,
+        listing_id=listing.id,
+        text=format_moderation_message(listing),
+        parse_mode='MarkdownV2',
+        reply_markup=MODERATION_KEYBOARD.to_dict(listing_id=listing.id),
+    )
+
+async def enqueue_notification(session, idempotency_key, user_id, text, listing_id=None):
+    """Ставит в очередь личное уведомление пользователю."""
+    return await enqueue(
+        session, idempotency_key, 'send_message', user_id,
+        listing_id=listing_id, text=text,
+    )
+
+async def enqueue_channel_deletion(session, message_id, listing_id=None):
+    """Ставит в очередь удаление сообщения из канала объявлений."""
+    return await enqueue(
+        session,
+        f"delete:{config.LISTINGS_CHANNEL_ID}:{message_id}",
+        'delete_message',
+        config.LISTINGS_CHANNEL_ID,
+        listing_id=listing_id,
+        message_id=message_id,
+    )
+
+def kick_outbox(context):
+    """Запускает внеочередной проход outbox, не дожидаясь интервала."""
+    context.application.create_task(drain_outbox(context))
+
+async def drain_outbox(context):
+    """JobQueue callback: доставляет накопившиеся сообщения пачками."""
+    global _rerun_requested
+    if _drain_lock.locked():
+        # Текущий проход подхватит новые записи
+        _rerun_requested = True
+        return
+
+    async with _drain_lock:
+        while True:
+            _rerun_requested = False
+            delivered, total, throttled = await _drain_batch(context.bot)
+            if total:
+                logger.debug(f"Outbox batch processed: {delivered}/{total} delivered")
+            if throttled or (total and not delivered):
+                # Повторы ждут следующего интервала
+                break
+            if not _rerun_requested and total < OUTBOX_BATCH_SIZE:
+                break
+
+async def _drain_batch(bot):
+    now = datetime.utcnow()
+    async with async_session_scope() as session:
+        result = await session.execute(
+            select(OutboxMessage).where(
+                OutboxMessage.status == 'pending',
+                OutboxMessage.next_attempt_at <= now
+            ).order_by(OutboxMessage.id).limit(OUTBOX_BATCH_SIZE)
+        )
+        batch = result.scalars().all()
+
+    delivered = 0
+    throttled = False
+    for message in batch:
+        try:
+            result = await _call(bot, message)
+        except RetryAfter as e:
+            delay = _seconds(e.retry_after)
+            logger.warning(f"Outbox flood control, retrying {message.idempotency_key} in {delay}s")
+            await _reschedule(message, delay, str(e), count_attempt=False)
+            # Ограничение глобальное: остальная пачка подождет
+            throttled = True
+            break
+        except (BadRequest, Forbidden) as e:
+            if isinstance(e, BadRequest) and any(err in str(e).lower() for err in ALREADY_DONE_ERRORS):
+                await _mark_delivered(message, None)
+                delivered += 1
+            else:
+                logger.error(f"Outbox message {message.idempotency_key} rejected: {e}")
+                await _mark_failed(message, str(e))
+        except TelegramError as e:
+            delay = min(BACKOFF_BASE_SECONDS * 2 ** message.attempts, BACKOFF_MAX_SECONDS)
+            logger.warning(f"Outbox delivery of {message.idempotency_key} failed, retry in {delay}s: {e}")
+            await _reschedule(message, delay, str(e))
+        else:
+            await _mark_delivered(message, result)
+            delivered += 1
+
+    return delivered, len(batch), throttled
+
+async def _call(bot, message):
+    kwargs = message.kwargs
+    if kwargs.get('reply_markup'):
+        kwargs['reply_markup'] = InlineKeyboardMarkup.de_json(kwargs['reply_markup'], bot)
+    method = getattr(bot, message.method)
+    return await method(chat_id=message.chat_id, **kwargs)
+
+def _seconds(value) -> float:
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    return float(value)
+
+async def _reschedule(message, delay, error, count_attempt=True):
+    async with async_session_scope() as session:
+        row = await session.get(OutboxMessage, message.id)
+        if count_attempt:
+            row.attempts += 1
+        row.last_error = error[:200]
+        if row.attempts >= OUTBOX_MAX_ATTEMPTS:
+            logger.error(f"Outbox message {row.idempotency_key} failed after {row.attempts} attempts")
+            withdrawn = await _fail(session, row)
+        else:
+            row.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            withdrawn = None
+    if withdrawn:
+        listings_removed([withdrawn])
+
+async def _mark_failed(message, error):
+    async with async_session_scope() as session:
+        row = await session.get(OutboxMessage, message.id)
+        row.attempts += 1
+        row.last_error = error[:200]
+        withdrawn = await _fail(session, row)
+    if withdrawn:
+        listings_removed([withdrawn])
+
+async def _fail(session, row):
+    """Помечает сообщение как окончательно не доставленное.
+
+    Возвращает id объявления, снятого из-за неудачной публикации, — о нем
+    нужно сообщить подписчикам listings_removed после коммита.
+    """
+    row.status = 'failed'
+    if row.on_delivered == 'listing_published':
+        return await _on_publication_failed(session, row)
+    return None
+
+async def _on_publication_failed(session, row):
+    """Снимает объявление, которое не удалось опубликовать, и сообщает об этом.
+
+    Иначе объявление осталось бы одобренным и активным без сообщения в
+    канале: его находил бы поиск, а автор считал бы его опубликованным.
+    Если это обновление, в канале остается прежнее сообщение, и объявление
+    не трогается.
+    """
+    listing = await session.get(Listing, row.listing_id)
+    if not listing or not listing.is_active or listing.message_id:
+        return None
+
+    listing.is_active = False
+    await session.execute(delete(ListingTimer).where(ListingTimer.listing_id == listing.id))
+    await enqueue_notification(
+        session, listing_key('publish_failed', listing), listing.user_id,
+        "❌ Не удалось опубликовать ваше объявление в канале, и оно снято.\n"
+        "Создайте новое объявление с помощью команды /create",
+        listing_id=listing.id
+    )
+    await enqueue(
+        session, listing_key('publish_failed_moderation', listing), 'send_message',
+        config.MODERATION_CHANNEL_ID, listing_id=listing.id,
+        text=f"⚠️ Объявление #{listing.id} не удалось опубликовать, оно снято: {row.last_error}",
+    )
+    logger.error(f"Listing {listing.id} withdrawn: publication {row.idempotency_key} failed")
+    return listing.id
+
+async def _mark_delivered(message, result):
+    async with async_session_scope() as session:
+        row = await session.get(OutboxMessage, message.id)
+        row.attempts += 1
+        row.status = 'sent'
+        row.sent_at = datetime.utcnow()
+
+        if message.on_delivered == 'listing_published' and result is not None:
+            await _on_listing_published(session, message, result.message_id)
+
+async def _on_listing_published(session, message, new_message_id):
+    """Фиксирует message_id опубликованного объявления в той же транзакции."""
+    listing = await session.get(Listing, message.listing_id)
+    if not listing or not listing.is_active:
+        # Объявление удалили, пока публикация стояла в очереди
+        await enqueue_channel_deletion(session, new_message_id, message.listing_id)
+        return
+
+    old_message_id = listing.message_id
+    listing.message_id = new_message_id
+    if old_message_id and old_message_id != new_message_id:
+        await enqueue_channel_deletion(session, old_message_id, listing.id)
+
+async def prune_outbox(context):
+    """JobQueue callback: удаляет давно доставленные и недоставленные записи outbox.
+
+    Вместе со строкой освобождается ее ключ идемпотентности. Для
+    недоставленных записей next_attempt_at — время последней попытки.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=OUTBOX_RETENTION_DAYS)
+    async with async_session_scope() as session:
+        sent = await session.execute(
+            delete(OutboxMessage).where(
+                OutboxMessage.status == 'sent',
+                OutboxMessage.sent_at < cutoff
+            )
+        )
+        failed = await session.execute(
+            delete(OutboxMessage).where(
+                OutboxMessage.status == 'failed',
+                OutboxMessage.next_attempt_at < cutoff
+            )
+        )
+    logger.info(f"Pruned {sent.rowcount} delivered and {failed.rowcount} failed outbox messages")
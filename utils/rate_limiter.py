@@ -0,0 +1,280 @@
+"""Глобальный ограничитель исходящих запросов Bot API с приоритетной очередью."""
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import timedelta
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Классы приоритета: меньше — важнее
+PRIORITY_MODERATION = 0
+PRIORITY_NOTIFICATION = 1
+PRIORITY_CHANNEL = 2
+PRIORITY_NAMES = {
+    PRIORITY_MODERATION: 'moderation',
+    PRIORITY_NOTIFICATION: 'notification',
+    PRIORITY_CHANNEL: 'channel',
+}
+
+# Интерактивные ответы должны уходить без задержки
+INTERACTIVE_ENDPOINTS = {'answerCallbackQuery', 'answerInlineQuery'}
+
+# Ожидание дольше этого порога считается троттлингом
+THROTTLE_WARNING_SECONDS = 5
+MAX_CHAT_BUCKETS = 10000
+
+class TokenBucket:
+    """Классический token bucket: rate токенов в секунду, не больше capacity."""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Сколько секунд ждать до появления токена."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+class _Waiter:
+    __slots__ = ('chat_id', 'priority', 'future', 'enqueued_at')
+
+    def __init__(self, chat_id, priority, future, enqueued_at):
+        self.chat_id = chat_id
+        self.priority = priority
+        self.future = future
+        self.enqueued_at = enqueued_at
+
+class PriorityRateLimiter(BaseRateLimiter[dict]):
+    """Планировщик запросов к Bot API.
+
+    Общий token bucket ограничивает бота целиком, отдельные bucket'ы —
+    каждый чат (группы и каналы ~20 сообщений в минуту, личные чаты ~1 в
+    секунду). Запросы ждут в очереди с приоритетами: модерация, затем
+    уведомления пользователям, затем публикации в канале.
+    """
+
+    def __init__(self, overall_max_rate: float = 30, group_max_rate: float = 20,
+                 group_time_period: float = 60, private_max_rate: float = 1,
+                 max_retries: int = 3):
+        self._overall_rate = overall_max_rate
+        self._group_rate = group_max_rate / group_time_period
+        self._group_capacity = group_max_rate
+        self._private_rate = private_max_rate
+        self._max_retries = max_retries
+
+        self._global_bucket = None
+        self._chat_buckets = {}
+        self._blocked_until = {}  # chat_id (None — весь бот) -> loop time
+        self._queue = []
+        self._counter = itertools.count()
+        self._wakeup = None
+        self._dispatcher = None
+
+        self._granted = {priority: 0 for priority in PRIORITY_NAMES}
+        self._total_wait = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self._max_wait = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self._last_wait = 0.0
+        self._throttled = 0
+        self._retry_after = 0
+
+    async def initialize(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._global_bucket = TokenBucket(self._overall_rate, self._overall_rate, loop.time())
+        self._wakeup = asyncio.Event()
+        self._dispatcher = loop.create_task(self._dispatch())
+
+    async def shutdown(self) -> None:
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        for _, _, waiter in self._queue:
+            if not waiter.future.done():
+                waiter.future.cancel()
+        self._queue.clear()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get('chat_id')
+        priority = self._priority(endpoint, chat_id)
+
+        for attempt in range(self._max_retries + 1):
+            await self._acquire(chat_id, priority)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                self._retry_after += 1
+                delay = e.retry_after.total_seconds() if isinstance(e.retry_after, timedelta) else e.retry_after
+                logger.warning(f"Flood control on {endpoint} (chat {chat_id}), pausing {delay}s")
+                self._blocked_until[chat_id] = asyncio.get_running_loop().time() + delay
+                if attempt == self._max_retries:
+                    raise
+
+    def _priority(self, endpoint, chat_id) -> int:
+        if endpoint in INTERACTIVE_ENDPOINTS or chat_id == config.MODERATION_CHANNEL_ID:
+            return PRIORITY_MODERATION
+        if isinstance(chat_id, int) and chat_id < 0:
+            return PRIORITY_CHANNEL
+        return PRIORITY_NOTIFICATION
+
+    async def _acquire(self, chat_id, priority):
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(chat_id, priority, loop.create_future(), loop.time())
+        heapq.heappush(self._queue, (priority, next(self._counter), waiter))
+        self._wakeup.set()
+        await waiter.future
+
+    def _chat_bucket(self, chat_id, now):
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= MAX_CHAT_BUCKETS:
+                self._prune_buckets(now)
+            if isinstance(chat_id, int) and chat_id < 0:
+                bucket = TokenBucket(self._group_rate, self._group_capacity, now)
+            else:
+                bucket = TokenBucket(self._private_rate, self._private_rate, now)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _prune_buckets(self, now):
+        """Удаляет bucket'ы неактивных чатов (полностью наполненные)."""
+        for chat_id in [cid for cid, b in self._chat_buckets.items() if b.is_full(now)]:
+            del self._chat_buckets[chat_id]
+
+    def _blocked_for(self, chat_id, now) -> float:
+        blocked_until = self._blocked_until.get(chat_id)
+        if blocked_until is None:
+            return 0.0
+        if blocked_until <= now:
+            # Пауза после RetryAfter закончилась
+            del self._blocked_until[chat_id]
+            return 0.0
+        return blocked_until - now
+
+    def _wait_time(self, chat_id, now) -> float:
+        wait = max(self._blocked_for(None, now), self._blocked_for(chat_id, now))
+        if chat_id is not None:
+            wait = max(wait, self._chat_bucket(chat_id, now).wait_time(now))
+        return wait
+
+    async def _dispatch(self):
+        """Выдает разрешения ожидающим запросам в порядке приоритета."""
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = loop.time()
+            global_wait = self._global_bucket.wait_time(now)
+            if global_wait > 0:
+                await self._sleep(global_wait)
+                continue
+
+            # Записи снимаются с кучи по приоритету до первой готовой;
+            # пропущенные (чат на паузе или без токенов) возвращаются обратно
+            chosen = None
+            skipped = []
+            min_wait = None
+            while self._queue:
+                entry = heapq.heappop(self._queue)
+                if entry[2].future.done():
+                    # Запрос отменен, пока ждал в очереди
+                    continue
+                wait = self._wait_time(entry[2].chat_id, now)
+                if wait <= 0:
+                    chosen = entry
+                    break
+                skipped.append(entry)
+                min_wait = wait if min_wait is None else min(min_wait, wait)
+            for entry in skipped:
+                heapq.heappush(self._queue, entry)
+
+            if chosen is None:
+                if min_wait is not None:
+                    await self._sleep(min_wait)
+                continue
+
+            waiter = chosen[2]
+            self._global_bucket.consume(now)
+            if waiter.chat_id is not None:
+                self._chat_bucket(waiter.chat_id, now).consume(now)
+            self._record_wait(waiter, now - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+    async def _sleep(self, timeout):
+        """Спит timeout секунд или до появления нового запроса."""
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _record_wait(self, waiter, waited):
+        priority = waiter.priority if waiter.priority in self._granted else PRIORITY_CHANNEL
+        self._granted[priority] += 1
+        self._total_wait[priority] += waited
+        self._max_wait[priority] = max(self._max_wait[priority], waited)
+        self._last_wait = waited
+        if waited >= THROTTLE_WARNING_SECONDS:
+            self._throttled += 1
+            logger.warning(
+                f"Bot API request for chat {waiter.chat_id} waited {waited:.1f}s "
+                f"in rate limiter queue (depth {len(self._queue)})"
+            )
+
+    def stats(self) -> dict:
+        """Метрики очереди: глубина, время ожидания, число троттлингов."""
+        depth = {name: 0 for name in PRIORITY_NAMES.values()}
+        for priority, _, _ in self._queue:
+            depth[PRIORITY_NAMES.get(priority, 'channel')] += 1
+        return {
+            'queue_depth': len(self._queue),
+            'queue_depth_by_priority': depth,
+            'granted': {PRIORITY_NAMES[p]: n for p, n in self._granted.items()},
+            'avg_wait_seconds': {
+                PRIORITY_NAMES[p]: (self._total_wait[p] / n if n else 0.0)
+                for p, n in self._granted.items()
+            },
+            'max_wait_seconds': {PRIORITY_NAMES[p]: w for p, w in self._max_wait.items()},
+            'last_wait_seconds': self._last_wait,
+            'throttled': self._throttled,
+            'retry_after': self._retry_after,
+            'tracked_chats': len(self._chat_buckets),
+        }
+
+async def log_rate_limiter_stats(context):
+    """JobQueue callback: пишет метрики ограничителя в лог."""
+    rate_limiter = context.bot.rate_limiter
+    if not isinstance(rate_limiter, PriorityRateLimiter):
+        return
+    stats = rate_limiter.stats()
+    level = logging.WARNING if stats['queue_depth'] or stats['throttled'] else logging.DEBUG
+    logger.log(level, f"Rate limiter stats: {stats}")
@@ -0,0 +1,208 @@
+"""Подбор похожих напарников для /recommend.
+
+Опубликованные объявления хранятся матрицей признаков NumPy: one-hot
+категорий из utils.constants и нормированные возраст и опыт. Запрос
+оценивается против всех кандидатов одним умножением матрицы на вектор,
+лучшие k выбираются через argpartition. Сервер, платформа и совместимый
+тип поиска — жесткие фильтры в виде масок.
+
+Матрица обновляется через utils.listing_events после каждого коммита:
+освободившиеся строки переиспользуются, при нехватке места емкость
+удваивается.
+"""
+import logging
+import math
+import time
+
+import numpy as np
+from sqlalchemy import select
+
+from models.database import async_session_scope
+from models.listing import Listing
+from utils.constants import (
+    GENDERS, ROLES, FACTIONS, SERVERS, SHIP_TYPES, PLATFORMS,
+    SEARCH_TYPES, SEARCH_GOALS
+)
+from utils.listing_events import on_listings_published, on_listings_removed
+
+logger = logging.getLogger(__name__)
+
+RECOMMEND_LIMIT = 5
+INITIAL_CAPACITY = 1024
+
+# Кого ищет объявление каждого типа
+COMPATIBLE_SEARCH_TYPES = {
+    'party': ('party',),
+    'player': ('team', 'player'),
+    'team': ('player',),
+}
+
+# Категориальные признаки и их вес в оценке сходства
+ONE_HOT_FEATURES = (
+    ('role', ROLES, 1.0),
+    ('search_goal', SEARCH_GOALS, 1.0),
+    ('ship_type', SHIP_TYPES, 0.8),
+    ('faction', FACTIONS, 0.5),
+    ('gender', GENDERS, 0.3),
+)
+AGE_WEIGHT = 1.5
+EXPERIENCE_WEIGHT = 1.5
+AGE_SCALE = 100
+EXPERIENCE_SCALE = math.log1p(10000)
+
+SERVER_CODES = {value: code for code, value in enumerate(SERVERS)}
+PLATFORM_CODES = {value: code for code, value in enumerate(PLATFORMS)}
+SEARCH_TYPE_CODES = {value: code for code, value in enumerate(SEARCH_TYPES)}
+UNKNOWN_CODE = -1
+
+_offsets = {}
+_width = 0
+for _field, _choices, _weight in ONE_HOT_FEATURES:
+    _offsets[_field] = (_width, {value: index for index, value in enumerate(_choices)}, _weight)
+    _width += len(_choices)
+AGE_COLUMN = _width
+EXPERIENCE_COLUMN = _width + 1
+FEATURE_WIDTH = _width + 2
+
+def encode_listing(listing) -> np.ndarray:
+    """Вектор признаков объявления."""
+    vector = np.zeros(FEATURE_WIDTH, dtype=np.float32)
+    for field, (offset, positions, weight) in _offsets.items():
+        position = positions.get(getattr(listing, field))
+        if position is not None:
+            vector[offset + position] = weight
+    vector[AGE_COLUMN] = AGE_WEIGHT * min(listing.age, AGE_SCALE) / AGE_SCALE
+    vector[EXPERIENCE_COLUMN] = (
+        EXPERIENCE_WEIGHT * min(math.log1p(listing.experience) / EXPERIENCE_SCALE, 1.0)
+    )
+    return vector
+
+class ListingRecommender:
+    """Матрица признаков опубликованных объявлений со строками-слотами."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._allocate(INITIAL_CAPACITY)
+        self._slots = {}  # listing_id -> строка
+        self._free = []
+        self._size = 0  # строк когда-либо занятых
+
+    def _allocate(self, capacity):
+        self.features = np.zeros((capacity, FEATURE_WIDTH), dtype=np.float32)
+        self.norms = np.zeros(capacity, dtype=np.float32)  # квадрат нормы строки
+        self.listing_ids = np.zeros(capacity, dtype=np.int64)
+        self.user_ids = np.zeros(capacity, dtype=np.int64)
+        self.servers = np.full(capacity, UNKNOWN_CODE, dtype=np.int8)
+        self.platforms = np.full(capacity, UNKNOWN_CODE, dtype=np.int8)
+        self.search_types = np.full(capacity, UNKNOWN_CODE, dtype=np.int8)
+        self.alive = np.zeros(capacity, dtype=bool)
+
+    def _grow(self):
+        old = (self.features, self.norms, self.listing_ids, self.user_ids,
+               self.servers, self.platforms, self.search_types, self.alive)
+        self._allocate(len(self.alive) * 2)
+        new = (self.features, self.norms, self.listing_ids, self.user_ids,
+               self.servers, self.platforms, self.search_types, self.alive)
+        for source, target in zip(old, new):
+            target[:len(source)] = source
+
+    def __len__(self):
+        return len(self._slots)
+
+    def add(self, listing):
+        """Добавляет или обновляет объявление."""
+        row = self._slots.get(listing.id)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                if self._size == len(self.alive):
+                    self._grow()
+                row = self._size
+                self._size += 1
+            self._slots[listing.id] = row
+
+        vector = encode_listing(listing)
+        self.features[row] = vector
+        self.norms[row] = vector @ vector
+        self.listing_ids[row] = listing.id
+        self.user_ids[row] = listing.user_id
+        self.servers[row] = SERVER_CODES.get(listing.server, UNKNOWN_CODE)
+        self.platforms[row] = PLATFORM_CODES.get(listing.platform, UNKNOWN_CODE)
+        self.search_types[row] = SEARCH_TYPE_CODES.get(listing.search_type, UNKNOWN_CODE)
+        self.alive[row] = True
+
+    def remove(self, listing_id) -> bool:
+        row = self._slots.pop(listing_id, None)
+        if row is None:
+            return False
+        self.alive[row] = False
+        self._free.append(row)
+        return True
+
+    def recommend(self, listing, limit=RECOMMEND_LIMIT):
+        """Id объявлений, наиболее похожих на listing, лучшие первыми.
+
+        Сходство — минус квадрат расстояния между векторами признаков:
+        ||x - q||² = ||x||² - 2·x·q + ||q||², последнее слагаемое одинаково
+        для всех кандидатов и отбрасывается.
+        """
+        size = self._size
+        compatible = [SEARCH_TYPE_CODES[search_type]
+                      for search_type in COMPATIBLE_SEARCH_TYPES.get(listing.search_type, ())]
+        mask = (
+            self.alive[:size]
+            & (self.servers[:size] == SERVER_CODES.get(listing.server, UNKNOWN_CODE))
+            & (self.platforms[:size] == PLATFORM_CODES.get(listing.platform, UNKNOWN_CODE))
+            & np.isin(self.search_types[:size], compatible)
+            & (self.user_ids[:size] != listing.user_id)
+        )
+        rows = np.flatnonzero(mask)
+        if not len(rows):
+            return []
+
+        # Умножение по всей матрице дешевле, чем копирование выбранных строк
+        query = encode_listing(listing)
+        scores = (2 * (self.features[:size] @ query) - self.norms[:size])[rows]
+        if len(rows) > limit:
+            top = np.argpartition(scores, -limit)[-limit:]
+        else:
+            top = np.arange(len(rows))
+        top = top[np.argsort(scores[top])[::-1]]
+        return self.listing_ids[rows[top]].tolist()
+
+_recommender = ListingRecommender()
+
+def get_recommender() -> ListingRecommender:
+    return _recommender
+
+async def load_recommender(application=None):
+    """post_init: заполняет матрицу активными одобренными объявлениями."""
+    started = time.monotonic()
+    async with async_session_scope() as session:
+        result = await session.execute(
+            select(Listing).where(
+                Listing.is_active == True,  # noqa: E712
+                Listing.status == 'approved'
+            ).order_by(Listing.id)
+        )
+        _recommender.clear()
+        for listing in result.scalars():
+            _recommender.add(listing)
+
+    logger.info(f"Recommender loaded: {len(_recommender)} listings in {time.monotonic() - started:.2f}s")
+
+@on_listings_published
+def _add_listings(listings):
+    for listing in listings:
+        _recommender.add(listing)
+
+@on_listings_removed
+def _remove_listings(listing_ids):
+    if listing_ids is None:
+        _recommender.clear()
+        return
+    for listing_id in listing_ids:
+        _recommender.remove(listing_id)
@@ -0,0 +1,198 @@
+"""Подписки на объявления: обратный индекс сохраненных фильтров и рассылка.
+
+Каждая подписка кладется в одну корзину — по своему самому избирательному
+полю (значению, которое встречается в наименьшей доле объявлений).
+Новое объявление собирает кандидатов из корзин своих значений, после чего
+остальные поля проверяются пересечениями множеств, а диапазон опыта —
+напрямую. Проверять все подписки на каждое объявление не нужно.
+
+Сообщения подписчикам ставятся в outbox в транзакции одобрения объявления
+и доставляются обработчиком outbox с ограничением частоты.
+"""
+import logging
+import time
+
+from sqlalchemy import select
+
+from models.database import async_session_scope
+from models.outbox import enqueue_many, listing_key
+from models.saved_search import SavedSearch
+from utils.constants import SEARCH_TYPES, SERVERS, PLATFORMS, ROLES, SEARCH_GOALS
+from utils.formatters import escape_markdown, format_listing_message
+from utils.search_index import get_search_index
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTION_FIELDS = ('search_type', 'server', 'platform', 'role', 'search_goal')
+MAX_SAVED_SEARCHES = 5
+
+FIELD_CHOICES_COUNT = {
+    'search_type': len(SEARCH_TYPES),
+    'server': len(SERVERS),
+    'platform': len(PLATFORMS),
+    'role': len(ROLES),
+    'search_goal': len(SEARCH_GOALS),
+}
+
+_EMPTY = frozenset()
+
+def estimate_share(field, value) -> float:
+    """Доля опубликованных объявлений с этим значением поля.
+
+    Берется из поискового индекса; пока объявлений мало, считается, что
+    значения распределены равномерно.
+    """
+    counts = get_search_index().values(field)
+    total = sum(counts.values())
+    if total < 100:
+        return 1 / FIELD_CHOICES_COUNT[field]
+    return counts.get(value, 0) / total
+
+class SavedSearchIndex:
+    """Обратный индекс подписок по значениям полей."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._searches = {}  # id подписки -> (user_id, experience_min, experience_max)
+        self._constraints = {}  # id подписки -> {поле: значение}
+        self._bucket_keys = {}  # id подписки -> (поле, значение) или None
+        self._buckets = {}  # (поле, значение) -> id подписок
+        self._wildcard = set()  # подписки без категориальных полей
+        self._by_value = {field: {} for field in SUBSCRIPTION_FIELDS}
+        self._constrained = {field: set() for field in SUBSCRIPTION_FIELDS}
+
+    def __len__(self):
+        return len(self._searches)
+
+    def add(self, saved_search):
+        search_id = saved_search.id
+        if search_id in self._searches:
+            self.remove(search_id)
+
+        self._searches[search_id] = (
+            saved_search.user_id, saved_search.experience_min, saved_search.experience_max
+        )
+        constraints = {
+            field: getattr(saved_search, field) for field in SUBSCRIPTION_FIELDS
+            if getattr(saved_search, field)
+        }
+        self._constraints[search_id] = constraints
+        for field, value in constraints.items():
+            self._by_value[field].setdefault(value, set()).add(search_id)
+            self._constrained[field].add(search_id)
+
+        if constraints:
+            key = min(constraints.items(), key=lambda item: estimate_share(*item))
+            self._buckets.setdefault(key, set()).add(search_id)
+        else:
+            key = None
+            self._wildcard.add(search_id)
+        self._bucket_keys[search_id] = key
+
+    def remove(self, search_id) -> bool:
+        if self._searches.pop(search_id, None) is None:
+            return False
+
+        key = self._bucket_keys.pop(search_id)
+        if key is None:
+            self._wildcard.discard(search_id)
+        else:
+            self._discard(self._buckets, key, search_id)
+        for field, value in self._constraints.pop(search_id).items():
+            self._constrained[field].discard(search_id)
+            self._discard(self._by_value[field], value, search_id)
+        return True
+
+    @staticmethod
+    def _discard(sets, key, search_id):
+        members = sets.get(key)
+        if members is not None:
+            members.discard(search_id)
+            if not members:
+                del sets[key]
+
+    def match(self, listing) -> dict:
+        """Подписки, подходящие под объявление: {user_id: id первой подписки}."""
+        candidates = set(self._wildcard)
+        for field in SUBSCRIPTION_FIELDS:
+            bucket = self._buckets.get((field, getattr(listing, field)))
+            if bucket:
+                candidates |= bucket
+
+        for field in SUBSCRIPTION_FIELDS:
+            if not candidates:
+                return {}
+            # Остаются подписки без условия на поле и с совпадающим значением
+            accepted = self._by_value[field].get(getattr(listing, field), _EMPTY)
+            candidates = (candidates - self._constrained[field]) | (candidates & accepted)
+
+        matches = {}
+        for search_id in sorted(candidates):
+            user_id, experience_min, experience_max = self._searches[search_id]
+            if experience_min is not None and listing.experience < experience_min:
+                continue
+            if experience_max is not None and listing.experience > experience_max:
+                continue
+            if user_id != listing.user_id:
+                matches.setdefault(user_id, search_id)
+        return matches
+
+    def bucket_sizes(self) -> dict:
+        sizes = {f"{field}={value}": len(members) for (field, value), members in self._buckets.items()}
+        sizes['*'] = len(self._wildcard)
+        return sizes
+
+_index = SavedSearchIndex()
+
+def get_saved_search_index() -> SavedSearchIndex:
+    return _index
+
+async def load_saved_searches(application=None):
+    """post_init: загружает подписки в обратный индекс.
+
+    Вызывается после построения поискового индекса, чтобы оценки
+    избирательности учитывали текущие объявления.
+    """
+    started = time.monotonic()
+    async with async_session_scope() as session:
+        result = await session.execute(select(SavedSearch))
+        _index.clear()
+        for saved_search in result.scalars():
+            _index.add(saved_search)
+    logger.info(f"Loaded {len(_index)} saved searches in {time.monotonic() - started:.2f}s")
+
+def register_saved_search(saved_search):
+    """Добавляет зафиксированную в базе подписку в индекс."""
+    _index.add(saved_search)
+
+def unregister_saved_searches(search_ids):
+    for search_id in search_ids:
+        _index.remove(search_id)
+
+async def enqueue_saved_search_matches(session, listing) -> int:
+    """Ставит в outbox сообщения подписчикам в транзакции одобрения объявления.
+
+    Ключ match:<объявление>:<создано>:<пользователь> гарантирует не больше одного
+    сообщения пользователю на объявление, сколько бы подписок ни совпало.
+    """
+    matches = _index.match(listing)
+    if not matches:
+        return 0
+
+    listing_text = format_listing_message(listing)
+    items = []
+    for user_id, search_id in matches.items():
+        header = escape_markdown(
+            f"🔔 Новое объявление по вашей подписке #{search_id}\n"
+            f"Отключить: /unsubscribe {search_id}"
+        )
+        items.append((
+            listing_key('match', listing, user_id), user_id,
+            {'text': f"{header}\n{listing_text}", 'parse_mode': 'MarkdownV2'},
+        ))
+
+    added = await enqueue_many(session, 'send_message', items, listing_id=listing.id)
+    logger.info(f"Listing {listing.id} matched {len(matches)} subscribers, {added} messages queued")
+    return added
@@ -0,0 +1,299 @@
+"""In-memory индекс опубликованных объявлений для /search.
+
+Каждое объявление занимает слот — номер бита. Для каждого значения
+категориального поля хранится битовая маска (int Python) слотов с этим
+значением, для возраста и опыта — отсортированный массив (значение, слот)
+и маски «значение меньше границы» для нескольких границ-квантилей.
+Фильтр сводится к побитовому И масок вместо прохода по таблице.
+
+Индекс строится при старте из активных одобренных объявлений и
+обновляется через utils.listing_events после каждого коммита.
+"""
+import logging
+import time
+from bisect import bisect_left, bisect_right
+from math import inf
+
+from sqlalchemy import select
+
+from models.database import async_session_scope
+from models.listing import Listing
+from utils.listing_events import on_listings_published, on_listings_removed
+
+logger = logging.getLogger(__name__)
+
+CATEGORICAL_FIELDS = (
+    'search_type', 'search_goal', 'gender', 'role',
+    'faction', 'server', 'ship_type', 'platform',
+)
+RANGE_FIELDS = ('age', 'experience')
+INDEXED_FIELDS = CATEGORICAL_FIELDS + RANGE_FIELDS
+
+# Освободившиеся слоты не переиспользуются, чтобы более новые объявления
+# занимали старшие биты; индекс уплотняется, когда мертвых слотов больше живых
+COMPACT_MIN_SLOTS = 1024
+# До стольких кандидатов фильтр по диапазону проверяет значения напрямую
+DIRECT_CHECK_LIMIT = 256
+# Число границ с масками для полей диапазонов: между соседними границами
+# остается не больше 1/RANGE_MARKS массива, который приходится обходить
+RANGE_MARKS = 64
+
+class ListingSearchIndex:
+    """Битовые маски по значениям полей и отсортированные массивы диапазонов."""
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._bitmaps = {field: {} for field in CATEGORICAL_FIELDS}
+        self._ranges = {field: [] for field in RANGE_FIELDS}
+        # Поле -> отсортированные границы и маски слотов со значением меньше границы
+        self._mark_values = {field: [] for field in RANGE_FIELDS}
+        self._mark_bitmaps = {field: [] for field in RANGE_FIELDS}
+        self._marked = 0  # объявлений в индексе при последней сборке границ
+        self._slots = {}  # listing_id -> слот
+        self._docs = []  # слот -> (listing_id, значения полей) или None
+        self._alive = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def __contains__(self, listing_id):
+        return listing_id in self._slots
+
+    def build(self, rows):
+        """Строит индекс заново из (listing_id, {поле: значение}).
+
+        Маски собираются из списков слотов за один проход, без побитовых
+        операций над растущими числами.
+        """
+        self.clear()
+        slots = {field: {} for field in CATEGORICAL_FIELDS}
+        for listing_id, values in rows:
+            slot = len(self._docs)
+            self._docs.append((listing_id, values))
+            self._slots[listing_id] = slot
+            for field in CATEGORICAL_FIELDS:
+                slots[field].setdefault(values[field], []).append(slot)
+            for field in RANGE_FIELDS:
+                self._ranges[field].append((values[field], slot))
+
+        for field in CATEGORICAL_FIELDS:
+            self._bitmaps[field] = {
+                value: self._bitmap(value_slots) for value, value_slots in slots[field].items()
+            }
+        for field in RANGE_FIELDS:
+            self._ranges[field].sort()
+        self._alive = self._bitmap(range(len(self._docs)))
+        self._build_marks()
+
+    def _build_marks(self):
+        for field in RANGE_FIELDS:
+            self._build_field_marks(field)
+        self._marked = len(self._slots)
+
+    def _build_field_marks(self, field):
+        ranges = self._ranges[field]
+        step = max(len(ranges) // RANGE_MARKS, 1)
+        boundaries = sorted({ranges[position][0] for position in range(step, len(ranges), step)})
+        marks = []
+        bitmap = previous = 0
+        for boundary in boundaries:
+            position = bisect_left(ranges, (boundary,))
+            bitmap |= self._bitmap(slot for _, slot in ranges[previous:position])
+            marks.append(bitmap)
+            previous = position
+        self._mark_values[field] = boundaries
+        self._mark_bitmaps[field] = marks
+
+    def add(self, listing):
+        """Добавляет или обновляет объявление."""
+        if listing.id in self._slots:
+            self.remove(listing.id)
+
+        values = {field: getattr(listing, field) for field in INDEXED_FIELDS}
+        slot = len(self._docs)
+        bit = 1 << slot
+        self._docs.append((listing.id, values))
+        self._slots[listing.id] = slot
+        self._alive |= bit
+        for field in CATEGORICAL_FIELDS:
+            bitmaps = self._bitmaps[field]
+            bitmaps[values[field]] = bitmaps.get(values[field], 0) | bit
+        for field in RANGE_FIELDS:
+            # Новый слот старше всех, поэтому вставка почти всегда в конец группы
+            ranges = self._ranges[field]
+            ranges.insert(bisect_right(ranges, (values[field], slot)), (values[field], slot))
+            marks = self._mark_bitmaps[field]
+            for position in range(bisect_right(self._mark_values[field], values[field]), len(marks)):
+                marks[position] |= bit
+
+        # Границы, собранные для меньшего индекса (например, пустого при запуске),
+        # пересобираются, когда объявлений стало вдвое больше: иначе промежутки
+        # между границами растут и фильтр по диапазону обходит почти весь массив
+        if len(self._slots) >= max(2 * self._marked, RANGE_MARKS):
+            self._build_marks()
+
+    def remove(self, listing_id) -> bool:
+        slot = self._slots.pop(listing_id, None)
+        if slot is None:
+            return False
+
+        _, values = self._docs[slot]
+        self._docs[slot] = None
+        mask = ~(1 << slot)
+        self._alive &= mask
+        for field in CATEGORICAL_FIELDS:
+            bitmaps = self._bitmaps[field]
+            remaining = bitmaps[values[field]] & mask
+            if remaining:
+                bitmaps[values[field]] = remaining
+            else:
+                del bitmaps[values[field]]
+        for field in RANGE_FIELDS:
+            ranges = self._ranges[field]
+            del ranges[bisect_left(ranges, (values[field], slot))]
+            marks = self._mark_bitmaps[field]
+            for position in range(bisect_right(self._mark_values[field], values[field]), len(marks)):
+                marks[position] &= mask
+
+        if len(self._docs) >= COMPACT_MIN_SLOTS and len(self._docs) > 2 * len(self._slots):
+            self.build([doc for doc in self._docs if doc is not None])
+        return True
+
+    def values(self, field):
+        """Значения категориального поля с числом объявлений."""
+        return {value: bitmap.bit_count() for value, bitmap in self._bitmaps[field].items()}
+
+    def search(self, filters=None, ranges=None, limit=10):
+        """Ищет объявления.
+
+        filters — {поле: значение или набор значений}, значения одного поля
+        объединяются через ИЛИ; ranges — {поле: (от, до)}, границы включаются,
+        None означает открытую границу. Возвращает (число совпадений,
+        id не более limit самых новых объявлений).
+        """
+        result = self._match(filters, ranges)
+        count = result.bit_count()
+        listing_ids = []
+        while result and len(listing_ids) < limit:
+            slot = result.bit_length() - 1
+            listing_ids.append(self._docs[slot][0])
+            result ^= 1 << slot
+        return count, listing_ids
+
+    def filter_ids(self, listing_ids, filters=None, ranges=None):
+        """Оставляет из listing_ids (с сохранением порядка) подходящие под фильтры."""
+        result = self._match(filters, ranges)
+        slots = self._slots
+        return [
+            listing_id for listing_id in listing_ids
+            if listing_id in slots and result >> slots[listing_id] & 1
+        ]
+
+    def _match(self, filters, ranges):
+        result = self._alive
+        for field, values in (filters or {}).items():
+            if isinstance(values, str):
+                values = (values,)
+            bitmaps = self._bitmaps[field]
+            mask = 0
+            for value in values:
+                mask |= bitmaps.get(value, 0)
+            result &= mask
+            if not result:
+                return 0
+
+        for field, (low, high) in (ranges or {}).items():
+            result = self._filter_range(result, field, low, high)
+            if not result:
+                return 0
+        return result
+
+    def _filter_range(self, candidates, field, low, high):
+        if candidates.bit_count() <= DIRECT_CHECK_LIMIT:
+            low = -inf if low is None else low
+            high = inf if high is None else high
+            return self._bitmap(
+                slot for slot in self._iter_slots(candidates)
+                if low <= self._docs[slot][1][field] <= high
+            )
+
+        # Значения целые: value <= high равносильно value < high + 1
+        matched = self._alive if high is None else self._below(field, high + 1)
+        if low is not None:
+            matched &= ~self._below(field, low)
+        return candidates & matched
+
+    def _below(self, field, value):
+        """Маска слотов, у которых значение поля меньше value.
+
+        Берется маска ближайшей границы, и к ней добавляются или из нее
+        исключаются слоты между границей и value из отсортированного массива.
+        """
+        ranges = self._ranges[field]
+        boundaries = self._mark_values[field]
+        position = bisect_left(ranges, (value,))
+        upper = bisect_left(boundaries, value)
+
+        if upper > 0:
+            lower_position = bisect_left(ranges, (boundaries[upper - 1],))
+            lower_bitmap = self._mark_bitmaps[field][upper - 1]
+        else:
+            lower_position, lower_bitmap = 0, 0
+        if upper < len(boundaries):
+            upper_position = bisect_left(ranges, (boundaries[upper],))
+            upper_bitmap = self._mark_bitmaps[field][upper]
+        else:
+            upper_position, upper_bitmap = len(ranges), self._alive
+
+        if position - lower_position <= upper_position - position:
+            return lower_bitmap | self._bitmap(slot for _, slot in ranges[lower_position:position])
+        return upper_bitmap & ~self._bitmap(slot for _, slot in ranges[position:upper_position])
+
+    def _bitmap(self, slots) -> int:
+        buffer = bytearray((len(self._docs) + 7) // 8)
+        for slot in slots:
+            buffer[slot >> 3] |= 1 << (slot & 7)
+        return int.from_bytes(buffer, 'little')
+
+    @staticmethod
+    def _iter_slots(bitmap):
+        while bitmap:
+            lowest = bitmap & -bitmap
+            yield lowest.bit_length() - 1
+            bitmap ^= lowest
+
+_index = ListingSearchIndex()
+
+def get_search_index() -> ListingSearchIndex:
+    return _index
+
+async def load_search_index(application=None):
+    """post_init: строит индекс из активных одобренных объявлений."""
+    started = time.monotonic()
+    columns = [getattr(Listing, field) for field in INDEXED_FIELDS]
+    async with async_session_scope() as session:
+        result = await session.execute(
+            select(Listing.id, *columns).where(
+                Listing.is_active == True,  # noqa: E712
+                Listing.status == 'approved'
+            ).order_by(Listing.id)
+        )
+        rows = [(row[0], dict(zip(INDEXED_FIELDS, row[1:]))) for row in result]
+
+    _index.build(rows)
+    logger.info(f"Search index built: {len(_index)} listings in {time.monotonic() - started:.2f}s")
+
+@on_listings_published
+def _index_listings(listings):
+    for listing in listings:
+        _index.add(listing)
+
+@on_listings_removed
+def _unindex_listings(listing_ids):
+    if listing_ids is None:
+        _index.clear()
+        return
+    for listing_id in listing_ids:
+        _index.remove(listing_id)
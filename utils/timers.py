@@ -0,0 +1,196 @@
+"""Персистентные таймеры объявлений поверх колеса таймеров.
+
+Таймеры хранятся в таблице timers и при старте загружаются в колесо за
+O(активных таймеров). Тик JobQueue продвигает колесо и обрабатывает
+сработавшие таймеры пачками; строка таймера удаляется в той же транзакции,
+что и действие, поэтому после перезапуска ничего не теряется и не
+выполняется дважды.
+"""
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select, delete
+
+from models.database import async_session_scope
+from models.listing import Listing
+from models.timer import ListingTimer
+from models.outbox import listing_key
+from utils.constants import SEARCH_TYPES
+from utils.expiry import retire_listings
+from utils.listing_events import listings_removed
+from utils.outbox import enqueue_notification, kick_outbox
+from utils.timing_wheel import HierarchicalTimingWheel
+
+logger = logging.getLogger(__name__)
+
+TIMER_TICK_SECONDS = 60
+TIMER_BATCH_SIZE = 200
+REFRESH_COOLDOWN = timedelta(hours=1)
+
+TIMER_EXPIRE = 'expire'
+TIMER_REMIND = 'remind'
+TIMER_REFRESH_COOLDOWN = 'refresh_cooldown'
+
+_wheel = None
+_fired_total = 0
+_last_tick = None
+
+def _timestamp(value: datetime) -> float:
+    # В базе хранится наивное UTC-время
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+def _from_timestamp(value: float) -> datetime:
+    return datetime.fromtimestamp(value, tz=timezone.utc).replace(tzinfo=None)
+
+async def schedule_listing_timers(session, listing):
+    """Создает таймеры истечения срока и напоминания в текущей транзакции.
+
+    Возвращает созданные строки; после коммита их нужно передать в
+    register_timers.
+    """
+    if not listing.expires_at:
+        return []
+
+    timers = [ListingTimer(listing_id=listing.id, kind=TIMER_EXPIRE, due_at=listing.expires_at)]
+    remind_hours = SEARCH_TYPES.get(listing.search_type, {}).get('remind_before_hours')
+    if remind_hours:
+        remind_at = listing.expires_at - timedelta(hours=remind_hours)
+        if remind_at > (listing.created_at or datetime.utcnow()):
+            timers.append(ListingTimer(listing_id=listing.id, kind=TIMER_REMIND, due_at=remind_at))
+
+    session.add_all(timers)
+    await session.flush()
+    return timers
+
+async def start_refresh_cooldown(session, listing_id):
+    """Запрещает обновлять объявление до окончания перерыва.
+
+    Возвращает созданный таймер или None, если перерыв еще идет.
+    """
+    result = await session.execute(
+        select(ListingTimer).where(
+            ListingTimer.listing_id == listing_id,
+            ListingTimer.kind == TIMER_REFRESH_COOLDOWN
+        )
+    )
+    if result.scalars().first():
+        return None
+
+    timer = ListingTimer(
+        listing_id=listing_id,
+        kind=TIMER_REFRESH_COOLDOWN,
+        due_at=datetime.utcnow() + REFRESH_COOLDOWN
+    )
+    session.add(timer)
+    await session.flush()
+    return timer
+
+def register_timers(timers):
+    """Добавляет зафиксированные в базе таймеры в колесо."""
+    if _wheel is None:
+        # Колесо еще не загружено: таймеры подхватит load_timers
+        return
+    for timer in timers:
+        _wheel.add(timer.id, _timestamp(timer.due_at))
+
+async def load_timers(application):
+    """post_init: загружает все таймеры из базы в колесо."""
+    global _wheel
+    _wheel = HierarchicalTimingWheel(time.time(), tick_seconds=TIMER_TICK_SECONDS)
+
+    async with async_session_scope() as session:
+        result = await session.execute(select(ListingTimer.id, ListingTimer.due_at))
+        overdue = 0
+        for timer_id, due_at in result:
+            if not _wheel.add(timer_id, _timestamp(due_at)):
+                overdue += 1
+
+    logger.info(f"Loaded {len(_wheel)} timers ({overdue} overdue)")
+
+async def process_due_timers(context):
+    """JobQueue callback: продвигает колесо и выполняет сработавшие таймеры."""
+    global _fired_total, _last_tick
+    if _wheel is None:
+        return
+
+    due = _wheel.advance(time.time())
+    _last_tick = datetime.utcnow()
+    if not due:
+        return
+
+    counts = {}
+    fired = 0
+    try:
+        for start in range(0, len(due), TIMER_BATCH_SIZE):
+            batch = due[start:start + TIMER_BATCH_SIZE]
+            batch_counts = await _fire_batch(batch)
+            fired += len(batch)
+            for kind, count in batch_counts.items():
+                counts[kind] = counts.get(kind, 0) + count
+    except Exception as e:
+        # Транзакция пачки откатилась: ее таймеры и все следующие возвращаются
+        # в колесо и сработают на ближайшем тике
+        retry_at = time.time()
+        for timer_id in due[fired:]:
+            _wheel.add(timer_id, retry_at)
+        logger.error(f"Failed to fire timers, {len(due) - fired} rescheduled: {e}", exc_info=True)
+
+    _fired_total += fired
+    if fired:
+        kick_outbox(context)
+        logger.info(f"Fired {fired} timers: {counts}")
+
+async def _fire_batch(timer_ids):
+    """Выполняет пачку таймеров одной транзакцией."""
+    counts = {}
+    now = datetime.utcnow()
+    async with async_session_scope() as session:
+        result = await session.execute(select(ListingTimer).where(ListingTimer.id.in_(timer_ids)))
+        # Строки отмененных таймеров уже удалены — такие таймеры пропускаются
+        timers = result.scalars().all()
+        if not timers:
+            return counts
+
+        listing_ids = {timer.listing_id for timer in timers}
+        result = await session.execute(select(Listing).where(Listing.id.in_(listing_ids)))
+        listings = {listing.id: listing for listing in result.scalars().all()}
+
+        expired = []
+        for timer in timers:
+            counts[timer.kind] = counts.get(timer.kind, 0) + 1
+            listing = listings.get(timer.listing_id)
+            if not listing or not listing.is_active:
+                continue
+
+            if timer.kind == TIMER_EXPIRE:
+                expired.append(listing)
+            elif (timer.kind == TIMER_REMIND and listing.status == 'approved'
+                  and listing.expires_at > now):
+                await enqueue_notification(
+                    session, listing_key('remind', listing), listing.user_id,
+                    "⏳ Срок вашего объявления скоро истечет.\n"
+                    "После этого оно будет снято с публикации, и вы сможете создать новое с помощью команды /create",
+                    listing_id=listing.id
+                )
+
+        await session.execute(delete(ListingTimer).where(ListingTimer.id.in_([t.id for t in timers])))
+        # Снимает объявления с публикации и удаляет их оставшиеся таймеры
+        await retire_listings(session, expired)
+
+    listings_removed(listing.id for listing in expired)
+    return counts
+
+def timer_stats() -> dict:
+    """Метрики планировщика: размер, ближайший срок, отставание."""
+    if _wheel is None:
+        return {'loaded': False}
+    next_due = _wheel.next_due()
+    return {
+        'loaded': True,
+        'pending': len(_wheel),
+        'next_due': _from_timestamp(next_due) if next_due is not None else None,
+        'backlog': _wheel.overdue(time.time()),
+        'fired_total': _fired_total,
+        'last_tick': _last_tick,
+    }
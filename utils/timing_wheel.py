@@ -0,0 +1,131 @@
+"""Иерархическое колесо таймеров (hierarchical timing wheel).
+
+Таймеры раскладываются по слотам нескольких уровней: нижний уровень
+отсчитывает тики, каждый следующий — полные обороты предыдущего. Добавление
+и отмена таймера — O(1), продвижение на тик — O(таймеров в слоте). Таймеры,
+которые дальше последнего уровня, ждут в отдельном списке переполнения.
+"""
+import math
+
+class HierarchicalTimingWheel:
+    """Колесо таймеров с шагом tick_seconds и уровнями wheel_sizes.
+
+    По умолчанию: 60 тиков по минуте (час), 24 часа (сутки) и 64 дня —
+    этого хватает для объявлений со сроком жизни до недели.
+    """
+
+    def __init__(self, now: float, tick_seconds: int = 60, wheel_sizes=(60, 24, 64)):
+        self.tick_seconds = tick_seconds
+        self.wheel_sizes = tuple(wheel_sizes)
+        # Сколько тиков покрывает один слот каждого уровня
+        self._spans = []
+        span = 1
+        for size in self.wheel_sizes:
+            self._spans.append(span)
+            span *= size
+        self._horizon = span  # дальше — переполнение
+
+        self.current_tick = self._to_tick(now)
+        self._levels = [[{} for _ in range(size)] for size in self.wheel_sizes]
+        self._overflow = {}
+        self._location = {}  # timer_id -> словарь слота, где лежит таймер
+        self._due = {}  # timer_id -> тик срабатывания
+
+    def _to_tick(self, timestamp: float) -> int:
+        return math.floor(timestamp / self.tick_seconds)
+
+    def __len__(self):
+        return len(self._due)
+
+    def __contains__(self, timer_id):
+        return timer_id in self._due
+
+    def add(self, timer_id, due: float) -> bool:
+        """Добавляет таймер; возвращает False, если срок уже наступил."""
+        self.cancel(timer_id)
+        due_tick = self._to_tick(due)
+        on_time = due_tick > self.current_tick
+        # Просроченный таймер срабатывает на ближайшем тике
+        due_tick = max(due_tick, self.current_tick + 1)
+        self._due[timer_id] = due_tick
+        self._place(timer_id, due_tick)
+        return on_time
+
+    def _place(self, timer_id, due_tick):
+        delta = due_tick - self.current_tick
+        for level, (size, span) in enumerate(zip(self.wheel_sizes, self._spans)):
+            if delta < size * span:
+                slot = self._levels[level][(due_tick // span) % size]
+                break
+        else:
+            slot = self._overflow
+
+        slot[timer_id] = due_tick
+        self._location[timer_id] = slot
+
+    def cancel(self, timer_id) -> bool:
+        """Отменяет таймер за O(1)."""
+        slot = self._location.pop(timer_id, None)
+        if slot is None:
+            return False
+        slot.pop(timer_id, None)
+        self._due.pop(timer_id, None)
+        return True
+
+    def advance(self, now: float) -> list:
+        """Продвигает колесо до момента now и возвращает сработавшие таймеры."""
+        target_tick = self._to_tick(now)
+        fired = []
+        while self.current_tick < target_tick:
+            self.current_tick += 1
+            self._cascade()
+            slot = self._levels[0][self.current_tick % self.wheel_sizes[0]]
+            if slot:
+                for timer_id, due_tick in list(slot.items()):
+                    if due_tick <= self.current_tick:
+                        del slot[timer_id]
+                        del self._location[timer_id]
+                        del self._due[timer_id]
+                        fired.append(timer_id)
+        return fired
+
+    def _cascade(self):
+        """На границе оборота переносит таймеры верхних уровней вниз."""
+        for level in range(1, len(self.wheel_sizes)):
+            span = self._spans[level]
+            if self.current_tick % span:
+                break
+            slot = self._levels[level][(self.current_tick // span) % self.wheel_sizes[level]]
+            self._reinsert(slot)
+        if self.current_tick % self._horizon == 0 and self._overflow:
+            self._reinsert(self._overflow)
+
+    def _reinsert(self, slot):
+        entries = list(slot.items())
+        slot.clear()
+        for timer_id, due_tick in entries:
+            self._place(timer_id, due_tick)
+
+    def next_due(self):
+        """Время ближайшего таймера (unix timestamp) или None."""
+        candidates = []
+        for level, (size, span) in enumerate(zip(self.wheel_sizes, self._spans)):
+            slots = self._levels[level]
+            # Текущий слот уже разобран: в нем могут быть только таймеры
+            # следующего оборота, поэтому он просматривается последним
+            start = (self.current_tick // span) % size
+            for offset in range(1, size + 1):
+                slot = slots[(start + offset) % size]
+                if slot:
+                    candidates.append(min(slot.values()))
+                    break
+        if self._overflow:
+            candidates.append(min(self._overflow.values()))
+        if not candidates:
+            return None
+        return min(candidates) * self.tick_seconds
+
+    def overdue(self, now: float) -> int:
+        """Сколько таймеров уже должны были сработать к моменту now."""
+        now_tick = self._to_tick(now)
+        return sum(1 for due_tick in self._due.values() if due_tick <= now_tick)
@@ -0,0 +1,120 @@
+"""Параллельная обработка обновлений с сохранением порядка для каждого пользователя.
+
+Обновления разных пользователей обрабатываются параллельно, обновления
+одного пользователя — строго по очереди, поэтому ConversationHandler
+видит шаги диалога в том порядке, в котором они пришли.
+
+- Семафор базового класса ограничивает число обновлений в обработке
+  (выполняемых и ожидающих): когда он исчерпан, новые обновления ждут —
+  это и есть противодавление.
+- Отдельный семафор ограничивает число одновременно работающих
+  обработчиков; слот занимается только когда подошла очередь пользователя,
+  так что очередь одного пользователя не занимает слоты других.
+- Очередь пользователя ограничена: лишние обновления от флуда
+  отбрасываются.
+"""
+import asyncio
+import logging
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+UPDATE_STATS_INTERVAL = 300  # секунд между записями метрик в лог
+
+class _KeyQueue:
+    __slots__ = ('lock', 'pending')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()  # asyncio.Lock пропускает ожидающих по порядку
+        self.pending = 0
+
+def update_key(update):
+    """Ключ порядка: пользователь, иначе чат; None — без упорядочивания."""
+    if isinstance(update, Update):
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return update.effective_chat.id
+    return None
+
+class KeyedUpdateProcessor(BaseUpdateProcessor):
+    """Обработчик обновлений: параллельно по пользователям, по порядку внутри пользователя."""
+
+    def __init__(self, max_workers, max_pending, max_pending_per_key):
+        super().__init__(max_pending)
+        self.max_workers = max_workers
+        self.max_pending_per_key = max_pending_per_key
+        self._workers = asyncio.Semaphore(max_workers)
+        self._keys = {}  # ключ -> _KeyQueue
+        self._running = 0
+        self.stats = {'processed': 0, 'dropped': 0, 'max_key_depth': 0, 'max_running': 0}
+
+    async def do_process_update(self, update, coroutine):
+        key = update_key(update)
+        if key is None:
+            async with self._workers:
+                await self._run(coroutine)
+            return
+
+        # Место в очереди ключа занимается до первого await, то есть в порядке поступления
+        queue = self._keys.get(key)
+        if queue is None:
+            queue = self._keys[key] = _KeyQueue()
+        if queue.pending >= self.max_pending_per_key:
+            coroutine.close()
+            self.stats['dropped'] += 1
+            logger.warning(f"Dropped update {getattr(update, 'update_id', None)}: "
+                           f"{queue.pending} updates already queued for {key}")
+            return
+
+        queue.pending += 1
+        self.stats['max_key_depth'] = max(self.stats['max_key_depth'], queue.pending)
+        try:
+            async with queue.lock:
+                async with self._workers:
+                    await self._run(coroutine)
+        finally:
+            queue.pending -= 1
+            if not queue.pending:
+                del self._keys[key]
+
+    async def _run(self, coroutine):
+        self._running += 1
+        self.stats['max_running'] = max(self.stats['max_running'], self._running)
+        try:
+            await coroutine
+        finally:
+            self._running -= 1
+            self.stats['processed'] += 1
+
+    def snapshot(self) -> dict:
+        """Метрики: очереди по ключам и загрузка обработчиков."""
+        depths = sorted((queue.pending for queue in self._keys.values()), reverse=True)
+        return {
+            **self.stats,
+            'running': self._running,
+            'in_flight': self.current_concurrent_updates,
+            'queued_keys': len(depths),
+            'deepest_keys': depths[:5],
+        }
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        logger.info(f"Update processor stats: {self.snapshot()}")
+
+async def log_update_processor_stats(context):
+    """JobQueue callback: пишет метрики обработчика обновлений в лог."""
+    processor = context.application.update_processor
+    if not isinstance(processor, KeyedUpdateProcessor):
+        return
+    stats = processor.snapshot()
+    saturated = (
+        stats['in_flight'] >= processor.max_concurrent_updates
+        or stats['deepest_keys'][:1] == [processor.max_pending_per_key]
+    )
+    level = logging.WARNING if saturated else logging.DEBUG
+    logger.log(level, f"Update processor stats: {stats}")
@@ -0,0 +1,450 @@
+import os
+import gzip
+import json
+import shutil
+import sqlite3
+import struct
+import tempfile
+import threading
+import asyncio
+import argparse
+from datetime import datetime, timedelta
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import logging
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATABASE_PATH = os.path.join(PROJECT_ROOT, 'bot.db')
+WAL_BACKUP_DIR = os.path.join(PROJECT_ROOT, 'backups', 'wal')
+
+WAL_SHIP_INTERVAL = 10  # seconds between shipping steps
+# The shipper checkpoints; app connections autocheckpoint only as a fallback
+# at models.database.WAL_SHIPPING_AUTOCHECKPOINT pages
+WAL_CHECKPOINT_FRAMES = 1000
+# A new generation (fresh base snapshot) keeps restore chains short
+WAL_GENERATION_MAX_AGE = timedelta(days=1)
+WAL_RETENTION = timedelta(days=7)
+
+WAL_HEADER_SIZE = 32
+WAL_FRAME_HEADER_SIZE = 24
+TIMESTAMP_FORMAT = '%Y%m%dT%H%M%S%f'
+
+class WalShipper:
+    """Ships committed WAL frames of a SQLite database into a backup directory.
+
+    Layout of the backup directory::
+
+        <generation>/base.db.gz                   snapshot the generation starts from
+        <generation>/<seq>_<epoch>_<time>.wal.gz  WAL bytes shipped at <time>
+        <generation>/state.json                   shipping position
+
+    An epoch is one lifetime of the WAL file between restarts (a restart
+    changes the salt in the WAL header). The first segment of every epoch
+    starts with the WAL header, so concatenating the segments of an epoch
+    gives a valid WAL file. Any frames that could have been lost (the WAL
+    was reset before they were shipped) start a new generation.
+    """
+
+    def __init__(self, database_path=DATABASE_PATH, backup_dir=WAL_BACKUP_DIR):
+        self.database_path = database_path
+        self.wal_path = f'{database_path}-wal'
+        self.backup_dir = backup_dir
+        self.state = None
+        self._connection = None
+        self._base_reader = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(
+                self.database_path, timeout=5, isolation_level=None, check_same_thread=False
+            )
+            self._connection.execute('PRAGMA wal_autocheckpoint=0')
+        return self._connection
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    # --- WAL parsing ---
+
+    def _read_wal(self, offset):
+        """Read the WAL header and committed bytes after offset.
+
+        Must be called while holding the write lock. Returns
+        (salt, page_size, data, end) or None if the WAL is empty.
+        """
+        try:
+            with open(self.wal_path, 'rb') as f:
+                header = f.read(WAL_HEADER_SIZE)
+                if len(header) < WAL_HEADER_SIZE:
+                    return None
+                page_size = struct.unpack('>I', header[8:12])[0]
+                salt = header[16:24].hex()
+                frame_size = WAL_FRAME_HEADER_SIZE + page_size
+
+                start = max(offset, WAL_HEADER_SIZE)
+                f.seek(start)
+                data = f.read()
+        except FileNotFoundError:
+            return None
+
+        # Ship whole transactions only: stop after the last commit frame
+        # and at the first frame left over from a previous epoch
+        committed = 0
+        position = 0
+        while position + frame_size <= len(data):
+            frame_header = data[position:position + WAL_FRAME_HEADER_SIZE]
+            if frame_header[8:16] != header[16:24]:
+                break
+            position += frame_size
+            if struct.unpack('>I', frame_header[4:8])[0]:
+                committed = position
+
+        data = data[:committed]
+        if offset < WAL_HEADER_SIZE:
+            data = header + data
+        return salt, page_size, data, start + committed
+
+    # --- state ---
+
+    def _generation_dir(self, generation=None):
+        return os.path.join(self.backup_dir, generation or self.state['generation'])
+
+    def _save_state(self):
+        path = os.path.join(self._generation_dir(), 'state.json')
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(self.state, f)
+        os.replace(f'{path}.tmp', path)
+
+    def _load_state(self):
+        generations = list_generations(self.backup_dir)
+        if not generations:
+            return None
+        path = os.path.join(self.backup_dir, generations[-1], 'state.json')
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_segment(self, data, epoch_start=False):
+        now = datetime.utcnow()
+        if epoch_start:
+            self.state['epoch'] += 1
+        name = f"{self.state['seq']:08d}_{self.state['epoch']:04d}_{now.strftime(TIMESTAMP_FORMAT)}.wal.gz"
+        path = os.path.join(self._generation_dir(), name)
+        with gzip.open(f'{path}.tmp', 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f'{path}.tmp', path)
+        self.state['seq'] += 1
+        return len(data)
+
+    # --- shipping ---
+
+    def _start_generation(self):
+        """Pin a base snapshot and ship the current epoch from its start.
+
+        Called while holding the write lock: a read transaction opened here
+        sees exactly the frames shipped so far, so nothing can slip in
+        between the snapshot and the shipping position. The snapshot itself
+        is copied by _copy_base after the write lock is released.
+        """
+        generation = datetime.utcnow().strftime(TIMESTAMP_FORMAT)
+        os.makedirs(self._generation_dir(generation), exist_ok=True)
+
+        reader = sqlite3.connect(self.database_path, isolation_level=None, check_same_thread=False)
+        reader.execute('BEGIN')
+        reader.execute('SELECT count(*) FROM sqlite_master').fetchone()
+        self._base_reader = reader
+
+        self.state = {
+            'generation': generation,
+            'started_at': generation,
+            'seq': 0,
+            'epoch': 0,
+            'salt': None,
+            'offset': 0,
+            'checkpointed': False,
+        }
+        # Frames already in the WAL are part of the base; replaying them
+        # again is harmless and keeps the epoch checksum chain intact
+        wal = self._read_wal(0)
+        if wal:
+            salt, _, data, end = wal
+            self._write_segment(data, epoch_start=True)
+            self.state.update(salt=salt, offset=end)
+        self._save_state()
+
+    def _copy_base(self):
+        """Copy the snapshot pinned by _start_generation into base.db.gz."""
+        reader, self._base_reader = self._base_reader, None
+        generation_dir = self._generation_dir()
+        try:
+            with tempfile.TemporaryDirectory(dir=generation_dir) as tmp_dir:
+                snapshot = os.path.join(tmp_dir, 'base.db')
+                target = sqlite3.connect(snapshot)
+                try:
+                    reader.backup(target)
+                finally:
+                    target.close()
+                with open(snapshot, 'rb') as source, gzip.open(os.path.join(tmp_dir, 'base.db.gz'), 'wb') as f:
+                    shutil.copyfileobj(source, f)
+                os.replace(os.path.join(tmp_dir, 'base.db.gz'), os.path.join(generation_dir, 'base.db.gz'))
+        finally:
+            reader.execute('COMMIT')
+            reader.close()
+        logger.info(f"Started WAL shipping generation {self.state['generation']}")
+
+    def ship(self):
+        """Copy newly committed WAL frames; checkpoint when the WAL is large.
+
+        Returns the number of bytes shipped.
+        """
+        with self._lock:
+            connection = self._connect()
+            if self.state is None:
+                self.state = self._load_state()
+
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                shipped = self._ship_locked(connection)
+            finally:
+                connection.execute('COMMIT')
+            if self._base_reader is not None:
+                self._copy_base()
+
+            if self.state['offset'] >= self._checkpoint_threshold():
+                self._checkpoint(connection)
+            return shipped
+
+    def _checkpoint_threshold(self):
+        page_size = self._connect().execute('PRAGMA page_size').fetchone()[0]
+        return WAL_HEADER_SIZE + WAL_CHECKPOINT_FRAMES * (WAL_FRAME_HEADER_SIZE + page_size)
+
+    def _ship_locked(self, connection):
+        state = self.state
+        if state is None or self._generation_expired():
+            self._start_generation()
+            return 0
+
+        wal = self._read_wal(0)
+        if wal is None:
+            return 0
+        salt = wal[0]
+
+        if salt == state['salt']:
+            wal = self._read_wal(state['offset'])
+            _, _, data, end = wal
+            if not data:
+                return 0
+            shipped = self._write_segment(data)
+            state.update(offset=end, checkpointed=False)
+        elif state['checkpointed'] or state['salt'] is None:
+            # The WAL was restarted after a complete checkpoint: nothing was lost
+            _, _, data, end = wal
+            shipped = self._write_segment(data, epoch_start=True)
+            state.update(salt=salt, offset=end, checkpointed=False)
+        else:
+            # Usually the fallback autocheckpoint of app connections: shipping fell behind
+            logger.warning(
+                "WAL was reset before all frames were shipped (shipping continuity lost), "
+                "starting a new generation"
+            )
+            self._start_generation()
+            return 0
+
+        self._save_state()
+        return shipped
+
+    def _checkpoint(self, connection):
+        """Checkpoint the WAL so writers can restart it from the beginning.
+
+        A restart is safe only when every frame was shipped: frames committed
+        between shipping and the checkpoint are shipped right after it.
+        """
+        busy, log_frames, checkpointed = connection.execute('PRAGMA wal_checkpoint(FULL)').fetchone()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            self._ship_locked(connection)
+            if self._base_reader is not None:
+                # A gap was found; the new generation needs no checkpoint bookkeeping
+                return
+            frame_size = WAL_FRAME_HEADER_SIZE + connection.execute('PRAGMA page_size').fetchone()[0]
+            shipped_frames = (self.state['offset'] - WAL_HEADER_SIZE) // frame_size
+            if not busy and log_frames == checkpointed and shipped_frames >= log_frames:
+                self.state['checkpointed'] = True
+                self._save_state()
+        finally:
+            connection.execute('COMMIT')
+            if self._base_reader is not None:
+                self._copy_base()
+        logger.debug(f"WAL checkpoint: busy={busy}, log={log_frames}, checkpointed={checkpointed}")
+
+    def finish(self):
+        """Ship the remaining frames and leave a fully checkpointed, empty WAL.
+
+        Called at shutdown after the bot's engines are disposed. Otherwise the
+        shipper's connection is the last to close, SQLite checkpoints and
+        deletes the WAL behind its back, and the next start sees a new salt
+        with checkpointed=False and begins a new generation with a full base
+        copy. The WAL is truncated only when every frame was shipped.
+        """
+        with self._lock:
+            connection = self._connect()
+            if self.state is None:
+                self.state = self._load_state()
+
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                self._ship_locked(connection)
+            finally:
+                connection.execute('COMMIT')
+            if self._base_reader is not None:
+                self._copy_base()
+
+            self._checkpoint(connection)
+            if not self.state['checkpointed']:
+                logger.warning("WAL not fully checkpointed at shutdown, next start begins a new generation")
+                return
+            busy = connection.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()[0]
+            if busy:
+                logger.warning("WAL truncate at shutdown was blocked by another connection")
+            else:
+                logger.info("WAL shipped and checkpointed at shutdown")
+
+    def _generation_expired(self):
+        started_at = datetime.strptime(self.state['started_at'], TIMESTAMP_FORMAT)
+        return datetime.utcnow() - started_at > WAL_GENERATION_MAX_AGE
+
+    def prune(self, now=None):
+        """Delete generations superseded more than WAL_RETENTION ago."""
+        now = now or datetime.utcnow()
+        generations = list_generations(self.backup_dir)
+        removed = 0
+        for generation, successor in zip(generations, generations[1:]):
+            if now - datetime.strptime(successor, TIMESTAMP_FORMAT) > WAL_RETENTION:
+                shutil.rmtree(os.path.join(self.backup_dir, generation))
+                removed += 1
+        if removed:
+            logger.info(f"Removed {removed} old WAL shipping generations")
+        return removed
+
+def list_generations(backup_dir=WAL_BACKUP_DIR):
+    """Generation names, oldest first."""
+    if not os.path.isdir(backup_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(backup_dir)
+        if os.path.exists(os.path.join(backup_dir, name, 'base.db.gz'))
+    )
+
+def _segments(generation_dir):
+    """(seq, epoch, shipped_at, path) of a generation in shipping order."""
+    segments = []
+    for name in os.listdir(generation_dir):
+        if not name.endswith('.wal.gz'):
+            continue
+        seq, epoch, shipped_at = name[:-len('.wal.gz')].split('_')
+        segments.append((int(seq), int(epoch), datetime.strptime(shipped_at, TIMESTAMP_FORMAT),
+                         os.path.join(generation_dir, name)))
+    return sorted(segments)
+
+def restore(target_path, until=None, backup_dir=WAL_BACKUP_DIR):
+    """Rebuild the database as of `until` (UTC, default: latest) into target_path.
+
+    Restores the newest base snapshot taken before `until`, then replays the
+    WAL segments shipped up to that moment, one epoch at a time. Precision
+    is one shipping interval.
+    """
+    until = until or datetime.utcnow()
+    generations = [g for g in list_generations(backup_dir)
+                   if datetime.strptime(g, TIMESTAMP_FORMAT) <= until]
+    if not generations:
+        raise FileNotFoundError(f"No WAL backup generation before {until}")
+    generation_dir = os.path.join(backup_dir, generations[-1])
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(f'{target_path}{suffix}'):
+            os.remove(f'{target_path}{suffix}')
+    with gzip.open(os.path.join(generation_dir, 'base.db.gz'), 'rb') as source, open(target_path, 'wb') as f:
+        shutil.copyfileobj(source, f)
+
+    epochs = {}
+    for seq, epoch, shipped_at, path in _segments(generation_dir):
+        if shipped_at <= until:
+            epochs.setdefault(epoch, []).append(path)
+
+    for epoch in sorted(epochs):
+        with open(f'{target_path}-wal', 'wb') as wal:
+            for path in epochs[epoch]:
+                with gzip.open(path, 'rb') as segment:
+                    shutil.copyfileobj(segment, wal)
+        # Opening the database recovers the WAL; the checkpoint writes it back
+        connection = sqlite3.connect(target_path)
+        try:
+            connection.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        finally:
+            connection.close()
+
+    connection = sqlite3.connect(target_path)
+    try:
+        connection.execute('PRAGMA journal_mode=DELETE')
+        result = connection.execute('PRAGMA integrity_check').fetchone()[0]
+    finally:
+        connection.close()
+    if result != 'ok':
+        raise sqlite3.DatabaseError(f"Restored database failed integrity check: {result}")
+
+    logger.info(f"Restored {target_path} from generation {generations[-1]} "
+                f"({sum(len(p) for p in epochs.values())} segments) as of {until}")
+    return target_path
+
+_shipper = None
+
+def get_shipper(database_path=DATABASE_PATH):
+    global _shipper
+    if _shipper is None:
+        _shipper = WalShipper(database_path)
+    return _shipper
+
+async def ship_wal(context):
+    """JobQueue callback: ships new WAL frames in a worker thread."""
+    try:
+        await asyncio.to_thread(get_shipper().ship)
+    except sqlite3.Error as e:
+        logger.error(f"WAL shipping failed: {e}")
+
+async def prune_wal_backups(context):
+    """JobQueue callback: removes WAL generations past retention."""
+    await asyncio.to_thread(get_shipper().prune)
+
+async def stop_wal_shipping():
+    """Ship the remaining frames and checkpoint before the process exits."""
+    if _shipper is None:
+        return
+    try:
+        await asyncio.to_thread(_shipper.finish)
+    except sqlite3.Error as e:
+        logger.error(f"Final WAL shipping failed: {e}")
+    finally:
+        _shipper.close()
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        level=logging.INFO
+    )
+    parser = argparse.ArgumentParser(description='Restore bot.db from WAL shipping backups')
+    parser.add_argument('output', help='path of the restored database')
+    parser.add_argument('--until', help='UTC time, e.g. "2025-01-31 18:30:00" (default: latest)')
+    parser.add_argument('--backup-dir', default=WAL_BACKUP_DIR)
+    args = parser.parse_args()
+    until = datetime.fromisoformat(args.until) if args.until else None
+    restore(args.output, until, args.backup_dir)
@@ -0,0 +1,209 @@
+"""Режим webhook: встроенный ASGI-сервер (uvicorn) вместо long polling.
+
+Telegram присылает обновления POST-запросами на WEBHOOK_URL. Запрос
+проверяется по заголовку X-Telegram-Bot-Api-Secret-Token, обновление
+кладется в очередь приложения, и сервер сразу отвечает 200 — обработка
+идет в фоне тем же обработчиком обновлений, что и при polling.
+
+Проверка здоровья (GET /healthz) — отдельный сервер на 127.0.0.1 и своем
+порту: за reverse proxy все запросы к публичному порту приходят с
+локального адреса, поэтому проверять клиента там бесполезно.
+
+TLS: при заданных сертификате и ключе uvicorn сам принимает HTTPS (а
+сертификат загружается в setWebhook, что нужно для самоподписанного),
+иначе HTTPS должен завершать reverse proxy перед ботом.
+
+uvicorn — необязательная зависимость: pip install '.[webhook]'.
+"""
+import asyncio
+import hmac
+import json
+import logging
+import secrets
+import time
+from urllib.parse import urlsplit
+
+from telegram import Update
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = b'x-telegram-bot-api-secret-token'
+HEALTH_PATH = '/healthz'
+MAX_BODY_SIZE = 1024 * 1024  # обновления Telegram намного меньше
+HEALTH_LISTEN = '127.0.0.1'
+LOCAL_ADDRESSES = ('127.0.0.1', '::1', 'localhost')
+
+def webhook_path(url: str) -> str:
+    return urlsplit(url).path or '/'
+
+class _AsgiApp:
+    """Минимальное ASGI-приложение: маршрутизация HTTP и ответ на lifespan."""
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        status, body = await self.route(scope, receive)
+        await self._respond(send, status, body)
+
+    async def route(self, scope, receive):
+        return 404, None
+
+    @staticmethod
+    async def _respond(send, status, body):
+        payload = json.dumps(body).encode() if body is not None else b''
+        headers = [(b'content-length', str(len(payload)).encode())]
+        if body is not None:
+            headers.append((b'content-type', b'application/json'))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': payload})
+
+    @staticmethod
+    async def _lifespan(receive, send):
+        # Жизненным циклом приложения управляет run_webhook
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+class WebhookApp(_AsgiApp):
+    """ASGI-приложение: прием обновлений Telegram."""
+
+    def __init__(self, application, path, secret_token):
+        self.application = application
+        self.path = path
+        self._secret = secret_token.encode()
+        self.started_at = time.monotonic()
+        self.stats = {'received': 0, 'rejected': 0, 'invalid': 0}
+
+    async def route(self, scope, receive):
+        if scope['path'] == self.path and scope['method'] == 'POST':
+            return await self._receive_update(scope, receive)
+        return 404, None
+
+    async def _receive_update(self, scope, receive):
+        headers = dict(scope['headers'])
+        if not hmac.compare_digest(headers.get(SECRET_HEADER, b''), self._secret):
+            self.stats['rejected'] += 1
+            logger.warning(f"Rejected webhook request from {scope.get('client')}: bad secret token")
+            return 403, None
+
+        body = bytearray()
+        while True:
+            message = await receive()
+            body += message.get('body', b'')
+            if len(body) > MAX_BODY_SIZE:
+                self.stats['invalid'] += 1
+                return 413, None
+            if not message.get('more_body'):
+                break
+
+        try:
+            update = Update.de_json(json.loads(body), self.application.bot)
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            self.stats['invalid'] += 1
+            logger.warning(f"Invalid webhook payload: {e}")
+            return 400, None
+
+        # Обработка идет в фоне: Telegram получает ответ сразу
+        self.application.update_queue.put_nowait(update)
+        self.stats['received'] += 1
+        return 200, None
+
+    def health(self) -> dict:
+        processor = self.application.update_processor
+        health = {
+            'status': 'ok' if self.application.running else 'stopped',
+            'uptime': round(time.monotonic() - self.started_at),
+            'update_queue': self.application.update_queue.qsize(),
+            'webhook': self.stats,
+        }
+        if hasattr(processor, 'snapshot'):
+            health['update_processor'] = processor.snapshot()
+        return health
+
+class HealthApp(_AsgiApp):
+    """ASGI-приложение локального сервера проверки здоровья."""
+
+    def __init__(self, webhook_app):
+        self.webhook_app = webhook_app
+
+    async def route(self, scope, receive):
+        if scope['path'] == HEALTH_PATH and scope['method'] == 'GET':
+            return 200, self.webhook_app.health()
+        return 404, None
+
+async def _serve(servers):
+    """Запускает серверы и останавливает все, как только остановился любой."""
+    tasks = [asyncio.create_task(server.serve()) for server in servers]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for server in servers:
+            server.should_exit = True
+        await asyncio.gather(*tasks, return_exceptions=True)
+    for task in done:
+        task.result()
+
+async def run_webhook(application, url, listen, port, secret_token=None, max_connections=40,
+                      allowed_updates=None, drop_pending_updates=True, health_port=0,
+                      ssl_certfile=None, ssl_keyfile=None):
+    """Запускает приложение и ASGI-серверы; возвращается после их остановки.
+
+    Без secret_token используется случайный токен: он передается Telegram
+    в setWebhook при каждом запуске. health_port=0 отключает сервер
+    проверки здоровья.
+    """
+    import uvicorn
+
+    secret_token = secret_token or secrets.token_urlsafe(32)
+    app = WebhookApp(application, webhook_path(url), secret_token)
+    servers = [uvicorn.Server(uvicorn.Config(
+        app, host=listen, port=port, log_level='warning',
+        # Telegram держит не больше max_connections соединений одновременно
+        limit_concurrency=max_connections + 10,
+        ssl_certfile=ssl_certfile or None,
+        ssl_keyfile=ssl_keyfile or None,
+    ))]
+    if health_port:
+        servers.append(uvicorn.Server(uvicorn.Config(
+            HealthApp(app), host=HEALTH_LISTEN, port=health_port, log_level='warning',
+        )))
+    if not ssl_certfile and listen not in LOCAL_ADDRESSES:
+        logger.warning(
+            f"Webhook server on {listen}:{port} speaks plain HTTP: "
+            f"terminate TLS in a reverse proxy or set WEBHOOK_SSL_CERT and WEBHOOK_SSL_KEY"
+        )
+
+    async with application:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        certificate = open(ssl_certfile, 'rb') if ssl_certfile else None
+        try:
+            await application.bot.set_webhook(
+                url,
+                certificate=certificate,
+                secret_token=secret_token,
+                max_connections=max_connections,
+                allowed_updates=allowed_updates,
+                drop_pending_updates=drop_pending_updates,
+            )
+        finally:
+            if certificate:
+                certificate.close()
+        logger.info(
+            f"Webhook set to {url}, listening on {listen}:{port}"
+            + (f", health checks on {HEALTH_LISTEN}:{health_port}" if health_port else "")
+        )
+        try:
+            await _serve(servers)
+        finally:
+            await application.stop()
+    if application.post_shutdown:
+        await application.post_shutdown(application)